@@ -84,6 +84,7 @@ LOCAL_APPS = [
     "td_toolkits_v3.opticals.apps.OpticalsConfig",  # record all opticals
     "td_toolkits_v3.reliabilities.apps.ReliabilitiesConfig",  # record all reliabilities
     "td_toolkits_v3.products.apps.ProductsConfig",  # record all products
+    "td_toolkits_v3.jobs.apps.JobsConfig",  # background jobs
 ]
 # https://docs.djangoproject.com/en/dev/ref/settings/#installed-apps
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -277,6 +278,49 @@ SOCIALACCOUNT_ADAPTER = "td_toolkits_v3.users.adapters.SocialAccountAdapter"
 # ------------------------------------------------------------------------------
 # upload template directory
 UPLOAD_TEMPLATE_DIR = APPS_DIR / "static" / "sheets"
+# rows read from the uploaded raw logs each time
+INGEST_CHUNK_SIZE = env.int("INGEST_CHUNK_SIZE", default=50000)
+# rows insert to database each time
+INGEST_BATCH_SIZE = env.int("INGEST_BATCH_SIZE", default=2000)
+# processes to parse the uploaded files, 0 for the number of CPUs
+INGEST_WORKERS = env.int("INGEST_WORKERS", default=0)
+# processes to fit the models, 0 for the number of CPUs
+FITTING_WORKERS = env.int("FITTING_WORKERS", default=0)
+# fitting model rows kept loaded in each process
+FITTING_MODEL_CACHE_SIZE = env.int("FITTING_MODEL_CACHE_SIZE", default=256)
+# prediction grids of the fitting models, the max interpolation error
+# relative to the value range, and the max nodes of each axis
+FITTING_GRID_TOLERANCE = env.float("FITTING_GRID_TOLERANCE", default=1e-3)
+FITTING_GRID_MAX_NODES = env.int("FITTING_GRID_MAX_NODES", default=65)
+# run the jobs in request instead of by `manage.py run_jobs`
+JOBS_RUN_SYNC = env.bool("JOBS_RUN_SYNC", default=False)
+# seconds a running job may go without progress, then the worker is taken as
+# dead and the job fails
+JOBS_TIMEOUT = env.int("JOBS_TIMEOUT", default=6 * 60 * 60)
+# columnar snapshots of the logs for the analysis, empty to disable
+OPT_SNAPSHOT_DIR = env("OPT_SNAPSHOT_DIR", default=str(BASE_DIR / "snapshots"))
+# the bytes of the loaded OPT/RT data kept in each process (LRU)
+OPT_LOADER_CACHE_BYTES = env.int("OPT_LOADER_CACHE_BYTES", default=256 * 2**20)
+# the optical search results, kept in each process (LRU) and in the shared
+# cache alias for the timeout seconds
+OPT_SEARCH_CACHE = env("OPT_SEARCH_CACHE", default="search")
+OPT_SEARCH_CACHE_SIZE = env.int("OPT_SEARCH_CACHE_SIZE", default=32)
+OPT_SEARCH_CACHE_TIMEOUT = env.int("OPT_SEARCH_CACHE_TIMEOUT", default=3600)
+# the result tables of the sessions on disk, removed after the timeout seconds
+RESULT_STORE_DIR = env("RESULT_STORE_DIR", default=str(BASE_DIR / "results"))
+RESULT_STORE_TIMEOUT = env.int("RESULT_STORE_TIMEOUT", default=24 * 3600)
+# the rows written at once by the streaming downloads
+DOWNLOAD_CHUNK_ROWS = env.int("DOWNLOAD_CHUNK_ROWS", default=10000)
+# the partitioned parquet dataset of the OPT and RT data for the analysis
+OPT_EXPORT_DIR = env("OPT_EXPORT_DIR", default=str(BASE_DIR / "exports"))
+# keep the looked up master data (venders, materials, factories, ...) in each
+# process, only when they are not changed by the other processes
+LOOKUP_CACHE_SHARED = env.bool("LOOKUP_CACHE_SHARED", default=False)
+# the reliability tables of the RA search, queried by the threads and kept in
+# the cache alias for the timeout seconds
+RA_SEARCH_WORKERS = env.int("RA_SEARCH_WORKERS", default=4)
+RA_SEARCH_CACHE = env("RA_SEARCH_CACHE", default="search")
+RA_SEARCH_CACHE_TIMEOUT = env.int("RA_SEARCH_CACHE_TIMEOUT", default=3600)
 
 # wiki
 # ------------------------------------------------------------------------------
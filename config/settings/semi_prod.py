@@ -22,7 +22,16 @@ CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "",
-    }
+    },
+    # the optical search results, shared by the workers
+    "search": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": env(
+            "OPT_SEARCH_CACHE_DIR",
+            default=str(BASE_DIR / "cache" / "search"),  # noqa: F405
+        ),
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
 }
 
 # EMAIL
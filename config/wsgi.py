@@ -35,6 +35,17 @@ os.environ.setdefault(
 # file. This includes Django's development server, if the WSGI_APPLICATION
 # setting points here.
 application = get_wsgi_application()
+
+# Load the fitting models before serving the searches. The connection used
+# here is closed, the workers forked by `gunicorn --preload` inherit the
+# loaded models but must not share it.
+from django.db import connections  # noqa E402
+
+from td_toolkits_v3.opticals.tools.registry import model_registry  # noqa E402
+
+model_registry.warm()
+connections.close_all()
+
 # Apply WSGI middleware here.
 # from helloworld.wsgi import HelloWorldApplication
 # application = HelloWorldApplication(application)
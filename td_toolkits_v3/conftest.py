@@ -8,6 +8,9 @@ from td_toolkits_v3.users.tests.factories import UserFactory
 @pytest.fixture(autouse=True)
 def media_storage(settings, tmpdir):
     settings.MEDIA_ROOT = tmpdir.strpath
+    settings.OPT_SNAPSHOT_DIR = tmpdir.join('snapshots').strpath
+    settings.RESULT_STORE_DIR = tmpdir.join('results').strpath
+    settings.OPT_EXPORT_DIR = tmpdir.join('exports').strpath
 
 
 @pytest.fixture
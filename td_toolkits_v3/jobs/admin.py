@@ -0,0 +1,9 @@
+from django.contrib import admin
+
+from .models import (
+    Job,
+    JobFile,
+)
+
+admin.site.register(Job)
+admin.site.register(JobFile)
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from td_toolkits_v3.jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the queued jobs, keep polling the queue unless --burst. "
+        "The running jobs without progress in the timeout are failed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help="Exit when the queue is empty.",
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=None,
+            help="Seconds a running job may go without progress, "
+                 "default is settings.JOBS_TIMEOUT.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            swept = Job.sweep(options['timeout'])
+            if swept:
+                self.stdout.write(f"Fail {swept} stale running jobs")
+            job = Job.claim()
+            if job is None:
+                if options['burst']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+            self.stdout.write(f"Run {job}")
+            job.run()
+            self.stdout.write(f"Finish {job}")
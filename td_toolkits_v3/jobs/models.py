@@ -0,0 +1,251 @@
+from __future__ import annotations
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from model_utils.models import TimeStampedModel
+
+
+class Job(TimeStampedModel):
+    """
+    The long work run by the local worker (`manage.py run_jobs`),
+    instead of in the request.
+
+    The task is the dotted path of a function, called with the job and
+    the keyword arguments, and the return value is stored as the result.
+    The worker does not wrap the task in a transaction, so the progress is
+    visible while running, the task should make its writes atomic.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        SUCCESS = 'success', 'Success'
+        FAILURE = 'failure', 'Failure'
+
+    task = models.CharField("task path", max_length=255)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    progress = models.FloatField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created'], name='job_queue'),
+        ]
+
+    def __str__(self):
+        return f"{self.task}[{self.pk}]: {self.status}"
+
+    @property
+    def done(self) -> bool:
+        return self.status in [self.Status.SUCCESS, self.Status.FAILURE]
+
+    @classmethod
+    def enqueue(
+        cls,
+        task: str,
+        files: Optional[list] = None,
+        user=None,
+        **kwargs,
+    ) -> Job:
+        """
+        Create a pending job, the uploaded files are stored for the worker.
+        Run it at once if settings.JOBS_RUN_SYNC is set.
+
+        Parameters
+        ----------
+        task: str
+            The dotted path of the task function.
+        files: list of uploaded files, optional
+        user: User, optional
+            The anonymous user is not recorded.
+        kwargs:
+            JSON serializable arguments of the task.
+        """
+        if user is not None and not user.is_authenticated:
+            user = None
+        job = cls.objects.create(task=task, kwargs=kwargs, user=user)
+        for file in files or []:
+            JobFile.objects.create(job=job, name=file.name, file=file)
+        if settings.JOBS_RUN_SYNC:
+            job.run()
+        return job
+
+    @classmethod
+    def claim(cls) -> Optional[Job]:
+        """
+        Take the oldest pending job for running. The status is checked
+        when updating, so two workers never take the same job.
+        """
+        while True:
+            job = cls.objects.filter(
+                status=cls.Status.PENDING
+            ).order_by('created', 'pk').first()
+            if job is None:
+                return None
+            claimed = cls.objects.filter(
+                pk=job.pk, status=cls.Status.PENDING
+            ).update(
+                status=cls.Status.RUNNING,
+                started=timezone.now(),
+                modified=timezone.now(),
+            )
+            if claimed:
+                job.refresh_from_db()
+                return job
+
+    @classmethod
+    def sweep(cls, timeout: Optional[float] = None) -> int:
+        """
+        Fail the running jobs without any progress in the timeout, their
+        worker is taken as dead. The status and `modified` are checked when
+        updating, so a job reporting its progress meanwhile is kept.
+
+        Parameters
+        ----------
+        timeout: float, optional
+            Seconds, default is settings.JOBS_TIMEOUT.
+
+        Returns
+        -------
+        int
+            The number of the failed jobs.
+        """
+        if timeout is None:
+            timeout = settings.JOBS_TIMEOUT
+        deadline = timezone.now() - timedelta(seconds=timeout)
+        swept = 0
+        for job in cls.objects.filter(
+            status=cls.Status.RUNNING, modified__lt=deadline,
+        ).order_by('pk'):
+            failed = cls.objects.filter(
+                pk=job.pk, status=cls.Status.RUNNING, modified__lt=deadline,
+            ).update(
+                status=cls.Status.FAILURE,
+                message='The worker stopped without finishing the job',
+                finished=timezone.now(),
+                modified=timezone.now(),
+            )
+            if failed:
+                job.clear_files()
+                swept += 1
+        return swept
+
+    @classmethod
+    def visible_to(cls, user) -> models.QuerySet:
+        """
+        The jobs of the user, the staff see all of them.
+        """
+        if not user.is_authenticated:
+            return cls.objects.none()
+        if user.is_staff:
+            return cls.objects.all()
+        return cls.objects.filter(user=user)
+
+    def run(self):
+        """
+        Run the task and record the result or the error.
+        """
+        if self.status == self.Status.PENDING:
+            self.status = self.Status.RUNNING
+            self.started = timezone.now()
+            self.save(update_fields=['status', 'started'])
+        # Run in a savepoint when called inside a transaction (sync mode
+        # in request), so a failed task would not break the outer one.
+        in_atomic_block = transaction.get_connection().in_atomic_block
+        try:
+            with transaction.atomic() if in_atomic_block else nullcontext():
+                result = import_string(self.task)(self, **self.kwargs)
+        except Exception as e:
+            self.status = self.Status.FAILURE
+            self.message = str(e)[:255]
+            self.error = traceback.format_exc()
+        else:
+            self.status = self.Status.SUCCESS
+            self.progress = 1
+            self.result = result
+        finally:
+            self.finished = timezone.now()
+            self.save(update_fields=[
+                'status', 'progress', 'message', 'result', 'error', 'finished',
+            ])
+            self.clear_files()
+
+    def set_progress(self, progress: float, message: str = ''):
+        """
+        Parameters
+        ----------
+        progress: float
+            From 0 to 1.
+        message: str, optional
+            The current step.
+        """
+        self.progress = progress
+        self.message = message[:255]
+        # update directly, the page polling would see it at once
+        Job.objects.filter(pk=self.pk).update(
+            progress=self.progress,
+            message=self.message,
+            modified=timezone.now(),
+        )
+
+    def open_files(self) -> list[File]:
+        """
+        Open the stored files with their original name, in upload order.
+        """
+        self._opened_files = list(self.files.order_by('pk'))
+        return [job_file.open() for job_file in self._opened_files]
+
+    def clear_files(self):
+        """
+        Delete the stored files, the opened ones are closed first.
+        """
+        job_files = getattr(self, '_opened_files', None) or self.files.all()
+        for job_file in job_files:
+            job_file.file.delete(save=False)
+            job_file.delete()
+        self._opened_files = []
+
+    def as_dict(self) -> dict:
+        return {
+            'id': self.pk,
+            'status': self.status,
+            'done': self.done,
+            'progress': self.progress,
+            'message': self.message,
+        }
+
+
+class JobFile(models.Model):
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='files')
+    # the original file name, the stored one may be renamed
+    name = models.CharField(max_length=255)
+    file = models.FileField(upload_to='jobs/%Y/%m/%d/')
+
+    def __str__(self):
+        return self.name
+
+    def open(self) -> File:
+        self.file.open('rb')
+        return File(self.file.file, name=self.name)
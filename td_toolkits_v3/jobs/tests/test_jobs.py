@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+import pytest
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from td_toolkits_v3.users.tests.factories import UserFactory
+
+from ..models import Job
+
+pytestmark = pytest.mark.django_db
+
+
+def read_task(job, prefix):
+    job.set_progress(0.5, 'reading')
+    return {'contents': [
+        f'{prefix}{file.name}:{file.read().decode()}'
+        for file in job.open_files()
+    ]}
+
+
+def fail_task(job):
+    raise ValueError('something wrong')
+
+
+def test_job_queue(settings, client, user):
+    settings.JOBS_RUN_SYNC = False
+    job = Job.enqueue(
+        'td_toolkits_v3.jobs.tests.test_jobs.read_task',
+        files=[
+            SimpleUploadedFile('a.txt', b'1'),
+            SimpleUploadedFile('b.txt', b'2'),
+        ],
+        user=user,
+        prefix='>',
+    )
+    failed = Job.enqueue('td_toolkits_v3.jobs.tests.test_jobs.fail_task')
+    assert job.status == Job.Status.PENDING
+    client.force_login(user)
+    response = client.get(reverse('jobs:status', kwargs={'pk': job.pk}))
+    assert response.json()['done'] is False
+
+    call_command('run_jobs', burst=True)
+
+    job.refresh_from_db()
+    assert job.status == Job.Status.SUCCESS
+    assert job.progress == 1
+    assert job.result == {'contents': ['>a.txt:1', '>b.txt:2']}
+    assert job.files.count() == 0
+    failed.refresh_from_db()
+    assert failed.status == Job.Status.FAILURE
+    assert failed.message == 'something wrong'
+    assert Job.claim() is None
+
+
+def test_job_run_sync():
+    job = Job.enqueue(
+        'td_toolkits_v3.jobs.tests.test_jobs.read_task', prefix='',
+    )
+    assert job.done
+    assert job.result == {'contents': []}
+
+
+def test_job_visible_to(client, user):
+    job = Job.enqueue(
+        'td_toolkits_v3.jobs.tests.test_jobs.read_task',
+        user=user,
+        prefix='',
+    )
+    status = reverse('jobs:status', kwargs={'pk': job.pk})
+    detail = reverse('jobs:detail', kwargs={'pk': job.pk})
+    # login required
+    assert client.get(status).status_code == 302
+    # not for the other users
+    client.force_login(UserFactory())
+    assert client.get(status).status_code == 404
+    assert client.get(detail).status_code == 404
+    client.force_login(UserFactory(is_staff=True))
+    assert client.get(detail).status_code == 200
+    client.force_login(user)
+    assert client.get(status).json()['done'] is True
+
+
+def test_job_sweep(settings):
+    settings.JOBS_RUN_SYNC = False
+    stale, alive = [
+        Job.enqueue(
+            'td_toolkits_v3.jobs.tests.test_jobs.read_task',
+            files=[SimpleUploadedFile('a.txt', b'1')],
+            prefix='',
+        )
+        for _ in range(2)
+    ]
+    assert Job.claim() == stale and Job.claim() == alive
+    # the worker of the stale one is dead for a while
+    Job.objects.filter(pk=stale.pk).update(
+        modified=timezone.now() - timedelta(seconds=settings.JOBS_TIMEOUT + 1))
+
+    call_command('run_jobs', burst=True)
+
+    stale.refresh_from_db()
+    alive.refresh_from_db()
+    assert stale.status == Job.Status.FAILURE
+    assert stale.files.count() == 0
+    assert alive.status == Job.Status.RUNNING
+    assert Job.sweep() == 0
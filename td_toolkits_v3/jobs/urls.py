@@ -0,0 +1,17 @@
+from django.urls import path
+from . import views
+
+
+app_name = "jobs"
+urlpatterns = [
+    path(
+        route='<int:pk>/',
+        view=views.JobDetailView.as_view(),
+        name='detail'
+    ),
+    path(
+        route='<int:pk>/status/',
+        view=views.JobStatusView.as_view(),
+        name='status'
+    ),
+]
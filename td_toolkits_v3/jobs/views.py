@@ -0,0 +1,77 @@
+from typing import Optional
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse_lazy
+from django.utils.http import urlencode
+from django.views import View
+from django.views.generic import DetailView
+
+from .models import Job
+
+
+class JobStatusView(LoginRequiredMixin, View):
+    """
+    The status of a job for polling, only for its user and the staff.
+    """
+    def get(self, request, pk):
+        job = get_object_or_404(Job.visible_to(request.user), pk=pk)
+        return JsonResponse(job.as_dict())
+
+
+class JobDetailView(LoginRequiredMixin, DetailView):
+    model = Job
+    template_name = 'success_generic.html'
+
+    def get_queryset(self):
+        return Job.visible_to(self.request.user)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['title'] = f"Job {self.object.pk}"
+        context['job'] = self.object
+        context['nexts'] = {}
+        if self.object.result:
+            context['log'] = self.object.result.get('save_log')
+            # the links to the results, like the download of an export
+            context['nexts'].update(self.object.result.get('nexts', {}))
+        context['nexts']["Home"] = reverse_lazy('home')
+        return context
+
+
+class JobFormMixin():
+    """
+    For the form view enqueue a job in `form_valid` and set it to
+    `self.job`, redirect to the success page with the job.
+    """
+    job: Optional[Job] = None
+
+    def get_success_url(self):
+        url = super().get_success_url()
+        if self.job is None:
+            return url
+        return f"{url}?{urlencode({'job': self.job.pk})}"
+
+
+class JobResultMixin():
+    """
+    For the success page of a job, the job is given by `?job=<pk>`, only
+    the jobs of the user (or any for the staff) are shown.
+    """
+    def get_job(self) -> Optional[Job]:
+        pk = self.request.GET.get('job')
+        if not pk or not pk.isdigit():
+            return None
+        return Job.visible_to(self.request.user).filter(pk=pk).first()
+
+    def get_job_result(self, key: str, default=None):
+        job = self.get_job()
+        if job is None or not job.result:
+            return default
+        return job.result.get(key, default)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['job'] = self.get_job()
+        return context
@@ -3,6 +3,8 @@ from django.core.cache import cache
 
 import pandas as pd
 
+from td_toolkits_v3.utils.lookups import Lookups
+
 from .models import (
     Vender,
     LiquidCrystal,
@@ -12,19 +14,40 @@ from .models import (
     ExtraordinaryRefractionIndex,
 )
 
+def sheet_rows(model, df: pd.DataFrame, exist: bool) -> pd.DataFrame:
+    """
+    The rows of the sheet whose material exists or not, by one query.
+    """
+    names = df['Name'].astype(str)
+    found = names.isin(set(
+        model.objects.filter(name__in=names).values_list('name', flat=True)
+    ))
+    if exist:
+        return df[found]
+    # the repeated names exist after the first row is created
+    return df[~found & ~names.duplicated()]
+
+
 class MaterialsUploadForm(forms.Form):
     materials = forms.FileField(
         help_text='Excel file(.xlsx)',
         widget=forms.FileInput(attrs={'accept': '.xlsx'})
     )
 
-    def save(self):
+    def save(self, request=None):
         lc_df = pd.read_excel(
             self.cleaned_data['materials'], sheet_name='LiquidCrystal')
         pi_df = pd.read_excel(
             self.cleaned_data['materials'], sheet_name='Polyimide')
         seal_df = pd.read_excel(
             self.cleaned_data['materials'], sheet_name='Seal')
+        # the venders of the created rows of all the sheets at once
+        venders = Lookups.for_request(request).resolve(
+            Vender, pd.concat([
+                sheet_rows(LiquidCrystal, lc_df, exist=False),
+                sheet_rows(Polyimide, pi_df, exist=False),
+                sheet_rows(Seal, seal_df, exist=False),
+            ])['Vender'])
         save_log = {
             'file_name': [self.cleaned_data['materials'].name],
             'warning': [],
@@ -41,8 +64,7 @@ class MaterialsUploadForm(forms.Form):
                 )
                 continue
             else:
-                vender = Vender.objects.get_or_create(
-                    name=str(row['Vender']))[0]
+                vender = venders[str(row['Vender'])]
                 LiquidCrystal.objects.create(
                     name=str(row['Name']),
                     vender=vender,
@@ -71,8 +93,7 @@ class MaterialsUploadForm(forms.Form):
                 )
                 continue
             else:
-                vender = Vender.objects.get_or_create(
-                    name=str(row['Vender']))[0]
+                vender = venders[str(row['Vender'])]
                 Polyimide.objects.create(
                     name=str(row['Name']),
                     vender=vender,
@@ -87,8 +108,7 @@ class MaterialsUploadForm(forms.Form):
                 )
                 continue
             else:
-                vender = Vender.objects.get_or_create(
-                    name=str(row['Vender']))[0]
+                vender = venders[str(row['Vender'])]
                 Seal.objects.create(
                     name=str(row['Name']),
                     vender=vender,
@@ -106,19 +126,25 @@ class MaterialsUpdateForm(forms.Form):
         widget=forms.FileInput(attrs={'accept': '.xlsx'})
     )
 
-    def save(self):
+    def save(self, request=None):
         lc_df = pd.read_excel(
             self.cleaned_data['materials'], sheet_name='LiquidCrystal')
         pi_df = pd.read_excel(
             self.cleaned_data['materials'], sheet_name='Polyimide')
         seal_df = pd.read_excel(
             self.cleaned_data['materials'], sheet_name='Seal')
+        # the venders of the updated rows of all the sheets at once
+        venders = Lookups.for_request(request).resolve(
+            Vender, pd.concat([
+                sheet_rows(LiquidCrystal, lc_df, exist=True),
+                sheet_rows(Polyimide, pi_df, exist=True),
+                sheet_rows(Seal, seal_df, exist=True),
+            ])['Vender'])
         # LC part
         for row in lc_df.to_dict(orient='records'):
             try:
                 lc = LiquidCrystal.objects.get(name=row['Name'])
-                vender = Vender.objects.get_or_create(
-                    name=str(row['Vender']))[0]
+                vender = venders[str(row['Vender'])]
                 
                 lc.vender=vender
                 lc.designed_cell_gap=float(row['designed cell gap(um)'])
@@ -143,8 +169,7 @@ class MaterialsUpdateForm(forms.Form):
         for row in pi_df.to_dict(orient='records'):
             try:
                 pi = Polyimide.objects.get(name=row['Name'])
-                vender = Vender.objects.get_or_create(
-                    name=str(row['Vender']))[0]
+                vender = venders[str(row['Vender'])]
                 
                 pi.name=str(row['Name'])
                 pi.vender=vender
@@ -157,8 +182,7 @@ class MaterialsUpdateForm(forms.Form):
         for row in seal_df.to_dict(orient='records'):
             try:
                 seal = Seal.objects.get(name=row['Name'])
-                vender = Vender.objects.get_or_create(
-                    name=str(row['Vender']))[0]
+                vender = venders[str(row['Vender'])]
                 
                 seal.name=str(row['Name'])
                 seal.vender=vender
@@ -17,8 +17,11 @@ class Vender(TimeStampedModel):
         return self.name
 
 
+DEFAULT_VENDER = "INX"
+
+
 def get_default_vender():
-    return Vender.objects.get_or_create(name="INX")[0]
+    return Vender.objects.get_or_create(name=DEFAULT_VENDER)[0]
 
 class RefractionIndex(TimeStampedModel):
     wavelength = models.FloatField(
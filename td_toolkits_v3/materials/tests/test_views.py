@@ -13,6 +13,7 @@ from ..models import (
     LiquidCrystal,
     Polyimide,
     Seal,
+    Vender,
 )
 
 def test_material_batch_create_view(client, user):
@@ -52,8 +53,9 @@ def test_material_batch_create_null_view(client, user):
     assert Polyimide.objects.all().count() == 0
     assert Seal.objects.all().count() == 0
 
-def test_material_batch_create_unique(client):
+def test_material_batch_create_unique(client, user):
     """Test duplicate doesn't affect data"""
+    client.force_login(user)
     LiquidCrystal.objects.create(name='LCT-15-1098')
     Polyimide.objects.create(name='RB005')
     Seal.objects.create(name='723K1M')
@@ -70,4 +72,15 @@ def test_material_batch_create_unique(client):
     assert Polyimide.objects.all().count() == 1
     assert Polyimide.objects.last().vender.name == 'INX'
     assert Seal.objects.all().count() == 1
-    assert Seal.objects.last().vender.name == 'INX'
\ No newline at end of file
+    assert Seal.objects.last().vender.name == 'INX'
+    # no vender of the skipped rows
+    assert list(Vender.objects.values_list('name', flat=True)) == ['INX']
+
+def test_material_batch_update_missing(client, user):
+    """Test the rows of no material create nothing"""
+    client.force_login(user)
+    with open(MATERIAL_TEST_FILE_DIR, 'rb') as fp:
+        client.post(reverse('materials:update'), {'materials': fp})
+
+    assert LiquidCrystal.objects.all().count() == 0
+    assert Vender.objects.all().count() == 0
\ No newline at end of file
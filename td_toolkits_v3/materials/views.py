@@ -95,7 +95,7 @@ class MaterialsUploadView(LoginRequiredMixin, FormView):
         return context
 
     def form_valid(self, form):
-        form.save()
+        form.save(self.request)
         return super().form_valid(form)
 
 class MaterialsUploadSuccessView(TemplateView):
@@ -134,7 +134,7 @@ class MaterialsUpdateView(LoginRequiredMixin, FormView):
         return context
 
     def form_valid(self, form):
-        form.save()
+        form.save(self.request)
         return super().form_valid(form)
 
 class IndexView(TemplateView):
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class OpticalsConfig(AppConfig):
     name = 'td_toolkits_v3.opticals'
+
+    def ready(self):
+        import td_toolkits_v3.opticals.signals  # noqa F401
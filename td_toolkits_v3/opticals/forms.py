@@ -1,7 +1,5 @@
-import io
 from typing import List, Tuple, Dict, Union, Optional
-import csv
-from datetime import datetime, timedelta, timezone
+from datetime import timedelta, timezone
 import numpy as np
 import pandas as pd
 
@@ -16,8 +14,11 @@ from td_toolkits_v3.products.models import (
     Experiment,
     Condition,
     Sub,
-    Chip,
 )
+from td_toolkits_v3.products.tools.utils import ChipResolver
+from td_toolkits_v3.jobs.models import Job
+from td_toolkits_v3.utils.lookups import Lookups
+from td_toolkits_v3.utils.results import ResultStore
 from td_toolkits_v3.materials.models import (
     LiquidCrystal,
     Polyimide,
@@ -31,8 +32,6 @@ from .models import (
     AxometricsLog,
     OpticalSearchProfile,
     RDLCellGap,
-    OpticalLog,
-    ResponseTimeLog,
     OpticalReference,
     OpticalReference,
     OptFittingModel,
@@ -41,14 +40,11 @@ from .models import (
     BackLightIntensity,
 )
 from .tools.utils import (
-    OptLoader, 
-    OptFitting, # TODO: to be deprecated
-    OPTFitting,
-    RTFitting,
-    MaterialConfiguration,
     OptTableGenerator,
     tr2_score,
 )
+from .tools.ingest import AxoIngest
+from .tools.registry import model_registry
 
 from td_toolkits_v3.materials.tools.utils import (
     LiquidCrystalPydantic,
@@ -80,7 +76,7 @@ class AxoUploadForm(forms.Form):
         if last_exp is not None:
             last_exp_id = last_exp.name
             self.fields["exp_id"].initial = (last_exp_id, last_exp_id)
-        Factory.default("T2")
+        Lookups().get(Factory, "T2")
         self.fields["factory"].choices = list(
             Factory.objects.all().values_list("name", "name")
         )
@@ -90,99 +86,34 @@ class AxoUploadForm(forms.Form):
         files = request.FILES.getlist("axos")
         experiment = Experiment.objects.get(
             name=str(self.cleaned_data["exp_id"]))
-        # print(files)
-        factory = Factory.default(self.cleaned_data["factory"])
-        instrument = Instrument.default("AXO", factory)
+        lookups = Lookups.for_request(request)
+        factory = lookups.get(Factory, self.cleaned_data["factory"])
 
-        # the axo location order map to opt measurement point
-        # points = [5, 3, 1, 6, 4, 2]
-        points = [1, 2, 3, 4, 5, 6]
-
-        save_log = {
-            'file_name': [],
-            'warning': [],
-        }
-        
-        for file in files:
-            file_name = str(file).split(".")[0]
-            short_names = [s.strip() for s in file_name.split("+")]
+        ingest = AxoIngest(
+            experiment=experiment,
+            factory=factory,
+            resolver=ChipResolver.for_request(request, experiment),
+            lookups=lookups,
+        )
+        ingest.feed_all(files)
+        ingest.save()
 
-            reader = csv.reader(
-                io.StringIO(file.read().decode("utf-8", errors="ignore"))
-            )
-            data_range = range(28, 28 + len(points) * len(short_names))
-            data = [
-                list(map(float,row))  for idx, row
-                in enumerate(reader) if idx in data_range
-            ]
-            row_count = 0
-            save_log['file_name'].append(file_name)
-            for short_name in short_names:
-                # print(short_name)
-                # Check if there is chip data, otherwise skip.
-                try:
-                    chip = Chip.objects.get(
-                        short_name=short_name, 
-                        sub__condition__experiment=experiment
-                    )
-                except:
-                    save_log['warning'].append(
-                        f"Chip: {short_name} is not in the database."
-                    )
-                    continue
-                # print(chip)
-                for point in points:
-                    try:
-                        AxometricsLog.objects.get(
-                            chip=chip,
-                            measure_point=point,
-                        )
-                        save_log['warning'].append(
-                            f"{chip.name}({chip.short_name})"
-                            f" at point [{point}] is duplicate, keep the old one"
-                        )
-                        continue
-                    except:
-                        if data[row_count][8] > 1:
-                            save_log['warning'].append(
-                                f"Measurement at {chip.name}({chip.short_name}) "
-                                f"of point [{point}] has large RMS({data[row_count][8]}), "
-                                f"skip it."
-                            )
-                            continue
-                        AxometricsLog.objects.create(
-                            chip=chip,
-                            measure_point=point,
-                            x_coord=data[row_count][1],
-                            y_coord=data[row_count][2],
-                            cell_gap=data[row_count][3],
-                            top_rubbing_direct=data[row_count][4],
-                            twist=data[row_count][5],
-                            top_pretilt=data[row_count][6],
-                            bottom_pretilt=data[row_count][7],
-                            rms=data[row_count][8],
-                            iteration=data[row_count][9],
-                            instrument=instrument,
-                        )
-                        row_count += 1
-        
-            cache.set("df", 
-                pd.DataFrame.from_records(
-                    AxometricsLog.objects.filter(
-                        chip__sub__condition__experiment=experiment
-                    ).values(
-                        'chip__name',
-                        'cell_gap',
-                        'rms',
-                    )
-                ).rename(columns={
-                    'chip__name': 'ID',
-                    'cell_gap': 'Cell Gap',
-                    'rms': 'RMS',
-                })
-            )
-            cache.set("save_log", save_log)
-        
+        cache.set("df", 
+            pd.DataFrame.from_records(
+                AxometricsLog.objects.filter(
+                    chip__sub__condition__experiment=experiment
+                ).values(
+                    'chip__name',
+                    'cell_gap',
+                    'rms',
+                )
+            ).rename(columns={
+                'chip__name': 'ID',
+                'cell_gap': 'Cell Gap',
+                'rms': 'RMS',
+            })
+        )
+        cache.set("save_log", ingest.save_log)
 
 
 class RDLCellGapUploadForm(forms.Form):
@@ -203,7 +134,7 @@ class RDLCellGapUploadForm(forms.Form):
             last_exp_id = last_exp.name
             self.fields["exp_id"].initial = (last_exp_id, last_exp_id)
 
-    def save(self):
+    def save(self, request=None):
         rdl_cell_gap = pd.read_excel(
             self.cleaned_data["rdl_cell_gap"],
             sheet_name='upload',
@@ -213,26 +144,23 @@ class RDLCellGapUploadForm(forms.Form):
         
         experiment = Experiment.objects.get(
             name=str(self.cleaned_data["exp_id"]))
+        resolver = ChipResolver.for_request(request, experiment)
+        chips = resolver.resolve(rdl_cell_gap['short id'])
 
-        factory = Factory.default("Fab1")
-        instrument = Instrument.default("RETS", factory)
+        lookups = Lookups.for_request(request)
+        instrument = lookups.get(
+            Instrument, "RETS", factory=lookups.get(Factory, "Fab1"))
         save_log = {
             "file_name": [self.cleaned_data['rdl_cell_gap']],
             "warning": [],
         }
+        save_log["warning"] += resolver.warnings
         for row in rdl_cell_gap.to_numpy():
             # Check if there is chip data, otherwise skip.
-            try:
-                chip = Chip.objects.get(
-                    short_name=row[0], 
-                    sub__condition__experiment=experiment
-                )
-            except:
-                save_log["warning"].append(
-                    f"Chip: {row[0]} is not in the database."
-                )
+            chip = chips.get(row[0])
+            if chip is None:
                 continue
-            
+
             try:
                 RDLCellGap.objects.get(
                     chip=chip
@@ -280,7 +208,7 @@ class AlterRdlCellGapUploadForm(forms.Form):
             last_exp_id = last_exp.name
             self.fields['exp_id'].initial = (last_exp_id, last_exp_id)
     
-    def save(self):
+    def save(self, request=None):
         rdl_cell_gap = pd.read_excel(
             self.cleaned_data["rdl_cell_gap"],
             sheet_name='upload',
@@ -292,25 +220,20 @@ class AlterRdlCellGapUploadForm(forms.Form):
         experiment = Experiment.objects.get(
             name=str(self.cleaned_data["exp_id"])
         )
+        resolver = ChipResolver.for_request(request, experiment)
+        chips = resolver.resolve(rdl_cell_gap['short id'])
         
         log = {
             'file_name': [self.cleaned_data['rdl_cell_gap']],
-            'warning': [],
+            'warning': resolver.warnings,
         }
         bulk_create_list = []
         bulk_update_list = []
         
         for row in rdl_cell_gap.to_numpy():
             # Check if there is chip data, otherwise skip.
-            try:
-                chip = Chip.objects.get(
-                    short_name=row[0], 
-                    sub__condition__experiment=experiment
-                )
-            except Chip.DoesNotExist:
-                log['warning'].append(
-                    f"Chip: {row[0]} is not in the database."
-                )
+            chip = chips.get(row[0])
+            if chip is None:
                 continue
             try:
                 rdl_cell_gap = models.AlterRdlCellGap.objects.get(
@@ -364,159 +287,21 @@ class OptUploadForm(forms.Form):
         if last_exp is not None:
             last_exp_id = last_exp.name
             self.fields["exp_id"].initial = (last_exp_id, last_exp_id)
-        Factory.default("TOC")
+        Lookups().get(Factory, "TOC")
         self.fields["factory"].choices = list(
             Factory.objects.all().values_list("name", "name")
         )
         self.fields["factory"].initial = ("TOC", "TOC")
 
-    def save(self, request):
-        files = request.FILES.getlist("opts")
-        experiment = Experiment.objects.get(
-            name=str(self.cleaned_data["exp_id"]))
-        # print(files)
-        factory = Factory.default(self.cleaned_data["factory"])
-        opt_df_list = [pd.DataFrame()]
-        
-        save_log = {
-            "file_name": [file.name for file in files],
-            "warning": [],
-        }
-        
-        for file in files:
-            if not file.name.endswith('csv'):
-                save_log["warning"].append(
-                    f"File {file.name} is not a csv file, skip it."
-                )
-                continue
-            # Using pd read csv this time
-            tmp_df = pd.read_csv(
-                file, encoding="utf-8", encoding_errors="ignore")
-            opt_df_list.append(tmp_df)
-            
-        opt_df = pd.concat(opt_df_list)
-
-        if len(opt_df) == 0:
-            save_log["warning"].append("No data found in the file")
-            return
-        # print(opt_df.head())
-        # 0. drop na for chip, date, time
-        opt_df = opt_df.dropna(
-            subset=[
-                opt_df.columns[0],  # Date
-                opt_df.columns[1],  # Time
-                opt_df.columns[2],  # ID or Short ID
-                opt_df.columns[3],  # measure point
-                opt_df.columns[6],  # voltage
-            ]
+    def save(self, request) -> Job:
+        return Job.enqueue(
+            'td_toolkits_v3.opticals.tasks.opt_upload',
+            files=request.FILES.getlist("opts"),
+            user=request.user,
+            exp_id=str(self.cleaned_data["exp_id"]),
+            factory=self.cleaned_data["factory"],
+            log_id=self.cleaned_data["log_id"],
         )
-        # 1. drop V == 1, the data separate note
-        opt_df = opt_df[opt_df.iloc[:, 6] != 1]
-        # 2. change Vpp to Vop
-        opt_df.iloc[:, 6] = opt_df.iloc[:, 6] / 2
-        # 3. transform datetime
-        opt_df["datetime"] = [
-            datetime.strptime(
-                f"{opt_df.iloc[i, 0]} {opt_df.iloc[i, 1]} +0800",
-                r"%Y/%m/%d %H:%M:%S %z",
-            )
-            for i in range(len(opt_df))
-        ]
-
-        # 4. drop duplicate (keep newer)
-        opt_df = opt_df.sort_values("datetime").drop_duplicates(
-            subset=[
-                # cause sometime the header maybe different?
-                # using the position otherwise.
-                opt_df.columns[2],  # ID
-                opt_df.columns[3],  # measure point
-                opt_df.columns[6],  # voltage
-            ],
-            keep="last",
-        )
-
-        # 5. drop chip that already logged
-        if self.cleaned_data["log_id"] == "panel_id":
-            chip_could_log = [
-                i.name
-                for i in Chip.objects.filter(
-                    sub__condition__experiment=experiment, opticallog__isnull=True
-                ).distinct()
-            ]
-        elif self.cleaned_data["log_id"] == "short_id":
-            chip_could_log = [
-                i.short_name
-                for i in Chip.objects.filter(
-                    sub__condition__experiment=experiment, opticallog__isnull=True
-                ).distinct()
-            ]
-        else:
-            raise ValueError("Wrong log id")
-        
-        origin_opt_df = opt_df
-        # cast the id to str
-        opt_df.iloc[:, 2] = opt_df.iloc[:, 2].astype("str")
-        opt_df = opt_df[opt_df.iloc[:, 2].isin(chip_could_log)]
-        
-        if len(opt_df) == 0:
-            print(origin_opt_df.info())
-            save_log["warning"].append("No logable data found in the file")
-            cache.set("save_log", save_log)
-            return
-        
-        # 6. modified data type
-        opt_df.iloc[:, 3] = opt_df.iloc[:, 3].astype("int")  # measure point
-        opt_df.iloc[:, 5] = opt_df.iloc[:, 5].astype("str")  # operator
-        opt_df.iloc[:, 6] = opt_df.iloc[:, 6].astype("float")  # voltage
-        opt_df.iloc[:, 11] = opt_df.iloc[:, 11].astype("float")  # lc percent
-        opt_df.iloc[:, 23] = opt_df.iloc[:, 23].astype("float")  # w_capital_y
-        opt_df.iloc[:, 32] = opt_df.iloc[:, 32].astype("float")  # w_x
-        opt_df.iloc[:, 33] = opt_df.iloc[:, 33].astype("float")  # w_y
-        # 7. batch create for each chip
-        logs = []
-        instrument = Instrument.default(opt_df.iloc[0, 4], factory)
-
-        for chip_name in opt_df.iloc[:, 2].unique():
-            try:
-                if self.cleaned_data["log_id"] == "panel_id":
-                    chip = Chip.objects.get(
-                        name=chip_name, sub__condition__experiment=experiment
-                    )
-                elif self.cleaned_data["log_id"] == "short_id":
-                    chip = Chip.objects.get(
-                        short_name=chip_name, sub__condition__experiment=experiment
-                    )
-                else:
-                    raise ValueError("Wrong log id")
-            except Chip.DoesNotExist:
-                save_log["warning"].append(
-                    f"The chip {chip_name} is not found in the experiment"
-                )
-                continue
-                
-            tmp_df = opt_df[opt_df.iloc[:, 2] == chip_name]
-            if len(tmp_df) == 0:
-                continue
-            for row in tmp_df.to_numpy():
-                logs.append(
-                    OpticalLog(
-                        chip=chip,
-                        measure_point=row[3],
-                        measure_time=row[-1],
-                        instrument=instrument,
-                        operator=row[5],
-                        voltage=row[6],
-                        lc_percent=row[11],
-                        w_capital_y=row[23],
-                        w_x=row[32],
-                        w_y=row[33],
-                    )
-                )
-
-        OpticalLog.objects.bulk_create(logs)
-
-        # save the log to cache
-        cache.set("save_log", save_log)
 
 class ResponseTimeUploadForm(forms.Form):
     exp_id = forms.ChoiceField(choices=[("", "")], initial=None)
@@ -552,162 +337,23 @@ class ResponseTimeUploadForm(forms.Form):
         if last_exp is not None:
             last_exp_id = last_exp.name
             self.fields["exp_id"].initial = (last_exp_id, last_exp_id)
-        Factory.default("TOC")
+        Lookups().get(Factory, "TOC")
         self.fields["factory"].choices = list(
             Factory.objects.all().values_list("name", "name")
         )
         self.fields["factory"].initial = ("TOC", "TOC")
 
-    def save(self, request):
-        files = request.FILES.getlist("rts")
-        experiment = Experiment.objects.get(
-            name=str(self.cleaned_data["exp_id"]))
-        print(files)
-        factory = Factory.default(self.cleaned_data["factory"])
-        data_type = self.cleaned_data['data_type']
-
-        rt_df_list = [pd.DataFrame()]
-        
-        save_log = {
-            "file_name": [file.name for file in files],
-            "warning": [],
-        }
-        for file in files:
-            print(file.name)
-            if data_type == 'txt':
-                if not file.name.endswith('txt'):
-                    print(f'skip {file}')
-                    continue
-                tmp_df = pd.read_table(
-                    file, encoding="utf-8", encoding_errors="ignore")
-                rt_df_list.append(tmp_df)
-            elif data_type == 'xlsx':
-                if not file.name.endswith('xlsx'):
-                    print(f'skip {file}')
-                    continue
-                tmp_df = pd.read_excel(file)
-                rt_df_list.append(tmp_df)
-            else:
-                print('Something wrong, I should never touch this place.')
-                raise ValueError('wrong data type')
-        rt_df = pd.concat(rt_df_list)
-
-        # There are some row are the header, cause they just
-        # merge the file directory.
-        # Yea, I don't know why ether...
-        unwanted_mask = rt_df.iloc[:, 7].astype("str").str.match("[ a-zA-Z]+")
-        rt_df = rt_df[~unwanted_mask]
-        if len(rt_df) == 0:
-            save_log["warning"].append("No logable data found in the files after unwanted mask")
-            cache.set("save_log", save_log)
-            return
-
-        # modified types
-        for col in [3, 7, 17, 19]:
-            rt_df.iloc[:, col] = rt_df.iloc[:, col].astype("float")
-        # operator should be str
-        rt_df.iloc[:, 5] = rt_df.iloc[:, 5].astype("str")
-        # id should be str
-        rt_df.iloc[:, 2] = rt_df.iloc[:, 2].astype("str")
-
-        print(rt_df.head())
-        # 0. drop na for chip, date, time
-        rt_df = rt_df.dropna(
-            subset=[
-                rt_df.columns[0],  # Date
-                rt_df.columns[1],  # Time
-                rt_df.columns[2],  # ID
-                rt_df.columns[3],  # measure point
-                rt_df.columns[7],  # voltage
-            ]
-        )
-        # 1. trasform datetime
-        if data_type == 'txt':
-            rt_df["datetime"] = [
-                datetime.strptime(
-                    f"{rt_df.iloc[i, 0]} {rt_df.iloc[i, 1]} +0800", 
-                    r"%Y/%m/%d %H:%M:%S %z"
-                )
-                for i in range(len(rt_df))
-            ]
-        elif data_type == 'xlsx':
-            rt_df["datetime"] = [
-                datetime.strptime(
-                    f"{rt_df.iloc[i, 0]} {rt_df.iloc[i, 1]} +0800", 
-                    r"%Y/%m/%d %H:%M:%S %z"
-                )
-                for i in range(len(rt_df))
-            ]
-        # 2. drop duplicate(keep newer)
-        rt_df = rt_df.sort_values("datetime").drop_duplicates(
-            subset=[
-                # cause sometime the header maybe different?
-                # using the position otherwise.
-                rt_df.columns[2],  # ID
-                rt_df.columns[3],  # measure point
-                rt_df.columns[7],  # voltage
-            ],
-            keep="last",
+    def save(self, request) -> Job:
+        return Job.enqueue(
+            'td_toolkits_v3.opticals.tasks.rt_upload',
+            files=request.FILES.getlist("rts"),
+            user=request.user,
+            exp_id=str(self.cleaned_data["exp_id"]),
+            factory=self.cleaned_data["factory"],
+            log_id=self.cleaned_data["log_id"],
+            data_type=self.cleaned_data['data_type'],
         )
 
-        # 3. drop chip that already logged
-        if self.cleaned_data["log_id"] == "panel_id":
-            chip_could_log = [
-                i.name
-                for i in Chip.objects.filter(
-                    sub__condition__experiment=experiment, 
-                    responsetimelog__isnull=True
-                ).distinct()
-            ]
-        elif self.cleaned_data["log_id"] == "short_id":
-            chip_could_log = [
-                i.short_name
-                for i in Chip.objects.filter(
-                    sub__condition__experiment=experiment, 
-                    responsetimelog__isnull=True
-                ).distinct()
-            ]
-        else:
-            raise ValueError("Wrong log id")
-
-        rt_df = rt_df[rt_df.iloc[:, 2].isin(chip_could_log)]
-        if len(rt_df) == 0:
-            save_log["warning"].append("No logable data found in the files")
-            cache.set("save_log", save_log)
-            return
-        logs = []
-        instrument = Instrument.default(rt_df.iloc[0, 4], factory)
-
-        # 4. batch create for each chip
-        for chip_name in rt_df.iloc[:, 2].unique():
-            if self.cleaned_data["log_id"] == "panel_id":
-                chip = Chip.objects.get(
-                    name=chip_name, sub__condition__experiment=experiment
-                )
-            elif self.cleaned_data["log_id"] == "short_id":
-                chip = Chip.objects.get(
-                    short_name=chip_name, sub__condition__experiment=experiment
-                )
-            else:
-                raise ValueError("Wrong log id")
-            chip = chip
-            tmp_df = rt_df[rt_df.iloc[:, 2] == chip_name]
-            for row in tmp_df.to_numpy():
-                logs.append(
-                    ResponseTimeLog(
-                        chip=chip,
-                        measure_point=row[3],
-                        measure_time=row[-1],
-                        instrument=instrument,
-                        operator=row[5],
-                        voltage=row[7],
-                        time_rise=row[17],
-                        time_fall=row[19],
-                    )
-                )
-
-        ResponseTimeLog.objects.bulk_create(logs)
-
 
 class CalculateOpticalForm(forms.Form):
     exp_id = forms.ChoiceField(choices=[("", "")], initial=None)
@@ -727,42 +373,14 @@ class CalculateOpticalForm(forms.Form):
             last_exp_id = last_exp.name
             self.fields["exp_id"].initial = (last_exp_id, last_exp_id)
 
-    def calculate(self, request):
-
-        request.session["message"] = 'Error:'
-        data_loader = OptLoader(
-            self.cleaned_data['exp_id'],
-            self.cleaned_data['cell_gap'],
-        )
-
-        opt_df = data_loader.opt
-        rt_df = data_loader.rt
-
-        # Check both data have the same kinds of LC
-        if not (set(opt_df['LC'].unique()) == set(rt_df['LC'].unique())):
-            raise ValueError(
-                'The opt and rt has different kinds lc.'
-                f"opt_df: {opt_df['LC'].unique()}"
-                f"rt_df: {rt_df['LC'].unique()}"
-            )
-        
-        msg = ''
-            
-        for lc in opt_df['LC'].unique():
-            tmp_rt_df = rt_df[rt_df['LC'] == lc]
-            tmp_opt_df = opt_df[opt_df['LC'] == lc]
-            opt_fitting = OptFitting(lc, tmp_rt_df, tmp_opt_df)
-            msg = opt_fitting.save(lc, self.cleaned_data['exp_id'])
-
-        if type(msg) == str:
-            request.session["message"] = msg
-        else:
-            request.session["message"] = (
-                'Calculate '
-                f'{self.cleaned_data["exp_id"]}'
-                ' success.'
-            )
+    def calculate(self, request) -> Job:
         request.session["exp_id"] = self.cleaned_data['exp_id']
+        return Job.enqueue(
+            'td_toolkits_v3.opticals.tasks.calculate_optical',
+            user=request.user,
+            exp_id=self.cleaned_data['exp_id'],
+            cell_gap=self.cleaned_data['cell_gap'],
+        )
 
 class ProductModelTypeForm(forms.ModelForm):
     class Meta:
@@ -819,92 +437,25 @@ class FittingBaseForm(forms.Form):
     
 class OptFittingForm(FittingBaseForm):
     
-    def calculate(self, request):
-        request.session["message"] = 'Error:'
-        data_loader = OptLoader(
-            self.cleaned_data['exp_id'],
-            self.cleaned_data['cell_gap'],
-        )
-
-        opt_df = data_loader.opt
-        if type(opt_df) == str:
-            print(opt_df)
-            request.session["message"] = opt_df
-            return
-        elif type(opt_df) == pd.DataFrame:
-            # cast type of opt_df to dataframe
-            opt_df = opt_df
-        else:
-            raise ValueError('Wrong type of opt_df')
-            
-        opt_df['cfg'] = opt_df['LC'] + ',' + opt_df['PI'] + ',' + opt_df['Seal']
-
-        all_cfg = [
-            MaterialConfiguration(*c.split(',')) for c in opt_df.cfg.unique()
-        ]
-        
-        msg = ''
-        
-        for cfg in all_cfg:
-            tmp_opt_df = opt_df[
-                  (opt_df['LC']==cfg.lc) 
-                & (opt_df['PI']==cfg.pi)
-                & (opt_df['Seal']==cfg.seal)
-            ]
-            opt_fitting = OPTFitting(cfg, tmp_opt_df)
-            msg = opt_fitting.save(self.cleaned_data['exp_id'])
-
-        if type(msg) == str:
-            request.session["message"] = msg
-        else:
-            request.session["message"] =( 'Calculate '
-                f'{self.cleaned_data["exp_id"]}'
-                ' success.')
+    def calculate(self, request) -> Job:
         request.session["exp_id"] = self.cleaned_data['exp_id']
+        return Job.enqueue(
+            'td_toolkits_v3.opticals.tasks.opt_fitting',
+            user=request.user,
+            exp_id=self.cleaned_data['exp_id'],
+            cell_gap=self.cleaned_data['cell_gap'],
+        )
 
 class RTFittingForm(FittingBaseForm):
     
-    def calculate(self, request):
-        request.session["message"] = 'Error:'
-        data_loader = OptLoader(
-            self.cleaned_data['exp_id'],
-            self.cleaned_data['cell_gap'],
-        )
-
-        rt_df = data_loader.rt
-        if type(rt_df) == str:
-            print(rt_df)
-            request.session["message"] = rt_df
-            return
-        elif type(rt_df) == pd.DataFrame:
-            # cast type of opt_df to dataframe
-            rt_df = rt_df
-        else:
-            raise ValueError('Wrong type of rt_df')
-        rt_df['cfg'] = rt_df['LC'] + ',' + rt_df['PI'] + ',' + rt_df['Seal']
-
-        all_cfg = [
-            MaterialConfiguration(*c.split(',')) for c in rt_df.cfg.unique()
-        ]
-        
-        msg = ''
-        
-        for cfg in all_cfg:
-            tmp_rt_df = rt_df[
-                  (rt_df['LC']==cfg.lc) 
-                & (rt_df['PI']==cfg.pi)
-                & (rt_df['Seal']==cfg.seal)
-            ]
-            rt_fitting = RTFitting(cfg, tmp_rt_df)
-            msg = rt_fitting.save(self.cleaned_data['exp_id'])
-
-        if type(msg) == str:
-            request.session["message"] = msg
-        else:
-            request.session["message"] =( 'Calculate '
-                f'{self.cleaned_data["exp_id"]}'
-                ' success.')
+    def calculate(self, request) -> Job:
         request.session["exp_id"] = self.cleaned_data['exp_id']
+        return Job.enqueue(
+            'td_toolkits_v3.opticals.tasks.rt_fitting',
+            user=request.user,
+            exp_id=self.cleaned_data['exp_id'],
+            cell_gap=self.cleaned_data['cell_gap'],
+        )
         
 class ConfigurationForm(forms.Form):
     ...
@@ -933,12 +484,8 @@ class OpticalPhaseTwoForm(forms.Form):
         # Calculate result
         opt_tr2_result = OptTableGenerator(experiment, voltage=voltage, reference=reference)
         opt_tr2_result.calc()
-        # Save result to cookie
-        result = {
-            k: v.to_json() for
-            k, v in opt_tr2_result.tables.items()
-        }
-        request.session['result'] = result
+        # Save result to the store of the session
+        ResultStore(request.session)['result'] = opt_tr2_result.tables
         
 class AdvancedContrastRatioForm(forms.Form):
     experiment = forms.ModelChoiceField(
@@ -985,7 +532,8 @@ class AdvancedContrastRatioForm(forms.Form):
             try:
                 # If there is RTFiggingModel of ref LC, get
                 # Vop from Tr and cell gap
-                vop = RTFittingModel.objects.get(
+                vop = model_registry.get(
+                    RTFittingModel.objects.all(),
                     lc=reference.lc,
                     experiment=self.cleaned_data['experiment'],
                 ).voltage.predict(np.array([[
@@ -1007,10 +555,10 @@ class AdvancedContrastRatioForm(forms.Form):
             ) for lc in lcs
         }
         
-        for model in OptFittingModel.objects.filter(
+        for model in model_registry.all(OptFittingModel.objects.filter(
             experiment=experiment,
             lc__name__in=lc_properties.keys()
-        ):
+        )):
             result["LC"] += [model.lc.name]
             result["PI"] += [model.pi.name]
             result["Seal"] += [model.seal.name]
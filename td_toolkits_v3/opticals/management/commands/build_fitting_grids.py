@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from td_toolkits_v3.opticals.models import (
+    OpticalLog,
+    OptFittingModel,
+    ResponseTimeLog,
+    RTFittingModel,
+)
+from td_toolkits_v3.opticals.tools.grid import fitting_grid
+
+# the OPT models are fitted on the logs above the cutoff, see OPTFitting
+OPT_CUTOFF = 3
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute the prediction grids of the fitting models. Without --all, "
+        "only the models without grid, like the ones fitted before the grids."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="Rebuild the grids of all the models.",
+        )
+        parser.add_argument(
+            '--voltage',
+            nargs=2,
+            type=float,
+            metavar=('MIN', 'MAX'),
+            help="The voltage range, default is the range of the model's logs.",
+        )
+
+    @staticmethod
+    def voltage_range(fitting_model, log_model, cutoff=None):
+        """
+        The voltage range of the logs the model is fitted on, the voltage
+        range of the fitting is not stored.
+        """
+        logs = log_model.objects.filter(
+            chip__sub__condition__experiment=fitting_model.experiment,
+            chip__lc=fitting_model.lc,
+            chip__pi=fitting_model.pi,
+            chip__seal=fitting_model.seal,
+        )
+        if cutoff is not None:
+            logs = logs.filter(voltage__gt=cutoff)
+        voltage = logs.aggregate(min=Min('voltage'), max=Max('voltage'))
+        if voltage['min'] is None or voltage['min'] == voltage['max']:
+            return None
+        return voltage['min'], voltage['max']
+
+    def handle(self, *args, **options):
+        for fitting_class, log_model, cutoff in [
+            (OptFittingModel, OpticalLog, OPT_CUTOFF),
+            (RTFittingModel, ResponseTimeLog, None),
+        ]:
+            fitting_models = fitting_class.objects.select_related(
+                'experiment', 'lc', 'pi', 'seal')
+            if not options['all']:
+                fitting_models = fitting_models.filter(grid__isnull=True)
+
+            built = 0
+            for fitting_model in fitting_models:
+                voltage_range = (
+                    options['voltage']
+                    or self.voltage_range(fitting_model, log_model, cutoff)
+                )
+                if voltage_range is None:
+                    self.stdout.write(f"  skip {fitting_model}, no logs")
+                    continue
+                fitting_model.grid = fitting_grid(fitting_model, voltage_range)
+                # the modified time reloads the models in the registry
+                fitting_model.save()
+                built += 1
+            self.stdout.write(f"{fitting_class.__name__}: {built}")
@@ -0,0 +1,79 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_date
+
+from td_toolkits_v3.opticals.tools.export import OpticalExport
+from td_toolkits_v3.products.models import Experiment
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the OPT and RT data into the partitioned parquet dataset. "
+        "Without experiments, export the ones changed since the last export."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'experiments',
+            nargs='*',
+            help="The experiment names.",
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="Export all the experiments.",
+        )
+        parser.add_argument(
+            '--since',
+            help="Export the experiments changed since the date(time).",
+        )
+        parser.add_argument(
+            '--cell-gap',
+            default='axo',
+            choices=['axo', 'rdl', 'rdl_alter', 'None'],
+            help="The cell gap method.",
+        )
+        parser.add_argument(
+            '--root',
+            help="The directory of the dataset, default is OPT_EXPORT_DIR.",
+        )
+
+    def handle(self, *args, **options):
+        cell_gap = options['cell_gap']
+        export = OpticalExport(
+            None if cell_gap == 'None' else cell_gap, options['root'])
+        started = timezone.now()
+
+        if options['experiments']:
+            names = options['experiments']
+        elif options['all']:
+            names = list(Experiment.objects.values_list('name', flat=True))
+        else:
+            since = export.last_exported
+            if options['since']:
+                since = (
+                    parse_datetime(options['since'])
+                    or parse_date(options['since'])
+                )
+                if since is None:
+                    raise CommandError(f"Invalid time: {options['since']}")
+                if not isinstance(since, datetime):
+                    since = datetime.combine(since, time.min)
+                if timezone.is_naive(since):
+                    since = timezone.make_aware(since)
+            names = (
+                list(Experiment.objects.values_list('name', flat=True))
+                if since is None else export.changed_since(since)
+            )
+
+        report = export.export(names)
+        if not options['experiments']:
+            # the next export starts from here
+            export.mark_exported(started)
+        for action, partitions in report.items():
+            self.stdout.write(f"{action}: {len(partitions)}")
+            for kind, name in partitions:
+                if action in ['written', 'removed']:
+                    self.stdout.write(f"  {kind} {name}")
@@ -0,0 +1,88 @@
+# Convert the pickled sklearn pipelines of the fitting models to the
+# compact coefficient form.
+
+from django.db import migrations
+import td_toolkits_v3.opticals.models
+
+from td_toolkits_v3.opticals.tools.compact import CompactModel
+
+FITTING_FIELDS = {
+    'opticalsfittingmodel': [
+        'voltage', 'response_time', 'time_rise', 'time_fall',
+        'w_x', 'w_y', 'w_capital_y', 'lc_percent', 'transmittance', 'v_percent',
+    ],
+    'optfittingmodel': [
+        'w_x', 'w_y', 'w_capital_y', 'lc_percent', 'transmittance', 'v_percent',
+    ],
+    'rtfittingmodel': [
+        'voltage', 'response_time', 'time_rise', 'time_fall',
+    ],
+}
+
+
+def convert_pickles(apps, schema_editor):
+    for model_name, fields in FITTING_FIELDS.items():
+        model = apps.get_model('opticals', model_name)
+        for obj in model.objects.all():
+            for field in fields:
+                try:
+                    compact = CompactModel.from_pipeline(
+                        getattr(obj, f'{field}_pickle')
+                    )
+                except Exception as e:
+                    raise RuntimeError(
+                        f'Can not convert {field} of {model_name} {obj.pk}, '
+                        'the pickle may be from another sklearn version, '
+                        'delete the model and fit it again.'
+                    ) from e
+                setattr(obj, field, compact)
+            obj.save(update_fields=fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opticals', '0040_alterrdlcellgap'),
+    ]
+
+    operations = [
+        *[
+            migrations.RenameField(
+                model_name=model_name,
+                old_name=field,
+                new_name=f'{field}_pickle',
+            )
+            for model_name, fields in FITTING_FIELDS.items()
+            for field in fields
+        ],
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name=field,
+                field=td_toolkits_v3.opticals.models.CompactModelField(
+                    null=True
+                ),
+            )
+            for model_name, fields in FITTING_FIELDS.items()
+            for field in fields
+        ],
+        # the pickles are dropped, so it could not be reversed
+        migrations.RunPython(convert_pickles),
+        *[
+            migrations.RemoveField(
+                model_name=model_name,
+                name=f'{field}_pickle',
+            )
+            for model_name, fields in FITTING_FIELDS.items()
+            for field in fields
+        ],
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name=field,
+                field=td_toolkits_v3.opticals.models.CompactModelField(),
+            )
+            for model_name, fields in FITTING_FIELDS.items()
+            for field in fields
+        ],
+    ]
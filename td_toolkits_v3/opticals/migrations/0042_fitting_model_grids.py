@@ -0,0 +1,24 @@
+# Generated by Django 3.2.13 on 2026-10-17 13:44
+
+from django.db import migrations
+import td_toolkits_v3.opticals.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('opticals', '0041_compact_fitting_models'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='optfittingmodel',
+            name='grid',
+            field=td_toolkits_v3.opticals.models.PredictionGridField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rtfittingmodel',
+            name='grid',
+            field=td_toolkits_v3.opticals.models.PredictionGridField(blank=True, null=True),
+        ),
+    ]
@@ -3,9 +3,48 @@ from django.urls import reverse
 
 from autoslug import AutoSlugField
 from model_utils.models import TimeStampedModel
-from picklefield.fields import PickledObjectField
 
 import td_toolkits_v3.materials.models as Material
+from td_toolkits_v3.opticals.tools.compact import CompactModel
+from td_toolkits_v3.opticals.tools.grid import PredictionGrid
+
+
+class CompactModelField(models.JSONField):
+    """
+    The fitting model in compact form, see `CompactModel`.
+    The fitted sklearn pipeline is converted when saving.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        value = super().from_db_value(value, expression, connection)
+        if isinstance(value, dict) and 'coef' in value:
+            return CompactModel.from_dict(value)
+        return value
+
+    def get_prep_value(self, value):
+        if value is not None and not isinstance(value, dict):
+            if not isinstance(value, CompactModel):
+                value = CompactModel.from_pipeline(value)
+            value = value.as_dict()
+        return super().get_prep_value(value)
+
+
+class PredictionGridField(models.JSONField):
+    """
+    The precomputed predictions of a fitting model, see `PredictionGrid`.
+    """
+
+    def from_db_value(self, value, expression, connection):
+        value = super().from_db_value(value, expression, connection)
+        if isinstance(value, dict) and 'values' in value:
+            return PredictionGrid.from_dict(value)
+        return value
+
+    def get_prep_value(self, value):
+        if isinstance(value, PredictionGrid):
+            value = value.as_dict()
+        return super().get_prep_value(value)
+
 
 class Instrument(TimeStampedModel):
     name = models.CharField("Instrument Name", max_length=255)
@@ -236,17 +275,17 @@ class OpticalsFittingModel(TimeStampedModel):
     
     # Fitting models
     # RTs
-    voltage = PickledObjectField()
-    response_time = PickledObjectField()
-    time_rise = PickledObjectField()
-    time_fall = PickledObjectField()
+    voltage = CompactModelField()
+    response_time = CompactModelField()
+    time_rise = CompactModelField()
+    time_fall = CompactModelField()
     # OPTs
-    w_x = PickledObjectField()
-    w_y = PickledObjectField()
-    w_capital_y = PickledObjectField()
-    lc_percent = PickledObjectField()
-    transmittance = PickledObjectField()
-    v_percent = PickledObjectField()
+    w_x = CompactModelField()
+    w_y = CompactModelField()
+    w_capital_y = CompactModelField()
+    lc_percent = CompactModelField()
+    transmittance = CompactModelField()
+    v_percent = CompactModelField()
     # collect all r2
     r2 = models.JSONField()
 
@@ -311,14 +350,19 @@ class OptFittingModel(TimeStampedModel):
     
     # Fitting models
     # OPTs
-    w_x = PickledObjectField()
-    w_y = PickledObjectField()
-    w_capital_y = PickledObjectField()
-    lc_percent = PickledObjectField()
-    transmittance = PickledObjectField()
-    v_percent = PickledObjectField()
+    w_x = CompactModelField()
+    w_y = CompactModelField()
+    w_capital_y = CompactModelField()
+    lc_percent = CompactModelField()
+    transmittance = CompactModelField()
+    v_percent = CompactModelField()
     # collect all r2
     r2 = models.JSONField()
+    # predictions of the (Vop, Cell Gap) models, computed when fitting
+    grid = PredictionGridField(null=True, blank=True)
+    # the colorimetry models are predicted directly, their differences
+    # (Δa*, Δb*, ...) amplify the interpolation error of the grid
+    grid_fields = ['lc_percent', 'transmittance']
     
     def __str__(self):
         return f"opt fitting model of {self.slug}"
@@ -360,12 +404,15 @@ class RTFittingModel(TimeStampedModel):
     
     # Fitting models
     # RTs
-    voltage = PickledObjectField()
-    response_time = PickledObjectField()
-    time_rise = PickledObjectField()
-    time_fall = PickledObjectField()
+    voltage = CompactModelField()
+    response_time = CompactModelField()
+    time_rise = CompactModelField()
+    time_fall = CompactModelField()
     # collect all r2
     r2 = models.JSONField()
+    # predictions of the (Vop, Cell Gap) models, computed when fitting
+    grid = PredictionGridField(null=True, blank=True)
+    grid_fields = ['response_time', 'time_rise']
     
     def __str__(self):
         return f"rt fitting model of {self.slug}" 
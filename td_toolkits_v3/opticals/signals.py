@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from td_toolkits_v3.opticals.models import (
+    OpticalsFittingModel,
+    OptFittingModel,
+    RTFittingModel,
+)
+from td_toolkits_v3.opticals.tools.registry import model_registry
+
+
+@receiver(post_save, sender=OptFittingModel)
+@receiver(post_save, sender=RTFittingModel)
+@receiver(post_save, sender=OpticalsFittingModel)
+@receiver(post_delete, sender=OptFittingModel)
+@receiver(post_delete, sender=RTFittingModel)
+@receiver(post_delete, sender=OpticalsFittingModel)
+def invalidate_fitting_model(sender, instance, **kwargs):
+    model_registry.invalidate(instance)
@@ -0,0 +1,225 @@
+"""
+The long work of opticals, run as jobs by the local worker.
+"""
+from typing import Optional
+
+import pandas as pd
+
+from django.db import transaction
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from td_toolkits_v3.jobs.models import Job
+from td_toolkits_v3.products.models import Experiment, Factory
+from td_toolkits_v3.utils.lookups import Lookups
+
+from .models import (
+    OpticalLog,
+    OptFittingModel,
+    ResponseTimeLog,
+    RTFittingModel,
+)
+from .tools.export import OpticalExport
+from .tools.fitting import FittingExecutor
+from .tools.ingest import OptIngest, RTIngest
+from .tools.utils import (
+    OptLoader,
+    OptFitting, # TODO: to be deprecated
+    OPTFitting,
+    RTFitting,
+    MaterialConfiguration,
+)
+
+
+def opt_upload(job: Job, exp_id: str, factory: str, log_id: str) -> dict:
+    experiment = Experiment.objects.get(name=exp_id)
+
+    # Read, clean and deduplicate the files chunk by chunk,
+    # then bulk create by batches.
+    lookups = Lookups()
+    ingest = OptIngest(
+        experiment=experiment,
+        factory=lookups.get(Factory, factory),
+        log_id=log_id,
+        lookups=lookups,
+    )
+    csv_files = []
+    for file in job.open_files():
+        if not file.name.endswith('csv'):
+            ingest.save_log["file_name"].append(file.name)
+            ingest.save_log["warning"].append(
+                f"File {file.name} is not a csv file, skip it."
+            )
+            continue
+        csv_files.append(file)
+    job.set_progress(0.1, f"Parsing {len(csv_files)} files")
+    ingest.feed_all(csv_files)
+    job.set_progress(0.6, f"Saving {len(ingest.df)} logs")
+    with transaction.atomic():
+        ingest.save()
+    job.set_progress(0.9, "Writing snapshot")
+    OptLoader(exp_id).snapshot(OptLoader.opt_header, OpticalLog).refresh()
+    return {'save_log': ingest.save_log}
+
+
+def rt_upload(
+    job: Job,
+    exp_id: str,
+    factory: str,
+    log_id: str,
+    data_type: str,
+) -> dict:
+    experiment = Experiment.objects.get(name=exp_id)
+
+    lookups = Lookups()
+    ingest = RTIngest(
+        experiment=experiment,
+        factory=lookups.get(Factory, factory),
+        log_id=log_id,
+        lookups=lookups,
+        data_type=data_type,
+    )
+    rt_files = []
+    for file in job.open_files():
+        if not file.name.endswith(data_type):
+            ingest.save_log["file_name"].append(file.name)
+            ingest.save_log["warning"].append(
+                f"File {file.name} is not a {data_type} file, skip it."
+            )
+            continue
+        rt_files.append(file)
+    job.set_progress(0.1, f"Parsing {len(rt_files)} files")
+    ingest.feed_all(rt_files)
+    job.set_progress(0.6, f"Saving {len(ingest.df)} logs")
+    with transaction.atomic():
+        ingest.save()
+    job.set_progress(0.9, "Writing snapshot")
+    OptLoader(exp_id).snapshot(OptLoader.rt_header, ResponseTimeLog).refresh()
+    return {'save_log': ingest.save_log}
+
+
+def opt_export(job: Job, cell_gap: Optional[str], names: list) -> dict:
+    """
+    Export the partitions of the experiments, the unchanged ones are
+    skipped, then the dataset is downloaded by the job.
+    """
+    export = OpticalExport(cell_gap)
+    warnings = []
+    for i, name in enumerate(names):
+        job.set_progress(i / len(names), f"Exporting {name}")
+        for kind, _ in export.export([name])['empty']:
+            warnings.append(f"There is no {kind} data of {name}.")
+    return {
+        'save_log': {
+            'file_name': list(export.files(names)),
+            'warning': warnings,
+        },
+        'nexts': {
+            'Download': reverse('opticals:bulk_dump')
+            + '?' + urlencode({'job': job.pk}),
+        },
+    }
+
+
+def success_message(exp_id: str, msg) -> str:
+    if type(msg) == str:
+        return msg
+    return f'Calculate {exp_id} success.'
+
+
+def fit_configurations(
+    job: Job,
+    exp_id: str,
+    df: pd.DataFrame,
+    fitting_class,
+    fitting_model,
+) -> str:
+    """
+    Fit the models of every (LC, PI, Seal) configuration on the process
+    pool, then save them in one transaction.
+    """
+    df['cfg'] = df['LC'] + ',' + df['PI'] + ',' + df['Seal']
+    all_cfg = [
+        MaterialConfiguration(*c.split(',')) for c in df.cfg.unique()
+    ]
+    fittings = [
+        fitting_class(cfg, df[
+              (df['LC']==cfg.lc)
+            & (df['PI']==cfg.pi)
+            & (df['Seal']==cfg.seal)
+        ])
+        for cfg in all_cfg
+    ]
+
+    # the saved configurations are not fitted again, see `save`
+    saved = set(
+        fitting_model.objects.filter(experiment__name=exp_id)
+        .values_list('lc__name', 'pi__name', 'seal__name')
+    )
+    FittingExecutor(
+        [fitting for fitting in fittings if tuple(fitting.name) not in saved]
+    ).run(
+        lambda done, total: job.set_progress(
+            0.9 * done / total, f"Fitting {done}/{total} models"
+        )
+    )
+
+    job.set_progress(0.9, f"Saving {len(fittings)} configurations")
+    msg = ''
+    with transaction.atomic():
+        for fitting in fittings:
+            msg = fitting.save(exp_id)
+    return msg
+
+
+def opt_fitting(job: Job, exp_id: str, cell_gap: str) -> dict:
+    data_loader = OptLoader(exp_id, cell_gap)
+
+    opt_df = data_loader.opt
+    if type(opt_df) == str:
+        return {'message': opt_df}
+    elif type(opt_df) != pd.DataFrame:
+        raise ValueError('Wrong type of opt_df')
+
+    msg = fit_configurations(job, exp_id, opt_df, OPTFitting, OptFittingModel)
+    return {'message': success_message(exp_id, msg)}
+
+
+def rt_fitting(job: Job, exp_id: str, cell_gap: str) -> dict:
+    data_loader = OptLoader(exp_id, cell_gap)
+
+    rt_df = data_loader.rt
+    if type(rt_df) == str:
+        return {'message': rt_df}
+    elif type(rt_df) != pd.DataFrame:
+        raise ValueError('Wrong type of rt_df')
+
+    msg = fit_configurations(job, exp_id, rt_df, RTFitting, RTFittingModel)
+    return {'message': success_message(exp_id, msg)}
+
+
+def calculate_optical(job: Job, exp_id: str, cell_gap: str) -> dict:
+    data_loader = OptLoader(exp_id, cell_gap)
+
+    opt_df = data_loader.opt
+    rt_df = data_loader.rt
+
+    # Check both data have the same kinds of LC
+    if not (set(opt_df['LC'].unique()) == set(rt_df['LC'].unique())):
+        raise ValueError(
+            'The opt and rt has different kinds lc.'
+            f"opt_df: {opt_df['LC'].unique()}"
+            f"rt_df: {rt_df['LC'].unique()}"
+        )
+
+    msg = ''
+    all_lc = opt_df['LC'].unique()
+    for i, lc in enumerate(all_lc):
+        job.set_progress(i / len(all_lc), f"Fitting {lc}")
+        tmp_rt_df = rt_df[rt_df['LC'] == lc]
+        tmp_opt_df = opt_df[opt_df['LC'] == lc]
+        opt_fitting = OptFitting(lc, tmp_rt_df, tmp_opt_df)
+        with transaction.atomic():
+            msg = opt_fitting.save(lc, exp_id)
+
+    return {'message': success_message(exp_id, msg)}
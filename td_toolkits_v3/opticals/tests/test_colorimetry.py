@@ -0,0 +1,50 @@
+import numpy as np
+
+from ..tools.colorimetry import color_columns
+
+
+def f(x, white):
+    ratio = x / white
+    return np.where(
+        ratio < 0.008856, 7.787 * ratio + 16 / 116, np.abs(ratio) ** (1 / 3))
+
+
+def test_color_columns():
+    rng = np.random.default_rng(0)
+    wx = rng.uniform(0.28, 0.32, 12)
+    wy = rng.uniform(0.30, 0.34, 12)
+    w_capital_y = rng.uniform(0.1, 200, 12)
+    color = color_columns(wx, wy, w_capital_y)
+
+    w_capital_x = wx * w_capital_y / wy
+    w_capital_z = (1 - wx - wy) * w_capital_y / wy
+    f_x, f_y, f_z = (
+        f(w_capital_x, 95.04), f(w_capital_y, 100.), f(w_capital_z, 108.86))
+    a, b, lightness = 500 * (f_x - f_y), 200 * (f_y - f_z), 116 * f_y - 16
+    u = 4 * wx / (-2 * wx + 12 * wy + 3)
+    v = 9 * wy / (-2 * wx + 12 * wy + 3)
+    for column, expect in [
+        ('WX', w_capital_x),
+        ('WZ', w_capital_z),
+        ('a*', a),
+        ('b*', b),
+        ('L*', lightness),
+        ("u'", u),
+        ("v'", v),
+        ('ΔEab*', np.linalg.norm([
+            np.diff(a, prepend=0),
+            np.diff(b, prepend=0),
+            np.diff(lightness, prepend=0),
+        ], axis=0)),
+        ("Δu'v'", np.linalg.norm(
+            [np.diff(u, prepend=0), np.diff(v, prepend=0)], axis=0)),
+    ]:
+        np.testing.assert_allclose(color[column], expect)
+
+    # the stacked configurations do not bleed into each other
+    stacked = color_columns(
+        np.tile(wx, 2), np.tile(wy, 2), np.tile(w_capital_y, 2),
+        groups=np.repeat([0, 1], 12),
+    )
+    for column, value in stacked.items():
+        np.testing.assert_allclose(value, np.tile(color[column], 2))
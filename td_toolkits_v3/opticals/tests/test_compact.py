@@ -0,0 +1,60 @@
+import json
+
+import numpy as np
+import pytest
+from sklearn import linear_model
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import (
+    FunctionTransformer,
+    PolynomialFeatures,
+    StandardScaler,
+)
+
+from ..tools.compact import CompactModel, predict_stacked
+from ..tools.utils import OPTFitting, RTFitting
+
+
+@pytest.mark.parametrize('transformer', [
+    None,
+    PolynomialFeatures(degree=2),
+    FunctionTransformer(OPTFitting._opt_transformer_f),
+    FunctionTransformer(OPTFitting._v_percent_model_tranformer_f),
+    FunctionTransformer(RTFitting._rt_transformer_f),
+])
+def test_compact_model(transformer):
+    rng = np.random.default_rng(0)
+    x = rng.uniform([1, 3], [8, 4], size=(100, 2))
+    y = x[:, 0] ** 2 + x[:, 1] + rng.normal(0, 0.1, 100)
+    steps = [('Scalar', StandardScaler())]
+    if transformer is not None:
+        steps.append(('Custom Transform', transformer))
+    steps.append(('Linear', linear_model.LinearRegression(
+        fit_intercept=transformer is None
+    )))
+    pipeline = Pipeline(steps).fit(x, y)
+
+    compact = CompactModel.from_pipeline(pipeline)
+    # stored as a small json
+    loaded = CompactModel.from_dict(json.loads(json.dumps(compact.as_dict())))
+    assert loaded == compact
+    np.testing.assert_allclose(loaded.predict(x), pipeline.predict(x))
+
+
+def test_predict_stacked():
+    rng = np.random.default_rng(0)
+    x = rng.uniform([1, 3], [8, 4], size=(50, 2))
+    models = [
+        CompactModel(basis, rng.normal(size=2), rng.uniform(1, 2, size=2),
+                     rng.normal(size=n), rng.normal(), powers)
+        for basis, n, powers in [
+            ('opt', 7, None),
+            ('rt', 5, None),
+            ('opt', 7, None),
+            ('poly', 3, [[0, 0], [1, 0], [0, 1]]),
+            ('identity', 2, None),
+        ]
+    ]
+    np.testing.assert_allclose(
+        predict_stacked(models, x),
+        [model.predict(x) for model in models],
+    )
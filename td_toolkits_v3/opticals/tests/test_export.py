@@ -0,0 +1,95 @@
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from td_toolkits_v3.jobs.models import Job
+from td_toolkits_v3.users.tests.factories import UserFactory
+
+from ..models import OpticalLog
+from ..tools.export import OpticalExport
+from .test_ingest import experiment_with_chips, opt_ingest  # noqa: F401
+
+pytestmark = pytest.mark.django_db
+
+
+def test_optical_export(experiment_with_chips, client):
+    opt_ingest(experiment_with_chips).save()
+    name = experiment_with_chips.name
+    export = OpticalExport(None)
+
+    report = export.export([name])
+    assert report['written'] == [('OPT', name)]
+    # no RT logs
+    assert not export.partition('RT', name).exists()
+    dataset = pd.read_parquet(export.root / 'kind=OPT' / 'cell_gap=None')
+    assert set(dataset['experiment']) == {name}
+    assert len(dataset) == OpticalLog.objects.count()
+
+    # only the changed partitions are written again
+    assert export.export([name])['skipped'] == [('OPT', name)]
+    log = OpticalLog.objects.first()
+    log.w_x = 0.5
+    log.save()
+    assert export.export([name])['written'] == [('OPT', name)]
+    assert export.changed_since(timezone.now() - timedelta(hours=1)) == [name]
+    assert export.changed_since(timezone.now()) == []
+
+    # the command exports the changed ones since the last export
+    out = io.StringIO()
+    call_command('export_opticals', '--cell-gap', 'None', stdout=out)
+    assert 'skipped: 1' in out.getvalue()
+    assert export.last_exported is not None
+    out = io.StringIO()
+    call_command('export_opticals', '--cell-gap', 'None', stdout=out)
+    assert 'skipped: 0' in out.getvalue()
+
+    # the writers of the threads do not share the temp file
+    path = export.partition('OPT', name)
+    df = pd.read_parquet(path)
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(
+            lambda _: export.write(path, df, 'stamp'), range(8)))
+    assert export.stored_stamp(path) == 'stamp'
+    assert os.listdir(path.parent) == [path.name]
+
+
+def test_optical_bulk_dump_view(experiment_with_chips, client, user):
+    opt_ingest(experiment_with_chips).save()
+    name = experiment_with_chips.name
+    export = OpticalExport(None)
+    query = {'exp': name, 'cell_gap': 'None'}
+
+    client.logout()
+    response = client.get(reverse('opticals:bulk_dump'), query)
+    assert response.status_code == 302
+    assert not Job.objects.exists()
+
+    # exported by a job, then downloaded from the job
+    client.force_login(user)
+    response = client.get(reverse('opticals:bulk_dump'), query)
+    job = Job.objects.get()
+    assert response.url == reverse('jobs:detail', kwargs={'pk': job.pk})
+    assert job.status == Job.Status.SUCCESS
+    partition = (
+        export.partition('OPT', name).relative_to(export.root).as_posix())
+    assert job.result['save_log'] == {
+        'file_name': [partition],
+        'warning': [f'There is no RT data of {name}.'],
+    }
+    response = client.get(job.result['nexts']['Download'])
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+    assert archive.namelist() == [partition]
+
+    # only the user of the job downloads it
+    client.force_login(UserFactory())
+    response = client.get(job.result['nexts']['Download'])
+    assert response.status_code == 404
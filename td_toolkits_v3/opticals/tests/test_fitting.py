@@ -0,0 +1,38 @@
+from ..tools.fitting import FittingExecutor
+
+
+class SquareFitting():
+    def __init__(self, x):
+        self.x = x
+        self.r2 = {}
+        self.fitted = {}
+
+    def model_names(self):
+        return ['square_model', 'cube_model']
+
+    @property
+    def square_model(self):
+        self.r2['square'] = 1
+        return self.x ** 2
+
+    @property
+    def cube_model(self):
+        self.r2['cube'] = 1
+        return self.x ** 3
+
+    def set_fitted(self, model_name, model, r2):
+        self.fitted[model_name] = model
+        self.r2.update(r2)
+
+
+def test_fitting_executor():
+    progress = []
+    fittings = FittingExecutor(
+        [SquareFitting(2), SquareFitting(3)], workers=1
+    ).run(lambda done, total: progress.append((done, total)))
+    assert [fitting.fitted for fitting in fittings] == [
+        {'square_model': 4, 'cube_model': 8},
+        {'square_model': 9, 'cube_model': 27},
+    ]
+    assert fittings[0].r2 == {'square': 1, 'cube': 1}
+    assert progress[-1] == (4, 4)
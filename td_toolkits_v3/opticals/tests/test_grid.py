@@ -0,0 +1,45 @@
+import json
+
+import numpy as np
+
+from ..tools.compact import CompactModel
+from ..tools.grid import PredictionGrid, covering_range
+
+
+def test_prediction_grid():
+    rng = np.random.default_rng(0)
+    models = {
+        'transmittance': CompactModel(
+            'opt', [5, 3], [1.5, 0.3], rng.normal(size=7) * [1, 5, 5, 3, 2, 1, 1]),
+        'time_rise': CompactModel('rt', [5, 3], [1.5, 0.3], rng.normal(size=5)),
+    }
+    grid = PredictionGrid.from_models(
+        models, (3, 8), covering_range((2.8, 3.2), 3.0), tolerance=1e-3)
+    assert grid.cell_gaps[0] == 2.4 and grid.cell_gaps[-1] == 3.5
+    assert max(grid.error.values()) <= 1e-3
+    # stored as json
+    grid = PredictionGrid.from_dict(json.loads(json.dumps(grid.as_dict())))
+
+    x = rng.uniform([3, 2.4], [8, 3.5], size=(200, 2))
+    for field, model in models.items():
+        expect = model.predict(x)
+        scale = np.ptp(grid.values[grid.fields.index(field)])
+        # the exactness check against the direct prediction
+        np.testing.assert_allclose(
+            grid.predict(field, x, model, tolerance=1e-3), expect,
+            rtol=0, atol=1e-3 * scale,
+        )
+
+    # the points out of the grid are predicted directly
+    outside = np.array([[9, 3], [5, 3]])
+    predict = grid.predict('time_rise', outside, models['time_rise'])
+    assert predict[0] == models['time_rise'].predict(outside[:1])[0]
+
+    # the field not reaching the tolerance is predicted directly
+    coarse = PredictionGrid.from_models(
+        models, (3, 8), (2.4, 3.5), tolerance=1e-12, max_nodes=17)
+    assert coarse.error['transmittance'] > 1e-12
+    np.testing.assert_array_equal(
+        coarse.predict('transmittance', x, models['transmittance'], 1e-12),
+        models['transmittance'].predict(x),
+    )
@@ -0,0 +1,210 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import pandas as pd
+
+from django.core.files import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+pytestmark = pytest.mark.django_db
+
+from td_toolkits_v3.products.models import Chip, Experiment, Factory
+
+from .factories import (
+    TEST_DIR,
+    MATERIAL_TEST_FILE_DIR,
+    PRODUCT_TEST_FILE_DIR,
+    TOC_OPT_TEST_FILES_DIR,
+    AXO_TEST_FILES_DIR,
+)
+from ..models import OpticalLog, RDLCellGap
+from ..tools.ingest import (
+    AxoIngest,
+    FileSource,
+    OptIngest,
+    RTIngest,
+    parse_source,
+)
+from ..tools.snapshot import LogSnapshot
+from ..tools.utils import OptLoader
+
+TOC_RT_TEST_FILE_DIR = TEST_DIR / r'test_files/rt/total_table_0324.txt'
+
+
+@pytest.fixture
+def experiment_with_chips(client, user):
+    client.force_login(user)
+    with open(MATERIAL_TEST_FILE_DIR, 'rb') as fp:
+        client.post(reverse('materials:upload'), {'materials': fp})
+    with open(PRODUCT_TEST_FILE_DIR, 'rb') as fp:
+        client.post(
+            reverse('products:chip_upload'),
+            {'chips': fp, 'fab': ('rdl', 'rdl')}
+        )
+    return Experiment.objects.last()
+
+
+def opt_ingest(experiment, workers=1, **kwargs):
+    ingest = OptIngest(
+        experiment, Factory.default('TOC'), workers=workers, **kwargs
+    )
+    _, _, files = next(os.walk(TOC_OPT_TEST_FILES_DIR))
+    fps = [open(TOC_OPT_TEST_FILES_DIR / file, 'rb') for file in sorted(files)]
+    ingest.feed_all([File(fp, name=os.path.basename(fp.name)) for fp in fps])
+    for fp in fps:
+        fp.close()
+    return ingest
+
+
+def test_opt_ingest_chunks(experiment_with_chips):
+    whole = opt_ingest(experiment_with_chips).df
+    # the duplicates across chunks and files should keep the newest one
+    chunked = opt_ingest(experiment_with_chips, chunk_size=300).df
+
+    # parse files on process pool
+    parallel = opt_ingest(experiment_with_chips, workers=2).df
+
+    key = ['ID', 'Point', 'Vop']
+    whole = whole.sort_values(key).reset_index(drop=True)
+    chunked = chunked.sort_values(key).reset_index(drop=True)
+    parallel = parallel.sort_values(key).reset_index(drop=True)
+    assert len(whole) > 0
+    assert not whole.duplicated(key).any()
+    assert whole.equals(chunked)
+    assert whole.equals(parallel)
+
+
+def test_opt_ingest_save(experiment_with_chips):
+    ingest = opt_ingest(experiment_with_chips, batch_size=1000)
+    count = ingest.save()
+    assert count == len(ingest.df)
+    assert OpticalLog.objects.count() == count
+    assert not any(
+        'No logable' in warning for warning in ingest.save_log['warning']
+    )
+
+
+def test_rt_ingest_xlsx(experiment_with_chips, tmp_path):
+    factory = Factory.default('TOC')
+    txt_ingest = RTIngest(experiment_with_chips, factory)
+    with open(TOC_RT_TEST_FILE_DIR, 'rb') as fp:
+        txt_ingest.feed(File(fp, name=TOC_RT_TEST_FILE_DIR.name))
+
+    # the excel exported by instrument has typed date and time cells
+    raw = pd.read_table(TOC_RT_TEST_FILE_DIR, encoding_errors='ignore')
+    date = pd.to_datetime(raw.iloc[:, 0], format=r'%Y/%m/%d', errors='coerce')
+    time = pd.to_datetime(raw.iloc[:, 1], format=r'%H:%M:%S', errors='coerce')
+    raw.iloc[:, 0] = date.where(date.notna(), raw.iloc[:, 0])
+    raw.iloc[:, 1] = time.dt.time.where(time.notna(), raw.iloc[:, 1])
+    xlsx_file = tmp_path / 'rt.xlsx'
+    raw.to_excel(xlsx_file, index=False)
+
+    xlsx_ingest = RTIngest(
+        experiment_with_chips, factory, data_type='xlsx', chunk_size=500
+    )
+    with open(xlsx_file, 'rb') as fp:
+        xlsx_ingest.feed(File(fp, name='rt.xlsx'))
+
+    key = ['ID', 'Point', 'Vop']
+    columns = key + ['datetime', 'Tr', 'Tf']
+    txt_df = txt_ingest.df.sort_values(key).reset_index(drop=True)[columns]
+    xlsx_df = xlsx_ingest.df.sort_values(key).reset_index(drop=True)[columns]
+    assert len(txt_df) > 0
+    pd.testing.assert_frame_equal(txt_df, xlsx_df, check_dtype=False)
+
+
+def test_opt_snapshot(experiment_with_chips):
+    opt_ingest(experiment_with_chips).save()
+    header = OptLoader.opt_header
+    snapshot = LogSnapshot(experiment_with_chips.name, OpticalLog, header)
+    assert snapshot.read() is None
+
+    df = snapshot.load()
+    assert snapshot.path.exists()
+    with CaptureQueriesContext(connection) as queries:
+        pd.testing.assert_frame_equal(snapshot.load(), df)
+    # only the stamp is queried
+    assert len(queries) == 1
+
+    # the changed logs make it stale
+    OpticalLog.objects.filter(pk=OpticalLog.objects.first().pk).delete()
+    assert snapshot.read() is None
+    assert len(snapshot.load()) == len(df) - 1
+
+    # so do the renamed materials of the header
+    lc = OpticalLog.objects.first().chip.lc
+    lc.name = 'Renamed LC'
+    lc.save()
+    assert snapshot.read() is None
+    assert 'Renamed LC' in set(snapshot.load()['LC'])
+
+    # the writers of the threads do not share the temp file
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(lambda _: snapshot.write(df, 'stamp'), range(8)))
+    assert len(snapshot.read('stamp')) == len(df)
+    assert os.listdir(snapshot.path.parent) == [snapshot.path.name]
+
+
+def test_opt_loader_cell_gap(experiment_with_chips, settings):
+    opt_ingest(experiment_with_chips).save()
+    chips = Chip.objects.filter(opticallog__isnull=False).distinct()
+    RDLCellGap.objects.bulk_create([
+        RDLCellGap(chip=chip, cell_gap=3.0) for chip in chips[1:]
+    ])
+    loader = OptLoader(experiment_with_chips.name, 'rdl')
+    opt_df = loader.opt
+    assert set(opt_df['ID']) == {chip.name for chip in chips[1:]}
+    assert (opt_df['Cell Gap'] == 3.0).all()
+
+    # memoized until the logs or the cell gap changed
+    with CaptureQueriesContext(connection) as queries:
+        pd.testing.assert_frame_equal(loader.opt, opt_df)
+    assert len(queries) == 2
+    RDLCellGap.objects.create(chip=chips[0], cell_gap=3.0)
+    assert len(loader.opt) > len(opt_df)
+
+    # the memoized data are bounded by bytes
+    key = (experiment_with_chips.name, 'rdl', 'OpticalLog')
+    assert OptLoader.results_bytes == sum(
+        size for _, _, size in OptLoader.results.values())
+    settings.OPT_LOADER_CACHE_BYTES = 1
+    RDLCellGap.objects.filter(chip=chips[0]).delete()
+    assert len(loader.opt) == len(opt_df)
+    assert key not in OptLoader.results
+
+
+def test_axo_parse_short_file():
+    file_name = '1-21 + 1-30 + 1-32'
+    with open(AXO_TEST_FILES_DIR / f'{file_name}.csv', 'rb') as fp:
+        lines = fp.read().split(b'\n')
+    # the file of 2 chips, the third one is missing
+    content = b'\n'.join(lines[:AxoIngest.skiprows + 12] + lines[46:])
+    df, warnings = AxoIngest.parse(file_name, content)
+    assert len(df) == 12
+    assert df['short_name'].tolist() == ['1-21'] * 6 + ['1-30'] * 6
+    assert warnings == [
+        f'File {file_name} has 12 measurements, expect 18, '
+        'the missing ones are skipped.'
+    ]
+
+
+def test_file_source():
+    file_name = '1-21 + 1-30 + 1-32'
+    with open(AXO_TEST_FILES_DIR / f'{file_name}.csv', 'rb') as fp:
+        content = fp.read()
+        # the file on disk is read by the worker itself
+        source = FileSource(File(fp, name=f'{file_name}.csv'))
+    assert source.path == str(AXO_TEST_FILES_DIR / f'{file_name}.csv')
+    assert source.content is None
+    expect = AxoIngest.parse(file_name, content)
+    for source in [
+        source,
+        FileSource(SimpleUploadedFile(f'{file_name}.csv', content)),
+    ]:
+        df, warnings = parse_source(AxoIngest.parse_file, source)
+        pd.testing.assert_frame_equal(df, expect[0])
+        assert warnings == expect[1]
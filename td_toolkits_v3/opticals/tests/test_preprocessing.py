@@ -0,0 +1,37 @@
+import pandas as pd
+
+from ..tools.preprocessing import (
+    group_max_normalize,
+    monotonic_cut,
+    truncate_at_argmax,
+)
+
+
+def curves():
+    return pd.DataFrame({
+        'ID': ['A'] * 5 + ['B'] * 4,
+        'Point': [1] * 5 + [2] * 4,
+        'Vop': [1, 2, 3, 4, 5, 1, 2, 3, 4],
+        'LC%': [1, 3, 2, 4, 2, 2, 8, 8, 4],
+    })
+
+
+def test_group_max_normalize():
+    df = curves()
+    assert group_max_normalize(df, 'LC%').tolist() == [
+        25, 75, 50, 100, 50, 25, 100, 100, 50
+    ]
+
+
+def test_truncate_at_argmax():
+    df = curves()
+    assert truncate_at_argmax(df, 'LC%')['Vop'].tolist() == [1, 2, 3, 1]
+    # the first maximum is kept
+    assert truncate_at_argmax(df, 'LC%', inclusive=True)['Vop'].tolist() == [
+        1, 2, 3, 4, 1, 2
+    ]
+
+
+def test_monotonic_cut():
+    df = curves()
+    assert monotonic_cut(df, 'LC%')['Vop'].tolist() == [1, 2, 4, 1, 2]
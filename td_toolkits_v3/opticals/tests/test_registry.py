@@ -0,0 +1,62 @@
+import pytest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from ..models import RTFittingModel
+from ..tools.compact import CompactModel
+from ..tools.registry import ModelRegistry
+from td_toolkits_v3.materials.tests.factories import (
+    LiquidCrystalFactory,
+    PolyimideFactory,
+    SealFactory,
+)
+from td_toolkits_v3.products.tests.factories import ExperimentFactory
+
+pytestmark = pytest.mark.django_db
+
+
+def rt_fitting_model(lc, coef):
+    model = CompactModel('identity', [0], [1], [coef])
+    return RTFittingModel.objects.create(
+        experiment=ExperimentFactory(),
+        lc=lc,
+        pi=PolyimideFactory(),
+        seal=SealFactory(),
+        cell_gap_upper=3.5,
+        cell_gap_lower=2.5,
+        voltage=model,
+        response_time=model,
+        time_rise=model,
+        time_fall=model,
+        r2={},
+    )
+
+
+def test_model_registry():
+    registry = ModelRegistry(maxsize=1)
+    lc = LiquidCrystalFactory()
+    obj = rt_fitting_model(lc, 2)
+    queryset = RTFittingModel.objects.filter(lc=lc)
+
+    assert registry.get(queryset).voltage.predict([[3]]) == [6]
+    with CaptureQueriesContext(connection) as queries:
+        assert registry.get(queryset).time_fall.predict([[3]]) == [6]
+    # the model fields are not loaded again
+    assert len(queries) == 1
+    assert registry.info['hits'] == 1
+
+    # the changed row is loaded again
+    obj.voltage = CompactModel('identity', [0], [1], [3])
+    obj.save()
+    assert registry.get(queryset).voltage.predict([[3]]) == [9]
+
+    # the least recently used row is dropped
+    other = rt_fitting_model(LiquidCrystalFactory(), 1)
+    registry.all(RTFittingModel.objects.all())
+    assert len(registry) == 1
+    assert registry.info['misses'] == 3
+    assert registry.first(RTFittingModel.objects.filter(pk=other.pk)).pk == other.pk
+
+    registry = ModelRegistry(maxsize=6)
+    assert registry.warm()['size'] == 2
@@ -0,0 +1,77 @@
+import pytest
+
+from django.core.cache import caches
+from django.test.utils import override_settings
+
+from ..models import OpticalReference, OpticalSearchProfile, OptFittingModel
+from ..tools.search_cache import OpticalSearchCache, search_backend
+from .test_table import fitting_model, liquid_crystal
+from td_toolkits_v3.materials.tests.factories import (
+    PolyimideFactory,
+    SealFactory,
+)
+from td_toolkits_v3.products.tests.factories import (
+    ExperimentFactory,
+    FactoryFactory,
+    ProductModelTypeFactory,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def test_optical_search_cache():
+    OpticalSearchCache.clear()
+    experiment = ExperimentFactory()
+    lc, pi = liquid_crystal(), PolyimideFactory()
+    opt = fitting_model(OptFittingModel, experiment, lc, pi, SealFactory())
+    reference = OpticalReference.objects.create(
+        product_model_type=ProductModelTypeFactory(factory=FactoryFactory()),
+        lc=lc,
+        pi=pi,
+        cell_gap=3,
+        tft_tech='LTPS',
+        transmittance=5,
+        time_rise=2,
+        time_fall=3,
+        gray_to_gray=5,
+        w_x=0.3,
+        w_y=0.3,
+        contrast_ratio=1000,
+    )
+    profile = OpticalSearchProfile.objects.create(ref_product=reference)
+
+    def search_cache(lc_list=[lc.name]):
+        return OpticalSearchCache(lc_list, [pi.name], profile, reference)
+
+    assert search_cache().get() is None
+    search_cache().set({'result': 1})
+    assert search_cache().get() == {'result': 1}
+    # from the shared backend, like the other workers
+    OpticalSearchCache.results.clear()
+    assert search_cache().get() == {'result': 1}
+    # the order of the query does not matter
+    assert search_cache([lc.name, lc.name]).key == search_cache().key
+
+    # refit, or edit the profile, gives a new key
+    key = search_cache().key
+    opt.save()
+    assert search_cache().key != key
+    key = search_cache().key
+    profile.save()
+    assert search_cache().key != key
+    assert search_cache().get() is None
+
+    # LRU of this process
+    with override_settings(OPT_SEARCH_CACHE_SIZE=2):
+        for i in range(3):
+            search_cache([lc.name, f'LC {i}']).set(i)
+        assert len(OpticalSearchCache.results) == 2
+    OpticalSearchCache.clear()
+
+
+def test_search_backend(settings):
+    assert search_backend('search') is caches['search']
+    # the settings without the alias, like wiki_test
+    settings.CACHES = {'default': settings.CACHES['default']}
+    assert search_backend('search') is caches['default']
+    OpticalSearchCache.clear()
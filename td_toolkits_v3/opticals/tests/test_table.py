@@ -0,0 +1,211 @@
+import io
+
+import numpy as np
+import pytest
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..models import OpticalLog, OptFittingModel, RTFittingModel
+from ..tools.compact import CompactModel
+from ..tools.grid import fitting_grid
+from ..tools.registry import model_registry
+from ..tools.utils import OptTableGenerator
+from td_toolkits_v3.materials.tests.factories import (
+    LiquidCrystalFactory,
+    PolyimideFactory,
+    SealFactory,
+)
+from td_toolkits_v3.products.tests.factories import (
+    ChipFactory,
+    ExperimentFactory,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def liquid_crystal():
+    return LiquidCrystalFactory(
+        designed_cell_gap=3, n_e=1.6, n_o=1.5, k_11=12, k_33=14,
+    )
+
+
+def fitting_model(fitting_model_class, experiment, lc, pi, seal):
+    model = CompactModel('identity', [0, 0], [1, 1], [1, 0])
+    fields = (
+        ['voltage', 'response_time', 'time_rise']
+        if fitting_model_class is RTFittingModel
+        else ['w_x', 'w_y', 'w_capital_y', 'lc_percent', 'transmittance',
+              'v_percent']
+    )
+    extra = (
+        {'time_fall': CompactModel('identity', [0], [1], [1])}
+        if fitting_model_class is RTFittingModel
+        else {}
+    )
+    return fitting_model_class.objects.create(
+        experiment=experiment,
+        lc=lc,
+        pi=pi,
+        seal=seal,
+        cell_gap_upper=3.5,
+        cell_gap_lower=2.5,
+        r2={},
+        **{field: model for field in fields},
+        **extra,
+    )
+
+
+def test_opt_table_latest_models():
+    experiment = ExperimentFactory()
+    lc_a, lc_b, lc_c = liquid_crystal(), liquid_crystal(), liquid_crystal()
+    pi_a, pi_b = PolyimideFactory(), PolyimideFactory()
+    seal = SealFactory()
+
+    fitting_model(OptFittingModel, experiment, lc_a, pi_a, seal)
+    opt_a = fitting_model(OptFittingModel, experiment, lc_a, pi_a, seal)
+    opt_b = fitting_model(OptFittingModel, experiment, lc_b, pi_a, seal)
+    opt_c = fitting_model(OptFittingModel, experiment, lc_c, pi_a, seal)
+    # two RT models of the same LC and PI
+    fitting_model(RTFittingModel, experiment, lc_a, pi_a, seal)
+    rt_a = fitting_model(RTFittingModel, experiment, lc_a, pi_a, seal)
+    # the only one of the same LC and PI
+    rt_b = fitting_model(RTFittingModel, experiment, lc_b, pi_a, seal)
+    # only the same LC
+    rt_c = fitting_model(RTFittingModel, experiment, lc_c, pi_b, seal)
+
+    generator = OptTableGenerator(experiment, voltage=5)
+    model_registry.clear()
+    with CaptureQueriesContext(connection) as queries:
+        matches = generator.latest_models()
+    assert len(queries) == 4
+    assert [
+        (opt.pk, getattr(rt, 'pk', None), ref_rt.pk)
+        for opt, rt, ref_rt in matches
+    ] == [
+        (opt_a.pk, None, rt_a.pk),
+        (opt_b.pk, rt_b.pk, rt_b.pk),
+        (opt_c.pk, rt_c.pk, rt_c.pk),
+    ]
+
+    model_registry.clear()
+    with CaptureQueriesContext(connection) as queries:
+        generator.calc()
+    table = generator.tables['V=5']
+    assert table.loc[table['LC'] == lc_a.name, 'RT'].isna().all()
+    assert table.loc[table['LC'] == lc_b.name, 'RT'].notna().all()
+
+    # the queries do not depend on the number of configurations
+    for _ in range(3):
+        lc, pi = liquid_crystal(), PolyimideFactory()
+        fitting_model(OptFittingModel, experiment, lc, pi, seal)
+        fitting_model(RTFittingModel, experiment, lc, pi, seal)
+    model_registry.clear()
+    with CaptureQueriesContext(connection) as more_queries:
+        generator.calc()
+    assert generator.tables['V=5']['LC'].nunique() == 5
+    assert len(more_queries) == len(queries)
+
+
+def test_opt_table_sweep():
+    experiment = ExperimentFactory()
+    pi, seal = PolyimideFactory(), SealFactory()
+    opt_a = fitting_model(
+        OptFittingModel, experiment, liquid_crystal(), pi, seal)
+    opt_b = fitting_model(
+        OptFittingModel, experiment, liquid_crystal(), pi, seal)
+    opt_b.transmittance = CompactModel(
+        'opt', [4, 3], [2, 0.5], [1, 2, 3, 4, 5, 6, 7], 8)
+    opt_b.save()
+    rt_b = fitting_model(RTFittingModel, experiment, opt_b.lc, pi, seal)
+
+    voltages = np.array([4, 5, 6])
+    cell_gaps = np.linspace(2.5, 3.5, 5)
+    sweep = OptTableGenerator(experiment).sweep(voltages, cell_gaps)
+    assert list(sweep.columns) == [
+        'LC', 'PI', 'Seal', 'Voltage', 'Cell Gap', 'Target', 'Value']
+    # RT targets only for the configuration with RT model
+    # the colorimetry differences have no first cell gap
+    assert len(sweep) == ((8 + 14) * 2 + 3) * 15 - 7 * 2 * 3
+    assert set(sweep.loc[sweep['Target'] == 'RT', 'LC']) == {opt_b.lc.name}
+
+    region = np.array(np.meshgrid(voltages, cell_gaps, indexing='ij'))
+    region = region.reshape(2, -1).T
+    for model, target, expect in [
+        (opt_a, 'T%', opt_a.transmittance.predict(region)),
+        (opt_b, 'T%', opt_b.transmittance.predict(region)),
+        (opt_b, 'V95', opt_b.v_percent.predict(
+            np.column_stack([np.full(15, 95), region[:, 1]]))),
+        (opt_b, 'Tf', rt_b.time_fall.predict(region[:, 1:])),
+    ]:
+        value = sweep[
+            (sweep['LC'] == model.lc.name) & (sweep['Target'] == target)
+        ]
+        np.testing.assert_allclose(value['Voltage'], region[:, 0])
+        np.testing.assert_allclose(value['Cell Gap'], region[:, 1])
+        np.testing.assert_allclose(value['Value'], expect)
+
+
+def test_opt_table_grid():
+    experiment = ExperimentFactory()
+    opt = fitting_model(
+        OptFittingModel, experiment, liquid_crystal(), PolyimideFactory(),
+        SealFactory(),
+    )
+    opt.transmittance = CompactModel(
+        'opt', [5, 3], [1.5, 0.3], [1, 2, 3, 4, 5, 6, 7], 8)
+    opt.grid = fitting_grid(opt, (3, 8))
+    opt.save()
+
+    generator = OptTableGenerator(experiment, voltage=5)
+    generator.calc()
+    from_grid = generator.tables['V=5']
+    assert not np.array_equal(from_grid['T%'], opt.transmittance.predict(
+        from_grid[['Voltage', 'Cell Gap']].to_numpy()))
+    OptFittingModel.objects.update(grid=None)
+    model_registry.clear()
+    generator.calc()
+    direct = generator.tables['V=5']
+    scale = np.ptp(opt.grid.values[opt.grid.fields.index('transmittance')])
+    np.testing.assert_allclose(
+        from_grid['T%'], direct['T%'], rtol=0, atol=1e-3 * scale)
+    # the colorimetry is predicted directly
+    for column in ['Wx', 'Wy', 'WY', 'Δa*', "Δu'v'"]:
+        np.testing.assert_array_equal(from_grid[column], direct[column])
+
+
+def test_build_fitting_grids():
+    experiment = ExperimentFactory()
+    chip = ChipFactory(
+        sub__condition__experiment=experiment, lc=liquid_crystal())
+    opt = fitting_model(
+        OptFittingModel, experiment, chip.lc, chip.pi, chip.seal)
+    rt = fitting_model(RTFittingModel, experiment, chip.lc, chip.pi, chip.seal)
+    for voltage in [2, 4, 7]:
+        OpticalLog.objects.create(
+            chip=chip, measure_point=1, measure_time=timezone.now(),
+            operator='', voltage=voltage, lc_percent=1, w_x=0.3, w_y=0.3,
+            w_capital_y=1,
+        )
+
+    out = io.StringIO()
+    call_command('build_fitting_grids', stdout=out)
+    assert f'skip {rt}, no logs' in out.getvalue()
+    opt.refresh_from_db()
+    assert opt.grid.fields == opt.grid_fields
+    # the voltages of the logs above the cutoff
+    assert (opt.grid.voltages[0], opt.grid.voltages[-1]) == (4, 7)
+    assert (opt.grid.cell_gaps[0], opt.grid.cell_gaps[-1]) == (2.4, 3.5)
+
+    call_command('build_fitting_grids', '--voltage', '3', '8', stdout=out)
+    assert 'OptFittingModel: 0' in out.getvalue()
+    rt.refresh_from_db()
+    assert rt.grid.fields == rt.grid_fields
+    assert (rt.grid.voltages[0], rt.grid.voltages[-1]) == (3, 8)
+
+    out = io.StringIO()
+    call_command('build_fitting_grids', '--all', stdout=out)
+    assert 'OptFittingModel: 1' in out.getvalue()
+    assert 'RTFittingModel: 0' in out.getvalue()
@@ -0,0 +1,186 @@
+"""
+Vectorized colorimetry of the optical tables.
+
+The kernels work on the contiguous arrays of many configurations at once.
+The rows of a configuration are consecutive, and the differences between
+the neighbouring rows are taken in each group only, so the stacked
+configurations do not bleed into each other. `color_columns` writes all
+the columns into one preallocated buffer.
+"""
+from __future__ import annotations
+from typing import Optional
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+# (Xn, Yn, Zn) of the back light
+WHITE_POINT = np.array([95.04, 100., 108.86])
+
+COLOR_COLUMNS = [
+    'WX', 'WZ', 'L*', 'a*', 'b*', "u'", "v'",
+    'Δa*', 'Δb*', 'ΔL*', 'ΔEab*', "Δu'", "Δv'", "Δu'v'",
+]
+
+
+def tristimulus(
+    wx: ArrayLike,
+    wy: ArrayLike,
+    w_capital_y: ArrayLike,
+    out: Optional[NDArray] = None,
+) -> NDArray:
+    """
+    (x, y, Y) |-> (X, Y, Z)
+
+    Returns
+    -------
+    numpy.ndarray, shape (n, 3)
+    """
+    wx, wy, w_capital_y = (
+        np.asarray(a, dtype=float) for a in (wx, wy, w_capital_y)
+    )
+    if out is None:
+        out = np.empty((len(wx), 3))
+    np.divide(w_capital_y, wy, out=out[:, 1])
+    np.subtract(1, wx, out=out[:, 2])
+    np.subtract(out[:, 2], wy, out=out[:, 2])
+    np.multiply(out[:, 2], out[:, 1], out=out[:, 2])
+    np.multiply(wx, out[:, 1], out=out[:, 0])
+    out[:, 1] = w_capital_y
+    return out
+
+
+def lab(
+    xyz: ArrayLike,
+    white: NDArray = WHITE_POINT,
+    out: Optional[NDArray] = None,
+) -> NDArray:
+    """
+    CIE (X, Y, Z) |-> (L*, a*, b*)
+
+    Returns
+    -------
+    numpy.ndarray, shape (n, 3)
+    """
+    xyz = np.asarray(xyz, dtype=float)
+    if out is None:
+        out = np.empty((len(xyz), 3))
+    ratio = xyz / white
+    f = np.power(np.abs(ratio), 1 / 3)
+    linear = ratio < 0.008856
+    f[linear] = 7.787 * ratio[linear] + 16 / 116
+    np.multiply(116, f[:, 1], out=out[:, 0])
+    out[:, 0] -= 16
+    np.subtract(f[:, 0], f[:, 1], out=out[:, 1])
+    out[:, 1] *= 500
+    np.subtract(f[:, 1], f[:, 2], out=out[:, 2])
+    out[:, 2] *= 200
+    return out
+
+
+def uv_prime(
+    wx: ArrayLike,
+    wy: ArrayLike,
+    out: Optional[NDArray] = None,
+) -> NDArray:
+    """
+    (x, y) |-> (u', v')
+
+    Returns
+    -------
+    numpy.ndarray, shape (n, 2)
+    """
+    wx, wy = np.asarray(wx, dtype=float), np.asarray(wy, dtype=float)
+    if out is None:
+        out = np.empty((len(wx), 2))
+    denominator = -2 * wx + 12 * wy + 3
+    np.divide(4 * wx, denominator, out=out[:, 0])
+    np.divide(9 * wy, denominator, out=out[:, 1])
+    return out
+
+
+def group_starts(groups: Optional[ArrayLike], n: int) -> NDArray:
+    """
+    The mask of the first row of each group, the groups are consecutive.
+    """
+    starts = np.zeros(n, dtype=bool)
+    if n == 0:
+        return starts
+    starts[0] = True
+    if groups is not None:
+        groups = np.asarray(groups)
+        starts[1:] = groups[1:] != groups[:-1]
+    return starts
+
+
+def neighbour_diff(
+    values: ArrayLike,
+    groups: Optional[ArrayLike] = None,
+    out: Optional[NDArray] = None,
+) -> NDArray:
+    """
+    The difference from the previous row in the same group. The first row
+    of a group is taken against 0, like `numpy.diff(prepend=0)`, and is
+    usually dropped by the table.
+
+    Parameters
+    ----------
+    values: array like, shape (n, k)
+    groups: array like, shape (n,), optional
+        The group of each row, default is one group.
+    """
+    values = np.asarray(values, dtype=float)
+    if out is None:
+        out = np.empty_like(values)
+    np.subtract(values[1:], values[:-1], out=out[1:])
+    starts = group_starts(groups, len(values))
+    out[starts] = values[starts]
+    return out
+
+
+def distance(diff: ArrayLike, out: Optional[NDArray] = None) -> NDArray:
+    """
+    The Euclidean norm of each row, like ΔEab* from (Δa*, Δb*, ΔL*).
+    """
+    diff = np.asarray(diff, dtype=float)
+    return np.sqrt(np.einsum('ij,ij->i', diff, diff), out=out)
+
+
+def color_columns(
+    wx: ArrayLike,
+    wy: ArrayLike,
+    w_capital_y: ArrayLike,
+    groups: Optional[ArrayLike] = None,
+    lab_input: Optional[ArrayLike] = None,
+) -> dict[str, NDArray]:
+    """
+    All the colorimetry columns of the tables, see `COLOR_COLUMNS`.
+
+    Parameters
+    ----------
+    wx, wy, w_capital_y: array like, shape (n,)
+        The chromaticity (x, y) and the luminance Y.
+    groups: array like, shape (n,), optional
+        The configuration of each row, the differences are in the groups.
+    lab_input: array like, shape (n, 3), optional
+        The (X, Y, Z) of L*a*b*, default is the tristimulus.
+
+    Returns
+    -------
+    dict
+        {column: the view of the buffer}
+    """
+    wx = np.asarray(wx, dtype=float)
+    buffer = np.empty((len(wx), len(COLOR_COLUMNS)))
+    xyz = tristimulus(wx, wy, w_capital_y)
+    buffer[:, 0] = xyz[:, 0]
+    buffer[:, 1] = xyz[:, 2]
+    lab(xyz if lab_input is None else lab_input, out=buffer[:, 2:5])
+    uv_prime(wx, wy, out=buffer[:, 5:7])
+    # (Δa*, Δb*, ΔL*) from (a*, b*, L*)
+    neighbour_diff(buffer[:, [3, 4, 2]], groups, out=buffer[:, 7:10])
+    distance(buffer[:, 7:10], out=buffer[:, 10])
+    neighbour_diff(buffer[:, 5:7], groups, out=buffer[:, 11:13])
+    distance(buffer[:, 11:13], out=buffer[:, 13])
+    return {
+        column: buffer[:, i] for i, column in enumerate(COLOR_COLUMNS)
+    }
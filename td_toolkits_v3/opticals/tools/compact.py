@@ -0,0 +1,206 @@
+"""
+The compact form of the fitting models.
+
+All the fitting pipelines are a standard scaler, a fixed feature basis and
+a linear regressor, so a model is fully described by the scaler mean and
+scale, the basis and the coefficients. They are stored as a small JSON
+instead of pickled sklearn objects, and predicted with NumPy only.
+"""
+from __future__ import annotations
+from collections import defaultdict
+from typing import Callable, Optional
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+
+def _poly_basis(x: NDArray, powers: NDArray) -> NDArray:
+    # the same feature order as sklearn PolynomialFeatures.powers_
+    return np.prod(x[:, np.newaxis, :] ** powers[np.newaxis, :, :], axis=2)
+
+
+def _opt_basis(x: NDArray) -> NDArray:
+    # [x0, x1] |-> [1, x0, x1, x0*x1, x0**2, x0**3, x0**4]
+    return np.column_stack([
+        np.ones(len(x)), x[:, 0], x[:, 1], x[:, 0] * x[:, 1],
+        x[:, 0] ** 2, x[:, 0] ** 3, x[:, 0] ** 4,
+    ])
+
+
+def _rt_basis(x: NDArray) -> NDArray:
+    # [x0, x1] |-> [1, x0, x1, x0*x1, x0**2]
+    return np.column_stack([
+        np.ones(len(x)), x[:, 0], x[:, 1], x[:, 0] * x[:, 1], x[:, 0] ** 2,
+    ])
+
+
+def _v_percent_basis(x: NDArray) -> NDArray:
+    # [x0, x1] |-> [1, x1, exp(x0+10)]
+    return np.column_stack([np.ones(len(x)), x[:, 1], np.exp(x[:, 0] + 10)])
+
+
+# the custom transform functions of the fittings and their basis
+TRANSFORMER_BASES = {
+    '_opt_transformer_f': 'opt',
+    '_rt_transformer_f': 'rt',
+    '_v_percent_model_tranformer_f': 'v_percent',
+}
+
+BASES: dict[str, Callable] = {
+    'identity': lambda x: x,
+    'opt': _opt_basis,
+    'rt': _rt_basis,
+    'v_percent': _v_percent_basis,
+}
+
+
+class CompactModel():
+    """
+    f(x) = basis((x - mean) / scale) @ coef + intercept
+
+    Parameters
+    ----------
+    basis: str
+        'identity', 'poly', 'opt', 'rt' or 'v_percent'.
+    mean, scale: array like
+        The standard scaler of the inputs.
+    coef: array like
+        The coefficients of the features.
+    intercept: float, optional, default is 0
+    powers: array like, optional
+        The powers of the inputs for the 'poly' basis.
+    """
+
+    def __init__(
+        self,
+        basis: str,
+        mean: ArrayLike,
+        scale: ArrayLike,
+        coef: ArrayLike,
+        intercept: float = 0,
+        powers: Optional[ArrayLike] = None,
+    ):
+        if basis != 'poly' and basis not in BASES:
+            raise ValueError(f'The {basis} basis is not implemented now.')
+        self.basis = basis
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.coef = np.asarray(coef, dtype=float)
+        self.intercept = float(intercept)
+        self.powers = None if powers is None else np.asarray(powers, dtype=int)
+
+    def __repr__(self):
+        return f'CompactModel({self.basis}, {len(self.coef)} coef)'
+
+    def __eq__(self, other):
+        return isinstance(other, CompactModel) and self.as_dict() == other.as_dict()
+
+    def basis_features(self, x: NDArray) -> NDArray:
+        # the features of the scaled inputs
+        if self.basis == 'poly':
+            return _poly_basis(x, self.powers)
+        return BASES[self.basis](x)
+
+    def features(self, x: ArrayLike) -> NDArray:
+        return self.basis_features(
+            (np.asarray(x, dtype=float) - self.mean) / self.scale
+        )
+
+    def predict(self, x: ArrayLike) -> NDArray:
+        """
+        Parameters
+        ----------
+        x: array like, shape (n_samples, n_inputs)
+
+        Returns
+        -------
+        numpy.ndarray, shape (n_samples,)
+        """
+        return self.features(x) @ self.coef + self.intercept
+
+    def as_dict(self) -> dict:
+        compact = {
+            'basis': self.basis,
+            'mean': self.mean.tolist(),
+            'scale': self.scale.tolist(),
+            'coef': self.coef.tolist(),
+            'intercept': self.intercept,
+        }
+        if self.powers is not None:
+            compact['powers'] = self.powers.tolist()
+        return compact
+
+    @classmethod
+    def from_dict(cls, compact: dict) -> CompactModel:
+        return cls(**compact)
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> CompactModel:
+        """
+        Convert the fitted sklearn pipeline of the fittings:
+        StandardScaler -> (PolynomialFeatures | FunctionTransformer) ->
+        linear regressor.
+        """
+        steps = [step for _, step in pipeline.steps]
+        scaler, regressor = steps[0], steps[-1]
+        options = {}
+        if len(steps) == 2:
+            basis = 'identity'
+        elif hasattr(steps[1], 'powers_'):
+            basis = 'poly'
+            options['powers'] = steps[1].powers_
+        elif getattr(steps[1], 'func', None) is not None:
+            func_name = steps[1].func.__name__
+            if func_name not in TRANSFORMER_BASES:
+                raise ValueError(f'The transform {func_name} is not known.')
+            basis = TRANSFORMER_BASES[func_name]
+        else:
+            raise ValueError(f'The pipeline {pipeline} is not known.')
+        return cls(
+            basis,
+            mean=scaler.mean_,
+            scale=scaler.scale_,
+            coef=regressor.coef_,
+            intercept=regressor.intercept_,
+            **options,
+        )
+
+
+def predict_stacked(models: list[CompactModel], x: ArrayLike) -> NDArray:
+    """
+    Predict the same inputs by many models in one batched pass.
+
+    The models of the same basis are evaluated together: the scaled inputs
+    of all of them are stacked into one design matrix, and multiplied with
+    their stacked coefficients.
+
+    Parameters
+    ----------
+    models: list of CompactModel
+    x: array like, shape (n_samples, n_inputs)
+
+    Returns
+    -------
+    numpy.ndarray, shape (n_models, n_samples)
+    """
+    x = np.asarray(x, dtype=float)
+    result = np.empty((len(models), len(x)))
+    groups = defaultdict(list)
+    for i, model in enumerate(models):
+        powers = None if model.powers is None else model.powers.tobytes()
+        groups[(model.basis, model.mean.shape, powers)].append(i)
+
+    for index in groups.values():
+        group = [models[i] for i in index]
+        mean = np.stack([model.mean for model in group])[:, np.newaxis, :]
+        scale = np.stack([model.scale for model in group])[:, np.newaxis, :]
+        scaled = ((x[np.newaxis, :, :] - mean) / scale).reshape(-1, x.shape[1])
+        features = group[0].basis_features(scaled).reshape(
+            len(group), len(x), -1
+        )
+        coef = np.stack([model.coef for model in group])
+        intercept = np.array([model.intercept for model in group])
+        result[index] = (
+            np.einsum('knf,kf->kn', features, coef) + intercept[:, np.newaxis]
+        )
+    return result
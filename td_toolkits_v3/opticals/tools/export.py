@@ -0,0 +1,214 @@
+"""
+Partitioned Parquet dataset of the OPT and RT data of the experiments.
+
+The data of `OptLoader` are exported for the analysis in the notebooks,
+partitioned by the kind of the logs, the cell gap method and the
+experiment, in the hive layout::
+
+    <root>/kind=OPT/cell_gap=axo/experiment=<experiment>/data.parquet
+
+so `pandas.read_parquet('<root>/kind=OPT/cell_gap=axo')` reads all the
+experiments with the `experiment` column.
+
+Each partition is stamped with the `OptLoader.stamp` of its source, the
+count and the newest `modified` of the logs, chips and cell gaps. The
+repeated export only rewrites the partitions whose stamp changed.
+"""
+from __future__ import annotations
+import json
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+from urllib.parse import quote
+
+import pyarrow as pa
+from pyarrow import parquet
+
+from django.conf import settings
+
+from td_toolkits_v3.opticals.models import (
+    AlterRdlCellGap,
+    AxometricsLog,
+    OpticalLog,
+    RDLCellGap,
+    ResponseTimeLog,
+)
+from td_toolkits_v3.opticals.tools.utils import OptLoader
+from td_toolkits_v3.products.models import Chip
+
+STAMP_KEY = b'td_toolkits_v3.stamp'
+
+
+class OpticalExport():
+    """
+    The dataset of one cell gap method.
+
+    Parameters
+    ----------
+    cell_gap: str, optional
+        The cell gap method of `OptLoader`, default is 'axo'.
+    root: str, optional
+        The directory of the dataset, default is settings.OPT_EXPORT_DIR.
+    """
+    # kind -> (header, log model, the data of OptLoader)
+    kinds = {
+        'OPT': (OptLoader.opt_header, OpticalLog, 'opt'),
+        'RT': (OptLoader.rt_header, ResponseTimeLog, 'rt'),
+    }
+
+    def __init__(
+        self,
+        cell_gap: Optional[str] = 'axo',
+        root: Optional[str] = None,
+    ):
+        if cell_gap not in [*OptLoader.gap_sources, None]:
+            raise ValueError(
+                f'The {cell_gap} method is not implemented now.')
+        self.cell_gap = cell_gap
+        self.root = Path(root or settings.OPT_EXPORT_DIR)
+
+    @property
+    def log_path(self) -> Path:
+        # not read as the data, the files starting with _ are skipped
+        return self.root / '_exported.json'
+
+    @property
+    def last_exported(self) -> Optional[datetime]:
+        """
+        The start time of the last export of this cell gap method.
+        """
+        if not self.log_path.exists():
+            return None
+        exported = json.loads(self.log_path.read_text())
+        if (time := exported.get(str(self.cell_gap))) is None:
+            return None
+        return datetime.fromisoformat(time)
+
+    def mark_exported(self, time: datetime):
+        exported = {}
+        if self.log_path.exists():
+            exported = json.loads(self.log_path.read_text())
+        exported[str(self.cell_gap)] = time.isoformat()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.log_path.write_text(json.dumps(exported))
+
+    def partition(self, kind: str, experiment_name: str) -> Path:
+        return (
+            self.root
+            / f'kind={kind}'
+            / f'cell_gap={self.cell_gap}'
+            / f"experiment={quote(experiment_name, safe='')}"
+            / 'data.parquet'
+        )
+
+    def stamp(self, kind: str, experiment_name: str) -> str:
+        header, model, _ = self.kinds[kind]
+        stamp = OptLoader(experiment_name, self.cell_gap).stamp(header, model)
+        return json.dumps(stamp, default=str)
+
+    @staticmethod
+    def stored_stamp(path: Path) -> Optional[str]:
+        if not path.exists():
+            return None
+        metadata = parquet.read_schema(str(path)).metadata or {}
+        return metadata.get(STAMP_KEY, b'').decode()
+
+    def export(self, experiment_names: Iterable[str]) -> dict[str, list]:
+        """
+        Export the partitions of the experiments, the unchanged ones are
+        skipped, and the ones without data are removed or left empty.
+
+        Returns
+        -------
+        dict
+            {'written' | 'skipped' | 'removed' | 'empty':
+            [(kind, experiment name)]}
+        """
+        report: dict[str, list] = {
+            'written': [], 'skipped': [], 'removed': [], 'empty': []}
+        for experiment_name in experiment_names:
+            for kind, (_, _, data) in self.kinds.items():
+                path = self.partition(kind, experiment_name)
+                # the stamp is taken before loading, so the logs changed
+                # while loading only make it stale
+                stamp = self.stamp(kind, experiment_name)
+                if self.stored_stamp(path) == stamp:
+                    report['skipped'].append((kind, experiment_name))
+                    continue
+                try:
+                    df = getattr(OptLoader(experiment_name, self.cell_gap), data)
+                except ValueError:
+                    # no logs or no cell gap
+                    if path.exists():
+                        path.unlink()
+                        report['removed'].append((kind, experiment_name))
+                    else:
+                        report['empty'].append((kind, experiment_name))
+                    continue
+                self.write(path, df, stamp)
+                report['written'].append((kind, experiment_name))
+        return report
+
+    @staticmethod
+    def write(path: Path, df, stamp: str):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            STAMP_KEY: stamp.encode(),
+        })
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write aside and replace, the readers never see a partial file,
+        # and the writers of the other threads or processes have their own.
+        # The files starting with . are not read as the data.
+        fd, tmp_path = tempfile.mkstemp(
+            dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+        os.close(fd)
+        try:
+            parquet.write_table(table, tmp_path)
+            # mkstemp is private to the owner, the dataset is shared
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def files(self, experiment_names: Iterable[str]) -> dict[str, Path]:
+        """
+        The existing partitions of the experiments.
+
+        Returns
+        -------
+        dict
+            {path relative to the root: path}
+        """
+        return {
+            path.relative_to(self.root).as_posix(): path
+            for experiment_name in experiment_names
+            for kind in self.kinds
+            if (path := self.partition(kind, experiment_name)).exists()
+        }
+
+    @staticmethod
+    def changed_since(since: datetime) -> list[str]:
+        """
+        The experiments whose logs, chips or cell gaps are modified since
+        the time. The deleted logs are not found, export them explicitly.
+        """
+        names = set()
+        for model in [
+            OpticalLog,
+            ResponseTimeLog,
+            AxometricsLog,
+            RDLCellGap,
+            AlterRdlCellGap,
+        ]:
+            names.update(model.objects.filter(
+                modified__gte=since
+            ).values_list('chip__sub__condition__experiment__name', flat=True))
+        names.update(Chip.objects.filter(
+            modified__gte=since
+        ).values_list('sub__condition__experiment__name', flat=True))
+        names.discard(None)
+        return sorted(names)
@@ -0,0 +1,78 @@
+"""
+Fit the models of many configurations on a process pool.
+
+Each (configuration, target) model of `OPTFitting` or `RTFitting` is an
+independent fit, most of the time is spent in `TheilSenRegressor` on one
+core. The executor schedules all of them on the pool, and sets the fitted
+models and r2 back to the fittings, so saving them needs no more fitting.
+"""
+from __future__ import annotations
+from typing import Callable, Optional
+
+from django.conf import settings
+
+from td_toolkits_v3.opticals.tools.ingest import parallel_map, pool_size
+
+
+def fit_model(fitting, model_name: str) -> tuple:
+    """
+    Fit one model of the fitting, run in the worker.
+
+    Returns
+    -------
+    (model, r2): the fitted model and its r2 score
+    """
+    model = getattr(fitting, model_name)
+    return model, fitting.r2
+
+
+class FittingExecutor():
+    """
+    Parameters
+    ----------
+    fittings: list of OPTFitting or RTFitting
+    workers: int, optional
+        The max workers, default is settings.FITTING_WORKERS,
+        0 for the number of CPUs.
+    """
+
+    def __init__(self, fittings: list, workers: Optional[int] = None):
+        self.fittings = fittings
+        if workers is None:
+            workers = settings.FITTING_WORKERS
+        self.workers = workers
+
+    @property
+    def tasks(self) -> list[tuple]:
+        return [
+            (fitting, model_name)
+            for fitting in self.fittings
+            for model_name in fitting.model_names()
+        ]
+
+    def run(self, progress: Optional[Callable[[int, int], None]] = None):
+        """
+        Fit all the models of the fittings.
+
+        Parameters
+        ----------
+        progress: callable, optional
+            Called with the number of done fits and all fits.
+        """
+        tasks = self.tasks
+        if len(tasks) == 0:
+            return self.fittings
+        fittings, model_names = zip(*tasks)
+        results = parallel_map(
+            fit_model,
+            fittings,
+            model_names,
+            workers=pool_size(len(tasks), self.workers),
+            progress=(
+                None if progress is None
+                else lambda done: progress(done, len(tasks))
+            ),
+        )
+        for (fitting, model_name), (model, r2) in zip(tasks, results):
+            fitting.set_fitted(model_name, model, r2)
+        return self.fittings
@@ -0,0 +1,311 @@
+"""
+Precomputed prediction grids of the fitting models.
+
+The table generators evaluate the same fitted surfaces at nearly the same
+(Vop, Cell Gap) points on every search. The grid stores the predictions of
+the (Vop, Cell Gap) models of one fitting model on a dense grid of its
+valid range, computed when the model is fitted, and the searches read it
+by bilinear interpolation.
+
+The grid is refined until the interpolation between the nodes agrees with
+the direct prediction within the tolerance. The fields which could not
+reach it, and the points out of the grid, are predicted directly. So are
+the colorimetry models, the differences of the colors between the cell
+gaps are much smaller than their value ranges, see `grid_fields` of the
+fitting models.
+
+The models fitted before the grids are backfilled by
+`manage.py build_fitting_grids`.
+"""
+from __future__ import annotations
+import base64
+from typing import Optional
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+from django.conf import settings
+
+from td_toolkits_v3.opticals.tools.compact import CompactModel, predict_stacked
+
+
+def covering_range(
+    data_range: tuple,
+    designed_cell_gap: Optional[float] = None,
+) -> tuple[float, float]:
+    """
+    The cell gap range of the grid, the range of the fitted data and the
+    default range of the tables around the designed cell gap.
+    """
+    low, high = data_range
+    if designed_cell_gap is not None:
+        low = min(low, designed_cell_gap - 0.6)
+        high = max(high, designed_cell_gap + 0.5)
+    return float(low), float(high)
+
+
+def _bilinear(
+    voltages: NDArray,
+    cell_gaps: NDArray,
+    values: NDArray,
+    x: NDArray,
+) -> NDArray:
+    """
+    Interpolate the values of shape (n_fields, n_voltages, n_cell_gaps)
+    at x of shape (n_samples, 2), the points should be in the grid.
+    """
+    i = np.clip(np.searchsorted(voltages, x[:, 0]) - 1, 0, len(voltages) - 2)
+    j = np.clip(np.searchsorted(cell_gaps, x[:, 1]) - 1, 0, len(cell_gaps) - 2)
+    s = (x[:, 0] - voltages[i]) / (voltages[i + 1] - voltages[i])
+    t = (x[:, 1] - cell_gaps[j]) / (cell_gaps[j + 1] - cell_gaps[j])
+    return (
+        values[:, i, j] * (1 - s) * (1 - t)
+        + values[:, i + 1, j] * s * (1 - t)
+        + values[:, i, j + 1] * (1 - s) * t
+        + values[:, i + 1, j + 1] * s * t
+    )
+
+
+class PredictionGrid():
+    """
+    The predictions of the (Vop, Cell Gap) models on a grid.
+
+    Parameters
+    ----------
+    voltages, cell_gaps: array like
+        The increasing nodes of the grid.
+    values: dict
+        {field: array like of shape (n_voltages, n_cell_gaps), or the
+        base64 of its float32 bytes}
+    error: dict
+        {field: the max interpolation error relative to the value range}
+    """
+
+    def __init__(
+        self,
+        voltages: ArrayLike,
+        cell_gaps: ArrayLike,
+        values: dict,
+        error: dict,
+    ):
+        self.voltages = np.asarray(voltages, dtype=float)
+        self.cell_gaps = np.asarray(cell_gaps, dtype=float)
+        self.fields = list(values)
+        self.values = np.array([
+            np.frombuffer(base64.b64decode(values[field]), dtype='<f4')
+            if isinstance(values[field], str)
+            else np.asarray(values[field], dtype=float)
+            for field in self.fields
+        ]).reshape(len(self.fields), len(self.voltages), len(self.cell_gaps))
+        self.error = {field: float(error[field]) for field in self.fields}
+
+    def __repr__(self):
+        return (
+            f'PredictionGrid({len(self.voltages)}x{len(self.cell_gaps)}, '
+            f'{self.fields})'
+        )
+
+    def as_dict(self) -> dict:
+        # the values are the bytes, much smaller and faster than the lists
+        return {
+            'voltages': self.voltages.tolist(),
+            'cell_gaps': self.cell_gaps.tolist(),
+            'values': {
+                field: base64.b64encode(
+                    self.values[i].astype('<f4').tobytes()
+                ).decode('ascii')
+                for i, field in enumerate(self.fields)
+            },
+            'error': self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, grid: dict) -> PredictionGrid:
+        return cls(**grid)
+
+    @classmethod
+    def from_models(
+        cls,
+        models: dict,
+        voltage_range: tuple,
+        cell_gap_range: tuple,
+        tolerance: Optional[float] = None,
+        max_nodes: Optional[int] = None,
+    ) -> PredictionGrid:
+        """
+        Compute the grid of the models, the intervals of each axis are
+        doubled until the interpolation error at their midpoints is within
+        the half tolerance, so the bilinear error of the both is within the
+        tolerance, or the axis has max_nodes.
+
+        Parameters
+        ----------
+        models: dict
+            {field: CompactModel or fitted pipeline of f(Vop, Cell Gap)}
+        voltage_range, cell_gap_range: (min, max)
+        tolerance: float, optional
+            The max error relative to the value range,
+            default is settings.FITTING_GRID_TOLERANCE.
+        max_nodes: int, optional
+            The max nodes of each axis, default is
+            settings.FITTING_GRID_MAX_NODES.
+        """
+        if tolerance is None:
+            tolerance = settings.FITTING_GRID_TOLERANCE
+        if max_nodes is None:
+            max_nodes = settings.FITTING_GRID_MAX_NODES
+        fields = list(models)
+        compacts = [
+            model if isinstance(model, CompactModel)
+            else CompactModel.from_pipeline(model)
+            for model in models.values()
+        ]
+
+        def predict(voltages: NDArray, cell_gaps: NDArray) -> NDArray:
+            x = np.array(np.meshgrid(voltages, cell_gaps, indexing='ij'))
+            return predict_stacked(compacts, x.reshape(2, -1).T).reshape(
+                len(compacts), len(voltages), len(cell_gaps)
+            )
+
+        def midpoints(nodes: NDArray) -> NDArray:
+            return (nodes[1:] + nodes[:-1]) / 2
+
+        def relative_error(
+            values: NDArray,
+            expect: NDArray,
+            actual: NDArray,
+        ) -> NDArray:
+            # the max error of each field relative to its value range
+            scale = np.ptp(values.reshape(len(compacts), -1), axis=1)
+            scale = np.where(scale > 0, scale, 1)
+            error = np.abs(expect - actual).reshape(len(compacts), -1)
+            return error.max(axis=1, initial=0) / scale
+
+        voltages = np.linspace(*voltage_range, 17)
+        cell_gaps = np.linspace(*cell_gap_range, 5)
+        while True:
+            values = predict(voltages, cell_gaps)
+            voltage_error = relative_error(
+                values,
+                predict(midpoints(voltages), cell_gaps),
+                (values[:, 1:, :] + values[:, :-1, :]) / 2,
+            ).max()
+            cell_gap_error = relative_error(
+                values,
+                predict(voltages, midpoints(cell_gaps)),
+                (values[:, :, 1:] + values[:, :, :-1]) / 2,
+            ).max()
+            refine_voltage = (
+                voltage_error > tolerance / 2
+                and 2 * len(voltages) - 1 <= max_nodes
+            )
+            refine_cell_gap = (
+                cell_gap_error > tolerance / 2
+                and 2 * len(cell_gaps) - 1 <= max_nodes
+            )
+            if not (refine_voltage or refine_cell_gap):
+                break
+            if refine_voltage:
+                voltages = np.linspace(*voltage_range, 2 * len(voltages) - 1)
+            if refine_cell_gap:
+                cell_gaps = np.linspace(*cell_gap_range, 2 * len(cell_gaps) - 1)
+
+        # the exactness check at the centers of the cells, where the
+        # bilinear interpolation is the farthest from the nodes
+        centers = np.array(np.meshgrid(
+            midpoints(voltages), midpoints(cell_gaps), indexing='ij'
+        )).reshape(2, -1).T
+        error = relative_error(
+            values,
+            predict_stacked(compacts, centers),
+            _bilinear(voltages, cell_gaps, values, centers),
+        )
+        return cls(
+            voltages,
+            cell_gaps,
+            dict(zip(fields, values)),
+            dict(zip(fields, error)),
+        )
+
+    def covers(self, x: NDArray) -> NDArray:
+        return (
+            (x[:, 0] >= self.voltages[0]) & (x[:, 0] <= self.voltages[-1])
+            & (x[:, 1] >= self.cell_gaps[0]) & (x[:, 1] <= self.cell_gaps[-1])
+        )
+
+    def interpolate(self, field: str, x: ArrayLike) -> NDArray:
+        """
+        The bilinear interpolation of the field at the points in the grid.
+        """
+        x = np.asarray(x, dtype=float)
+        index = self.fields.index(field)
+        return _bilinear(
+            self.voltages,
+            self.cell_gaps,
+            self.values[index:index + 1],
+            x,
+        )[0]
+
+    def predict(
+        self,
+        field: str,
+        x: ArrayLike,
+        model: CompactModel,
+        tolerance: Optional[float] = None,
+    ) -> NDArray:
+        """
+        Interpolate the field at the points in the grid, and predict the
+        others directly by the model.
+
+        Parameters
+        ----------
+        field: str
+        x: array like, shape (n_samples, 2)
+            The (Vop, Cell Gap) points.
+        model: CompactModel
+            The model of the field.
+        tolerance: float, optional
+            default is settings.FITTING_GRID_TOLERANCE, the field with
+            larger error is predicted directly.
+        """
+        if tolerance is None:
+            tolerance = settings.FITTING_GRID_TOLERANCE
+        x = np.asarray(x, dtype=float)
+        if self.error.get(field, np.inf) > tolerance:
+            return model.predict(x)
+        inside = self.covers(x)
+        if inside.all():
+            return self.interpolate(field, x)
+        result = np.empty(len(x))
+        result[inside] = self.interpolate(field, x[inside])
+        result[~inside] = model.predict(x[~inside])
+        return result
+
+
+def fitting_grid(fitting_model, voltage_range: tuple) -> PredictionGrid:
+    """
+    The grid of the `grid_fields` of the OptFittingModel or RTFittingModel,
+    over the voltage range and the cell gaps of its data and the tables.
+    """
+    return PredictionGrid.from_models(
+        {
+            field: getattr(fitting_model, field)
+            for field in fitting_model.grid_fields
+        },
+        voltage_range,
+        covering_range(
+            (fitting_model.cell_gap_lower, fitting_model.cell_gap_upper),
+            fitting_model.lc.designed_cell_gap,
+        ),
+    )
+
+
+def grid_predict(fitting_model, field: str, x: ArrayLike) -> NDArray:
+    """
+    The prediction of the field of the OptFittingModel or RTFittingModel,
+    from its grid if it has.
+    """
+    model = getattr(fitting_model, field)
+    grid = getattr(fitting_model, 'grid', None)
+    if grid is None or field not in grid.fields:
+        return model.predict(x)
+    return grid.predict(field, x, model)
@@ -0,0 +1,767 @@
+from __future__ import annotations
+
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta, timezone
+from functools import partial
+from typing import Callable, Iterator, Optional
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+import django
+from django.conf import settings
+from django.core.files import File
+
+from td_toolkits_v3.products.models import Chip, Experiment, Factory
+from td_toolkits_v3.products.tools.utils import ChipResolver
+from td_toolkits_v3.opticals.models import (
+    AxometricsLog,
+    Instrument,
+    OpticalLog,
+    ResponseTimeLog,
+)
+from td_toolkits_v3.utils.lookups import Lookups
+
+# The TOC instruments log the local time without zone information.
+TOC_TIMEZONE = timezone(timedelta(hours=8))
+
+
+def pool_size(n: int, workers: Optional[int] = None) -> int:
+    """
+    The process pool size to parse n files.
+
+    Parameters
+    ----------
+    n: int
+        The number of files.
+    workers: int, optional
+        The max workers, default is settings.INGEST_WORKERS,
+        0 for the number of CPUs.
+    """
+    if workers is None:
+        workers = settings.INGEST_WORKERS
+    return max(1, min(n, workers or os.cpu_count() or 1))
+
+
+def parallel_imap(
+    func: Callable,
+    *iterables,
+    workers: int = 1,
+) -> Iterator:
+    """
+    Map the function like `map` and keep the order of inputs, so the merge
+    result is deterministic. The items are processed on a process pool when
+    there are more than one worker, so the function and the items should be
+    picklable and should not touch the database.
+
+    The results are yielded as they are done in order, so they could be
+    merged and dropped one by one.
+    """
+    if workers <= 1:
+        yield from map(func, *iterables)
+        return
+    # Spawn fresh workers instead of forking, the forked children would
+    # share the database connection of the request with the parent.
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    ) as executor:
+        yield from executor.map(func, *iterables)
+
+
+def parallel_map(
+    func: Callable,
+    *iterables,
+    workers: int = 1,
+    progress: Optional[Callable[[int], None]] = None,
+) -> list:
+    """
+    The list of `parallel_imap`.
+
+    progress: callable, optional
+        Called with the number of done items after each one.
+    """
+    collected = []
+    for result in parallel_imap(func, *iterables, workers=workers):
+        collected.append(result)
+        if progress is not None:
+            progress(len(collected))
+    return collected
+
+
+class FileSource():
+    """
+    A file to parse in a worker. The file on disk, like the stored files of
+    a job or the large uploads, is passed by its path and read by the
+    worker itself, only the file in memory is passed by its content.
+    """
+
+    def __init__(self, file):
+        self.name = file.name
+        self.path = self.file_path(file)
+        self.content = None if self.path is not None else file.read()
+
+    @staticmethod
+    def file_path(file) -> Optional[str]:
+        if hasattr(file, 'temporary_file_path'):
+            return file.temporary_file_path()
+        path = getattr(getattr(file, 'file', None), 'name', None)
+        if isinstance(path, str) and os.path.isfile(path):
+            return path
+        return None
+
+    @contextmanager
+    def open(self) -> Iterator[File]:
+        if self.path is None:
+            yield File(io.BytesIO(self.content), name=self.name)
+            return
+        with open(self.path, 'rb') as fp:
+            yield File(fp, name=self.name)
+
+
+def parse_source(parse: Callable, source: FileSource, **kwargs):
+    """
+    Open the source in the worker and parse it.
+    """
+    with source.open() as file:
+        return parse(file, **kwargs)
+
+
+class LogIngest():
+    """
+    Chunked ingest pipeline for the instrument logs.
+
+    The raw files are read chunk by chunk, only the needed columns are kept,
+    and every chunk is cleaned with vectorized operations before it is merged
+    into the deduplicated log table. The table is written with batched
+    `bulk_create`.
+
+    The raw files are never held whole, but the memory is not flat: the
+    peak is the deduplicated logs of the loggable chips in the upload, kept
+    until `save`, plus the deduplicated logs of the file being parsed and a
+    chunk. So it grows with the unique logs uploaded, not with their raw
+    size, the duplicates, the unused columns or the unknown chips. The logs
+    are not inserted as they come, a log may be overwritten by a newer one
+    of a later file until all the files are read, and `save` writes them
+    in one transaction.
+
+    Parsing a file is independent of the database, so the files could be
+    parsed on a process pool, see `feed_all`.
+
+    Subclass should set `model` and `columns`.
+    """
+    model = None
+    # {column position in raw file: column name}
+    columns: dict[int, str] = {}
+    # the identity of a log, newer one would overwrite the older one
+    key = ['ID', 'Point', 'Vop']
+
+    def __init__(
+        self,
+        experiment: Experiment,
+        factory: Factory,
+        log_id: str = 'panel_id',
+        chunk_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        resolver: Optional[ChipResolver] = None,
+        workers: Optional[int] = None,
+        lookups: Optional[Lookups] = None,
+    ):
+        """
+        Parameters
+        ----------
+        experiment: Experiment
+            The experiment which logs belong to.
+        factory: Factory
+            The factory of the instrument.
+        log_id: str, optional, default is 'panel_id'
+            The ID in the raw file, 'panel_id' or 'short_id'.
+        chunk_size: int, optional
+            The rows read from the raw file each time,
+            default is settings.INGEST_CHUNK_SIZE
+        batch_size: int, optional
+            The rows insert to database each time,
+            default is settings.INGEST_BATCH_SIZE
+        resolver: ChipResolver, optional
+            The chip resolver of the experiment, could be shared in request.
+        workers: int, optional
+            The processes to parse files, default is settings.INGEST_WORKERS
+        lookups: Lookups, optional
+            The lookups of the master data, could be shared in request.
+        """
+        if log_id not in ['panel_id', 'short_id']:
+            raise ValueError("Wrong log id")
+        self.experiment = experiment
+        self.factory = factory
+        self.log_id = log_id
+        self.chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.resolver = resolver or ChipResolver(experiment)
+        self.workers = workers
+        self.lookups = lookups or Lookups()
+        # the keyword arguments pass to `read`
+        self.options: dict = {}
+
+        self.save_log: dict[str, list] = {
+            'file_name': [],
+            'warning': [],
+        }
+        self.__chips: Optional[dict[str, Chip]] = None
+        # the merged table, and the frames wait for merging
+        self.__df = pd.DataFrame(columns=self.names())
+        self.__pending: list[pd.DataFrame] = []
+        self.__pending_rows = 0
+
+    @classmethod
+    def names(cls) -> list[str]:
+        return [cls.columns[i] for i in sorted(cls.columns)] + ['datetime']
+
+    @property
+    def chips(self) -> dict[str, Chip]:
+        """
+        The chips could log (no log yet) in the experiment,
+        map from the ID in raw file to chip.
+        """
+        if self.__chips is None:
+            logged = set(
+                self.model.objects.filter(
+                    chip__sub__condition__experiment=self.experiment
+                ).values_list('chip_id', flat=True)
+            )
+            self.__chips = {
+                id: chips[0]
+                for id, chips in self.resolver.index(self.log_id).items()
+                if len(chips) == 1 and chips[0].pk not in logged
+            }
+        return self.__chips
+
+    @classmethod
+    def read(cls, file, chunk_size: int, **options) -> Iterator[pd.DataFrame]:
+        """
+        Read raw file by chunks, and rename the needed columns.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def clean(cls, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Vectorized clean up of a chunk
+        0. drop na for date, time, ID, point, voltage
+        1. transform datetime
+        2. drop duplicate (keep newer)
+        """
+        df = df.dropna(subset=['Date', 'Time', 'ID', 'Point', 'Vop'])
+        df = df.assign(
+            ID=df['ID'].astype('str'),
+            datetime=cls.to_datetime(df['Date'], df['Time']),
+        )
+        df = df[df['datetime'].notna()]
+        return cls.drop_duplicates(df)
+
+    @classmethod
+    def drop_duplicates(cls, df: pd.DataFrame) -> pd.DataFrame:
+        return df.sort_values('datetime', kind='stable').drop_duplicates(
+            subset=cls.key, keep='last',
+        )
+
+    @staticmethod
+    def to_datetime(date: pd.Series, time: pd.Series) -> pd.Series:
+        """
+        Vectorized datetime parsing, the format is like 2021/03/30 16:32:10
+        """
+        return pd.to_datetime(
+            date.astype('str') + ' ' + time.astype('str'),
+            format=r'%Y/%m/%d %H:%M:%S',
+            errors='coerce',
+        ).dt.tz_localize(TOC_TIMEZONE)
+
+    @classmethod
+    def parse(
+        cls,
+        file,
+        chunk_size: int,
+        **options,
+    ) -> tuple[pd.DataFrame, list[str]]:
+        """
+        Read and clean a raw file, without touching database. The chunks
+        are merged into the deduplicated logs of the file, so the memory is
+        bounded by them and a chunk, not by the raw file.
+
+        Returns
+        -------
+        (deduplicated logs in the file, warnings)
+        """
+        frames = [pd.DataFrame(columns=cls.names())]
+        rows = 0
+        for chunk in cls.read(file, chunk_size, **options):
+            chunk = cls.clean(chunk)
+            frames.append(chunk[cls.names()])
+            rows += len(chunk)
+            # merge when frames grow too large,
+            # so the sorting cost is amortized
+            if rows > chunk_size:
+                frames = [cls.drop_duplicates(pd.concat(frames, ignore_index=True))]
+                rows = 0
+        df = cls.drop_duplicates(pd.concat(frames, ignore_index=True))
+        warnings = [] if len(df) > 0 else [f"No data found in the file {file.name}"]
+        return df, warnings
+
+    def feed(self, file):
+        """
+        Parse and merge one raw file.
+        """
+        self.add(file.name, *self.parse(file, self.chunk_size, **self.options))
+
+    def feed_all(self, files: list):
+        """
+        Parse the raw files on a process pool, then merge them in order.
+        Each worker reads its own file chunk by chunk, and the parsed logs
+        are merged as they are done.
+        """
+        workers = pool_size(len(files), self.workers)
+        if workers <= 1:
+            for file in files:
+                self.feed(file)
+            return
+        results = parallel_imap(
+            partial(
+                parse_source,
+                type(self).parse,
+                chunk_size=self.chunk_size,
+                **self.options,
+            ),
+            [FileSource(file) for file in files],
+            workers=workers,
+        )
+        for file, (df, warnings) in zip(files, results):
+            self.add(file.name, df, warnings)
+
+    def add(self, file_name: str, df: pd.DataFrame, warnings: list[str]):
+        """
+        Merge the parsed logs of a file, keep the chips could log only,
+        and record the unknown ones.
+        """
+        self.save_log['file_name'].append(file_name)
+        self.save_log['warning'] += warnings
+        self.resolver.resolve(df['ID'].unique(), self.log_id)
+        df = df[df['ID'].isin(self.chips.keys())]
+        if len(df) == 0:
+            return
+        self.__pending.append(df)
+        self.__pending_rows += len(df)
+        if self.__pending_rows > self.chunk_size:
+            self.merge()
+
+    def merge(self):
+        """
+        Merge the pending frames into the deduplicated logs, which are kept
+        until `save`.
+        """
+        if not self.__pending:
+            return
+        self.__df = self.drop_duplicates(
+            pd.concat([self.__df, *self.__pending], ignore_index=True)
+        )
+        self.__pending = []
+        self.__pending_rows = 0
+
+    @property
+    def df(self) -> pd.DataFrame:
+        self.merge()
+        return self.__df
+
+    def build(self, row, chip: Chip, instrument: Instrument):
+        """
+        Build the model instance of a row(named tuple).
+        """
+        raise NotImplementedError
+
+    def save(self) -> int:
+        """
+        Bulk create the merged logs by batches.
+
+        Returns
+        -------
+        int, the count of the created logs
+        """
+        df = self.df
+        self.save_log['warning'] += self.resolver.warnings
+        if len(df) == 0:
+            self.save_log['warning'].append('No logable data found in the files')
+            return 0
+
+        instrument = self.lookups.get(
+            Instrument, df['Station'].iloc[0], factory=self.factory)
+        # assign chips in one pass
+        df = df.rename(
+            columns=lambda c: c.replace('%', '_percent')
+        ).assign(chip=df['ID'].map(self.chips))
+        count = 0
+        for start in range(0, len(df), self.batch_size):
+            batch = df.iloc[start:start + self.batch_size]
+            self.model.objects.bulk_create([
+                self.build(row, row.chip, instrument)
+                for row in batch.itertuples(index=False)
+            ])
+            count += len(batch)
+        return count
+
+
+class OptIngest(LogIngest):
+    """
+    Ingest pipeline of TOC VT(.csv) files.
+    """
+    model = OpticalLog
+    columns = {
+        0: 'Date',
+        1: 'Time',
+        2: 'ID',
+        3: 'Point',
+        4: 'Station',
+        5: 'Operator',
+        6: 'Vop',
+        11: 'LC%',
+        23: 'WY',
+        32: 'Wx',
+        33: 'Wy',
+    }
+
+    @classmethod
+    def read(cls, file, chunk_size: int, **options) -> Iterator[pd.DataFrame]:
+        # cause sometime the header maybe different?
+        # using the position otherwise.
+        reader = pd.read_csv(
+            file,
+            encoding='utf-8',
+            encoding_errors='ignore',
+            usecols=list(cls.columns),
+            chunksize=chunk_size,
+        )
+        for chunk in reader:
+            chunk.columns = [cls.columns[i] for i in sorted(cls.columns)]
+            yield chunk
+
+    @classmethod
+    def clean(cls, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.dropna(subset=['Vop'])
+        # 1. drop V == 1, the data separate note
+        # 2. change Vpp to Vop
+        df = df[df['Vop'] != 1].assign(Vop=lambda x: x['Vop'] / 2)
+        df = super().clean(df)
+        return df.astype({
+            'Point': 'int',
+            'Operator': 'str',
+            'Vop': 'float',
+            'LC%': 'float',
+            'WY': 'float',
+            'Wx': 'float',
+            'Wy': 'float',
+        })
+
+    def build(self, row, chip: Chip, instrument: Instrument) -> OpticalLog:
+        return OpticalLog(
+            chip=chip,
+            measure_point=row.Point,
+            measure_time=row.datetime.to_pydatetime(),
+            instrument=instrument,
+            operator=row.Operator,
+            voltage=row.Vop,
+            lc_percent=row.LC_percent,
+            w_capital_y=row.WY,
+            w_x=row.Wx,
+            w_y=row.Wy,
+        )
+
+
+class RTIngest(LogIngest):
+    """
+    Ingest pipeline of TOC response time raw(.txt) or excel(.xlsx) files.
+    """
+    model = ResponseTimeLog
+    columns = {
+        0: 'Date',
+        1: 'Time',
+        2: 'ID',
+        3: 'Point',
+        4: 'Station',
+        5: 'Operator',
+        7: 'Vop',
+        17: 'Tr',
+        19: 'Tf',
+    }
+
+    def __init__(self, *args, data_type: str = 'txt', **kwargs):
+        """
+        Parameters
+        ----------
+        data_type: str, optional, default is 'txt'
+            The type of raw files, 'txt' or 'xlsx'.
+        Others are the same as LogIngest.
+        """
+        if data_type not in ['txt', 'xlsx']:
+            raise ValueError('wrong data type')
+        super().__init__(*args, **kwargs)
+        self.data_type = data_type
+        self.options = {'data_type': data_type}
+
+    @classmethod
+    def read(
+        cls,
+        file,
+        chunk_size: int,
+        data_type: str = 'txt',
+    ) -> Iterator[pd.DataFrame]:
+        if data_type == 'txt':
+            reader = pd.read_table(
+                file,
+                encoding='utf-8',
+                encoding_errors='ignore',
+                usecols=list(cls.columns),
+                chunksize=chunk_size,
+            )
+            for chunk in reader:
+                chunk.columns = [cls.columns[i] for i in sorted(cls.columns)]
+                yield chunk
+        else:
+            yield from cls.read_xlsx(file, chunk_size)
+
+    @classmethod
+    def read_xlsx(cls, file, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """
+        Stream the first sheet in read only mode, the cells are typed,
+        so the date and time are formatted back to the raw log format.
+        """
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = []
+            for row in wb.worksheets[0].iter_rows(min_row=2, values_only=True):
+                rows.append(row)
+                if len(rows) == chunk_size:
+                    yield cls.xlsx_frame(rows)
+                    rows = []
+            if rows:
+                yield cls.xlsx_frame(rows)
+        finally:
+            wb.close()
+
+    @classmethod
+    def xlsx_frame(cls, rows: list[tuple]) -> pd.DataFrame:
+        df = pd.DataFrame(rows).reindex(columns=sorted(cls.columns))
+        df.columns = [cls.columns[i] for i in sorted(cls.columns)]
+        return df.assign(
+            Date=pd.to_datetime(df['Date'], errors='coerce').dt.strftime(r'%Y/%m/%d'),
+            Time=df['Time'].astype('str'),
+        )
+
+    @classmethod
+    def clean(cls, df: pd.DataFrame) -> pd.DataFrame:
+        # There are some row are the header, cause they just
+        # merge the file directory. They would be NaN after to numeric.
+        df = df.assign(**{
+            col: pd.to_numeric(df[col], errors='coerce')
+            for col in ['Point', 'Vop', 'Tr', 'Tf']
+        })
+        df = super().clean(df)
+        return df.astype({
+            'Point': 'int',
+            'Operator': 'str',
+        })
+
+    def build(self, row, chip: Chip, instrument: Instrument) -> ResponseTimeLog:
+        return ResponseTimeLog(
+            chip=chip,
+            measure_point=row.Point,
+            measure_time=row.datetime.to_pydatetime(),
+            instrument=instrument,
+            operator=row.Operator,
+            voltage=row.Vop,
+            time_rise=row.Tr,
+            time_fall=row.Tf,
+        )
+
+
+class AxoIngest():
+    """
+    Ingest pipeline of AXO(.csv) files.
+
+    The file name is the short IDs of the chips joined by '+', and each chip
+    has a measurement of every point in order. All files are parsed first
+    (on a process pool if there are many), then the logs are checked and
+    created in bulk.
+    """
+    # the axo location order map to opt measurement point
+    # points = [5, 3, 1, 6, 4, 2]
+    points = [1, 2, 3, 4, 5, 6]
+    # the data begin at the 29th row of the raw file
+    skiprows = 28
+    columns = [
+        'chip_no',
+        'x_coord',
+        'y_coord',
+        'cell_gap',
+        'top_rubbing_direct',
+        'twist',
+        'top_pretilt',
+        'bottom_pretilt',
+        'rms',
+        'iteration',
+    ]
+    # the measurement with larger RMS(%) is unreliable
+    rms_limit = 1
+
+    def __init__(
+        self,
+        experiment: Experiment,
+        factory: Factory,
+        resolver: Optional[ChipResolver] = None,
+        workers: Optional[int] = None,
+        lookups: Optional[Lookups] = None,
+    ):
+        self.experiment = experiment
+        lookups = lookups or Lookups()
+        self.instrument = lookups.get(Instrument, "AXO", factory=factory)
+        self.resolver = resolver or ChipResolver(experiment)
+        self.workers = workers
+        self.save_log: dict[str, list] = {
+            'file_name': [],
+            'warning': [],
+        }
+        self.frames: list[pd.DataFrame] = []
+
+    @classmethod
+    def parse(
+        cls,
+        file_name: str,
+        content: bytes,
+    ) -> tuple[pd.DataFrame, list[str]]:
+        """
+        Parse the content of an axo file.
+
+        Parameters
+        ----------
+        file_name: str
+            The file name without extension, like '1-21 + 1-30 + 1-32'.
+        content: bytes
+            The raw file content.
+
+        Returns
+        -------
+        (the logs with `short_name` and `measure_point`, warnings)
+        """
+        short_names = [s.strip() for s in file_name.split("+")]
+        df = pd.read_csv(
+            io.StringIO(content.decode("utf-8", errors="ignore")),
+            header=None,
+            names=cls.columns,
+            usecols=range(len(cls.columns)),
+            skiprows=cls.skiprows,
+            nrows=len(cls.points) * len(short_names),
+            skip_blank_lines=False,
+        ).apply(pd.to_numeric, errors='coerce')
+        # a short file runs into the "[LCD Data End]" and the stats rows,
+        # the measurements end at the first row without chip number
+        end = df['chip_no'].isna().to_numpy()
+        if end.any():
+            df = df.iloc[:int(end.argmax())]
+        warnings = []
+        expected = len(cls.points) * len(short_names)
+        if len(df) < expected:
+            warnings.append(
+                f"File {file_name} has {len(df)} measurements, "
+                f"expect {expected}, the missing ones are skipped."
+            )
+        df = df.assign(
+            short_name=np.repeat(short_names, len(cls.points))[:len(df)],
+            measure_point=np.tile(cls.points, len(short_names))[:len(df)],
+        )
+        return df, warnings
+
+    @classmethod
+    def parse_file(cls, file) -> tuple[pd.DataFrame, list[str]]:
+        return cls.parse(str(file).split(".")[0], file.read())
+
+    def feed_all(self, files: list):
+        """
+        Parse the files on a process pool, each worker reads its own file,
+        and merge them in order.
+        """
+        file_names = [str(file).split(".")[0] for file in files]
+        results = parallel_imap(
+            partial(parse_source, type(self).parse_file),
+            [FileSource(file) for file in files],
+            workers=pool_size(len(files), self.workers),
+        )
+        for file_name, (df, warnings) in zip(file_names, results):
+            self.save_log['file_name'].append(file_name)
+            self.save_log['warning'] += warnings
+            self.frames.append(df)
+
+    def save(self) -> int:
+        """
+        Create the logs in bulk, skip the unknown chips, the logged points
+        (keep the old one) and the measurements with large RMS.
+
+        Returns
+        -------
+        int, the count of the created logs
+        """
+        if len(self.frames) == 0:
+            return 0
+        df = pd.concat(self.frames, ignore_index=True)
+        chips = self.resolver.resolve(df['short_name'].unique())
+        self.save_log['warning'] += self.resolver.warnings
+        df = df[df['short_name'].isin(chips.keys())]
+        df = df.assign(chip=df['short_name'].map(chips))
+        df = df.assign(chip_id=df['chip'].map(lambda chip: chip.pk))
+
+        logged = pd.MultiIndex.from_tuples(
+            AxometricsLog.objects.filter(
+                chip__in=chips.values()
+            ).values_list('chip_id', 'measure_point'),
+            names=['chip_id', 'measure_point'],
+        )
+        key = df[['chip_id', 'measure_point']]
+        duplicate = (
+            pd.MultiIndex.from_frame(key).isin(logged)
+            | key.duplicated(keep='first')
+        )
+        self.save_log['warning'] += [
+            f"{row.chip.name}({row.chip.short_name})"
+            f" at point [{row.measure_point}] is duplicate, keep the old one"
+            for row in df[duplicate].itertuples(index=False)
+        ]
+        df = df[~duplicate]
+
+        large_rms = df['rms'] > self.rms_limit
+        self.save_log['warning'] += [
+            f"Measurement at {row.chip.name}({row.chip.short_name}) "
+            f"of point [{row.measure_point}] has large RMS({row.rms}), "
+            f"skip it."
+            for row in df[large_rms].itertuples(index=False)
+        ]
+        df = df[~large_rms]
+
+        AxometricsLog.objects.bulk_create([
+            AxometricsLog(
+                chip=row.chip,
+                measure_point=row.measure_point,
+                x_coord=row.x_coord,
+                y_coord=row.y_coord,
+                cell_gap=row.cell_gap,
+                top_rubbing_direct=row.top_rubbing_direct,
+                twist=row.twist,
+                top_pretilt=row.top_pretilt,
+                bottom_pretilt=row.bottom_pretilt,
+                rms=row.rms,
+                iteration=row.iteration,
+                instrument=self.instrument,
+            )
+            for row in df.itertuples(index=False)
+        ])
+        return len(df)
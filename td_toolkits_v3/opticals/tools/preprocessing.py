@@ -0,0 +1,120 @@
+"""
+Vectorized preprocessing of the VT curves.
+
+Each curve is the rows of the same (ID, Point), in their row order.
+The kernels work on the whole frame with grouped transforms and
+cumulative operations, instead of looping or applying on each curve,
+so the cost stays linear in the number of rows.
+"""
+from __future__ import annotations
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+CURVE_KEYS = ['ID', 'Point']
+
+
+def group_max_normalize(
+    df: pd.DataFrame,
+    column: str,
+    by: Union[str, list] = CURVE_KEYS,
+    scale: float = 100,
+) -> pd.Series:
+    """
+    Normalize the column by its maximum in each curve.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+    column: str
+        The column to normalize, like 'LC%'.
+    by: str or list, optional, default is ['ID', 'Point']
+        The columns identify a curve.
+    scale: float, optional, default is 100
+        The value of the maximum after normalizing.
+
+    Returns
+    -------
+    pandas.Series
+        Aligned with the df, like the T% from LC%.
+    """
+    return scale * df[column] / df.groupby(by)[column].transform('max')
+
+
+def _group_keys(df: pd.DataFrame, by: Union[str, list]) -> list:
+    # group the derived series by the curve columns of df
+    return [df[key] for key in ([by] if isinstance(by, str) else by)]
+
+
+def _argmax_mask(
+    df: pd.DataFrame,
+    column: str,
+    by: Union[str, list],
+    inclusive: bool,
+) -> np.ndarray:
+    # the row position in its curve, and the first position of the maximum,
+    # the same as `group.iloc[:group[column].argmax()]`
+    position = df.groupby(by).cumcount()
+    is_max = df[column] == df.groupby(by)[column].transform('max')
+    first_max = position.where(is_max).groupby(
+        _group_keys(df, by)
+    ).transform('min')
+    if inclusive:
+        return (position <= first_max).to_numpy()
+    return (position < first_max).to_numpy()
+
+
+def truncate_at_argmax(
+    df: pd.DataFrame,
+    column: str,
+    by: Union[str, list] = CURVE_KEYS,
+    inclusive: bool = False,
+) -> pd.DataFrame:
+    """
+    Keep the rows of each curve before its (first) maximum of the column.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+    column: str
+        The column to find the maximum, like 'T%'.
+    by: str or list, optional, default is ['ID', 'Point']
+        The columns identify a curve.
+    inclusive: bool, optional, default is False
+        Keep the row of the maximum either.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The kept rows, in the original order and index.
+    """
+    return df[_argmax_mask(df, column, by, inclusive)]
+
+
+def monotonic_cut(
+    df: pd.DataFrame,
+    column: str,
+    by: Union[str, list] = CURVE_KEYS,
+) -> pd.DataFrame:
+    """
+    Keep the rows of each curve which strictly increase the column,
+    the dips and plateaus (from the measurement noise) are dropped,
+    so the column is invertible in each curve.
+
+    Parameters
+    ----------
+    df: pandas.DataFrame
+    column: str
+        The column should be increasing, like 'T%'.
+    by: str or list, optional, default is ['ID', 'Point']
+        The columns identify a curve.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The kept rows, in the original order and index.
+    """
+    running_max = df.groupby(by)[column].cummax()
+    previous_max = running_max.groupby(_group_keys(df, by)).shift()
+    return df[(previous_max.isna() | (df[column] > previous_max)).to_numpy()]
@@ -0,0 +1,157 @@
+"""
+Process local registry of the loaded fitting models.
+
+The search pages load the same fitting model rows on every request. The
+registry keeps the loaded models (and prediction grids) of the rows in this
+process, keyed by (pk, modified), so the rows are queried without the model
+fields and only the changed or new rows load them again.
+"""
+from __future__ import annotations
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from td_toolkits_v3.opticals.models import (
+    CompactModelField,
+    OpticalsFittingModel,
+    OptFittingModel,
+    PredictionGridField,
+    RTFittingModel,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry():
+    """
+    LRU cache of the fitting models of the rows.
+
+    Parameters
+    ----------
+    maxsize: int
+        The max number of rows kept.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # (model label, pk) -> (modified, {field name: model})
+        self.__rows = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__rows)
+
+    @property
+    def info(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self),
+            'maxsize': self.maxsize,
+        }
+
+    @staticmethod
+    def model_fields(model) -> list[str]:
+        return [
+            field.name for field in model._meta.fields
+            if isinstance(field, (CompactModelField, PredictionGridField))
+        ]
+
+    def deferred(self, queryset):
+        """
+        The queryset without loading the model fields.
+        """
+        return queryset.defer(*self.model_fields(queryset.model))
+
+    def attach(self, objs: list) -> list:
+        """
+        Set the model fields of the objects from the registry, the missed
+        ones are loaded by one query.
+        """
+        objs = [obj for obj in objs if obj is not None]
+        if len(objs) == 0:
+            return objs
+        model = type(objs[0])._meta.concrete_model
+        label = model._meta.label
+        fields = self.model_fields(model)
+
+        loaded = {}
+        missed = []
+        with self.__lock:
+            for obj in objs:
+                row = self.__rows.get((label, obj.pk))
+                if row is not None and row[0] == obj.modified:
+                    self.__rows.move_to_end((label, obj.pk))
+                    self.hits += 1
+                    loaded[obj.pk] = row[1]
+                else:
+                    self.misses += 1
+                    missed.append(obj)
+        if missed:
+            values = model.objects.filter(
+                pk__in=[obj.pk for obj in missed]
+            ).values('pk', *fields)
+            modified = {obj.pk: obj.modified for obj in missed}
+            with self.__lock:
+                for value in values:
+                    pk = value.pop('pk')
+                    loaded[pk] = value
+                    self.__rows[(label, pk)] = (modified[pk], value)
+                    self.__rows.move_to_end((label, pk))
+                while len(self.__rows) > self.maxsize:
+                    self.__rows.popitem(last=False)
+
+        for obj in objs:
+            obj.__dict__.update(loaded.get(obj.pk, {}))
+        return objs
+
+    def all(self, queryset) -> list:
+        return self.attach(list(self.deferred(queryset)))
+
+    def get(self, queryset, *args, **kwargs):
+        return self.attach([self.deferred(queryset).get(*args, **kwargs)])[0]
+
+    def first(self, queryset):
+        """
+        The first object like `queryset.first()`, None if it is empty.
+        """
+        objs = self.attach([self.deferred(queryset).first()])
+        return objs[0] if objs else None
+
+    def latest(self, queryset, *fields):
+        return self.attach([self.deferred(queryset).latest(*fields)])[0]
+
+    def invalidate(self, obj):
+        label = obj._meta.concrete_model._meta.label
+        with self.__lock:
+            self.__rows.pop((label, obj.pk), None)
+
+    def clear(self):
+        with self.__lock:
+            self.__rows.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def warm(self, models: Optional[list] = None):
+        """
+        Load the newest rows of the fitting models, at the process start.
+        The database may be not ready, like before migrating, then skip it.
+        """
+        if models is None:
+            models = [OptFittingModel, RTFittingModel, OpticalsFittingModel]
+        size = self.maxsize // len(models)
+        try:
+            for model in models:
+                self.all(model.objects.order_by('-modified')[:size])
+        except DatabaseError:
+            logger.warning("Skip warming the fitting models.", exc_info=True)
+        return self.info
+
+
+model_registry = ModelRegistry(settings.FITTING_MODEL_CACHE_SIZE)
@@ -0,0 +1,142 @@
+"""
+Result cache of the optical search.
+
+The search page builds the tables of the fitting models, the score and the
+plot on every request. The results are cached by the fingerprint of the
+query and of its sources: the profile, the reference, and the count and
+newest `modified` of the fitting models and the LC involved. Any change of
+them gives a new key, so the stale results are never read and expire by
+the timeout.
+
+The results are kept in this process (LRU) in front of the shared cache
+alias `settings.OPT_SEARCH_CACHE`, so the other workers reuse them too.
+The settings without the alias use the default cache.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db.models import Count, Max, Q
+
+from td_toolkits_v3.materials.models import LiquidCrystal
+from td_toolkits_v3.opticals.models import (
+    OpticalReference,
+    OpticalSearchProfile,
+    OptFittingModel,
+    RTFittingModel,
+)
+
+
+def search_backend(alias: str):
+    """
+    The cache of the alias, or the default cache when it is not configured.
+    """
+    if alias not in settings.CACHES:
+        alias = DEFAULT_CACHE_ALIAS
+    return caches[alias]
+
+
+class OpticalSearchCache():
+    """
+    The cached result of one optical search.
+
+    Parameters
+    ----------
+    lc_list, pi_list: list of str
+        The searched LC and PI names.
+    profile: OpticalSearchProfile
+    reference: OpticalReference
+    """
+    # the results in this process, key -> (expires, result)
+    results = OrderedDict()
+    lock = threading.Lock()
+
+    def __init__(
+        self,
+        lc_list: list[str],
+        pi_list: list[str],
+        profile: OpticalSearchProfile,
+        reference: OpticalReference,
+    ):
+        self.lc_list = sorted(set(lc_list))
+        self.pi_list = sorted(set(pi_list))
+        self.profile = profile
+        self.reference = reference
+        self.__key = None
+
+    @staticmethod
+    def stamp(queryset) -> list:
+        return [
+            str(value) for value in queryset.aggregate(
+                count=Count('pk'), modified=Max('modified')
+            ).values()
+        ]
+
+    @property
+    def key(self) -> str:
+        if self.__key is None:
+            searched = Q(lc__name__in=self.lc_list, pi__name__in=self.pi_list)
+            fingerprint = {
+                'lc': self.lc_list,
+                'pi': self.pi_list,
+                'profile': [self.profile.pk, str(self.profile.modified)],
+                'reference': [
+                    self.reference.pk, str(self.reference.modified)],
+                'opt': self.stamp(OptFittingModel.objects.filter(searched)),
+                # the RT models of the reference are matched by its LC
+                'rt': self.stamp(RTFittingModel.objects.filter(
+                    searched | Q(lc=self.reference.lc_id)
+                )),
+                'lc_modified': self.stamp(LiquidCrystal.objects.filter(
+                    Q(name__in=self.lc_list) | Q(pk=self.reference.lc_id)
+                )),
+            }
+            self.__key = 'opt-search:' + hashlib.sha256(
+                json.dumps(fingerprint, sort_keys=True).encode()
+            ).hexdigest()
+        return self.__key
+
+    @property
+    def backend(self):
+        return search_backend(settings.OPT_SEARCH_CACHE)
+
+    def get(self) -> Optional[Any]:
+        """
+        The cached result, None if it is missed.
+        """
+        key = self.key
+        with self.lock:
+            cached = self.results.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self.results.move_to_end(key)
+                return cached[1]
+        result = self.backend.get(key)
+        if result is not None:
+            self.keep(result)
+        return result
+
+    def set(self, result: Any):
+        self.backend.set(
+            self.key, result, timeout=settings.OPT_SEARCH_CACHE_TIMEOUT)
+        self.keep(result)
+
+    def keep(self, result: Any):
+        key = self.key
+        with self.lock:
+            self.results[key] = (
+                time.monotonic() + settings.OPT_SEARCH_CACHE_TIMEOUT, result)
+            self.results.move_to_end(key)
+            while len(self.results) > settings.OPT_SEARCH_CACHE_SIZE:
+                self.results.popitem(last=False)
+
+    @classmethod
+    def clear(cls):
+        with cls.lock:
+            cls.results.clear()
+        search_backend(settings.OPT_SEARCH_CACHE).clear()
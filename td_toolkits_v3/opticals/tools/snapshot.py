@@ -0,0 +1,187 @@
+"""
+Columnar snapshots of the logs of an experiment.
+
+The logs are stored as Arrow IPC files, which are memory mapped when
+reading, so the repeated analysis of the same experiment does not query
+and rebuild the whole logs from the database again.
+
+A snapshot is stamped with the count and the newest `modified` of the logs,
+and the newest `modified` of the related objects in the header and the
+experiment filter, like the chips, their subs, conditions and materials.
+The stamp is checked by one aggregate query before reading, any insert,
+update or delete of the logs, or renaming the related objects, makes it
+stale and it is rebuilt on the next load.
+
+The read columns are memory mapped without copying, so they are read-only.
+"""
+from __future__ import annotations
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+
+import pandas as pd
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+try:
+    import pyarrow as pa
+except ImportError:  # the snapshot is optional
+    pa = None
+
+STAMP_KEY = b'td_toolkits_v3.stamp'
+
+
+class LogSnapshot():
+    """
+    The snapshot of one kind of logs in an experiment.
+
+    Parameters
+    ----------
+    experiment_name: str
+    model: django.db.models.Model
+        The log model, with `chip` foreign key.
+    header: dict
+        The fields to load and their column names.
+    """
+
+    # the relations of the experiment filter, they move the logs in or out
+    scope = ['chip', 'chip__sub', 'chip__sub__condition']
+
+    def __init__(self, experiment_name: str, model, header: dict):
+        self.experiment_name = experiment_name
+        self.model = model
+        self.header = header
+
+    @staticmethod
+    def enabled() -> bool:
+        return pa is not None and bool(settings.OPT_SNAPSHOT_DIR)
+
+    @property
+    def path(self) -> Path:
+        return (
+            Path(settings.OPT_SNAPSHOT_DIR)
+            / quote(self.experiment_name, safe='')
+            / f'{self.model.__name__}.arrow'
+        )
+
+    @property
+    def queryset(self):
+        return self.model.objects.filter(
+            chip__sub__condition__experiment__name=self.experiment_name
+        )
+
+    @property
+    def relations(self) -> list[str]:
+        """
+        The relations of the scope and the header with `modified`, like
+        'chip__lc' of the header field 'chip__lc__name'.
+        """
+        relations = []
+        for path in self.scope + list(self.header):
+            model, parts = self.model, path.split('__')
+            for i, part in enumerate(parts):
+                field = model._meta.get_field(part)
+                if field.related_model is None:
+                    break
+                model = field.related_model
+                relation = '__'.join(parts[:i + 1])
+                if relation not in relations and any(
+                    field.name == 'modified' for field in model._meta.fields
+                ):
+                    relations.append(relation)
+        return relations
+
+    def stamp(self) -> str:
+        stamp = self.queryset.aggregate(
+            count=Count('pk'),
+            modified=Max('modified'),
+            **{
+                f'{relation}_modified': Max(f'{relation}__modified')
+                for relation in self.relations
+            },
+        )
+        stamp['header'] = self.header
+        return json.dumps(stamp, default=str, sort_keys=True)
+
+    def query(self) -> pd.DataFrame:
+        return pd.DataFrame.from_records(
+            self.queryset.values(*self.header)
+        ).rename(
+            columns=self.header
+        )
+
+    def read(self, stamp: Optional[str] = None) -> Optional[pd.DataFrame]:
+        """
+        Read the snapshot, None if it is missing or stale.
+        """
+        if not self.enabled() or not self.path.exists():
+            return None
+        stamp = stamp or self.stamp()
+        with pa.memory_map(str(self.path)) as source:
+            table = pa.ipc.open_file(source).read_all()
+        metadata = table.schema.metadata or {}
+        if metadata.get(STAMP_KEY, b'').decode() != stamp:
+            return None
+        # the columns without nulls keep the mapped buffers, not copied
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+
+    def write(self, df: pd.DataFrame, stamp: Optional[str] = None):
+        """
+        Write the snapshot. The stamp should be taken before querying the
+        logs, so the logs changed while querying only make it stale.
+        """
+        if not self.enabled():
+            return
+        stamp = stamp or self.stamp()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            STAMP_KEY: stamp.encode(),
+        })
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # write aside and replace, the readers never see a partial file,
+        # and the writers of the other threads or processes have their own
+        fd, tmp_path = tempfile.mkstemp(
+            dir=self.path.parent, prefix=f'.{self.path.name}.', suffix='.tmp')
+        os.close(fd)
+        try:
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self, stamp: Optional[str] = None) -> pd.DataFrame:
+        """
+        Read the snapshot, or query the logs and write it.
+        """
+        if not self.enabled():
+            return self.query()
+        stamp = stamp or self.stamp()
+        df = self.read(stamp)
+        if df is None:
+            df = self.query()
+            if len(df) > 0:
+                self.write(df, stamp)
+        return df
+
+    def refresh(self) -> Optional[pd.DataFrame]:
+        """
+        Rebuild the snapshot after the logs are changed, None if the
+        snapshots are disabled.
+        """
+        if not self.enabled():
+            return None
+        stamp = self.stamp()
+        df = self.query()
+        if len(df) > 0:
+            self.write(df, stamp)
+        elif self.path.exists():
+            self.path.unlink()
+        return df
@@ -1,5 +1,6 @@
 from __future__ import annotations
-
+import threading
+from collections import OrderedDict, defaultdict
 from typing import NamedTuple, Literal, cast, Callable, Optional
 
 import numpy as np
@@ -20,6 +21,9 @@ from sklearn.preprocessing import (
 )
 from sklearn.pipeline import Pipeline
 
+from django.conf import settings
+from django.db.models import Count, Max
+
 from td_toolkits_v3.materials.models import LiquidCrystal, Polyimide, Seal
 from td_toolkits_v3.products.models import Experiment
 
@@ -35,6 +39,23 @@ from td_toolkits_v3.opticals.models import (
     OptFittingModel,
     RTFittingModel,
 )
+from td_toolkits_v3.opticals.tools.colorimetry import (
+    COLOR_COLUMNS,
+    color_columns,
+    group_starts,
+    tristimulus,
+)
+from td_toolkits_v3.opticals.tools.compact import predict_stacked
+from td_toolkits_v3.opticals.tools.grid import (
+    fitting_grid,
+    grid_predict,
+)
+from td_toolkits_v3.opticals.tools.preprocessing import (
+    group_max_normalize,
+    truncate_at_argmax,
+)
+from td_toolkits_v3.opticals.tools.registry import model_registry
+from td_toolkits_v3.opticals.tools.snapshot import LogSnapshot
 
 class MaterialConfiguration(NamedTuple):
     lc: str
@@ -45,7 +66,48 @@ class CellGapRange(NamedTuple):
     min: float
     max: float
 
+class VoltageRange(NamedTuple):
+    min: float
+    max: float
+
 class OptLoader():
+    # Setting the needed data, and the proper columns name for later use.
+    opt_header = {
+        "chip__name": "ID",
+        "chip__lc__name": "LC",
+        "chip__pi__name": "PI",
+        "chip__seal__name": "Seal",
+        "measure_point": "Point",
+        "voltage": "Vop",
+        "lc_percent": "LC%",
+        "w_x": "Wx",
+        "w_y": "Wy",
+        "w_capital_y": "WY",
+    }
+    rt_header = {
+        "chip__name": "ID",
+        "chip__lc__name": "LC",
+        "chip__pi__name": "PI",
+        "chip__seal__name": "Seal",
+        "measure_point": "Point",
+        "voltage": "Vop",
+        "time_rise": "Tr",
+        "time_fall": "Tf",
+    }
+    # the cell gap model of each method, and whether it is measured by point
+    gap_sources = {
+        'axo': (AxometricsLog, True),
+        'rdl': (RDLCellGap, False),
+        'rdl_alter': (AlterRdlCellGap, True),
+    }
+    # the column of the chip pk in the snapshots, to join the cell gap
+    chip_key = 'chip_id'
+    # the loaded data memoized per (experiment, cell gap, logs) in this
+    # process, with the stamp of their source and their bytes, up to
+    # settings.OPT_LOADER_CACHE_BYTES
+    results = OrderedDict()
+    results_bytes = 0
+    results_lock = threading.Lock()
     
     def __init__(self, experiment_name: str, cell_gap: Optional[str] ='axo'):
         """
@@ -67,13 +129,7 @@ class OptLoader():
         """
         aux function for loading
         """
-        df = pd.DataFrame.from_records(
-            model.objects
-            .filter(chip__sub__condition__experiment__name=self.experiment_name)
-            .values(*header)
-        ).rename(
-            columns=header
-        )
+        df = LogSnapshot(self.experiment_name, model, header).query()
         if len(df) == 0:
             raise ValueError(
                 f'There is no {model.__name__} data in '
@@ -81,6 +137,105 @@ class OptLoader():
             )
         return df
 
+    def snapshot(self, header, model) -> LogSnapshot:
+        """
+        The snapshot of the logs, with the chip pk to join the cell gap.
+        """
+        return LogSnapshot(
+            self.experiment_name, model, {**header, self.chip_key: self.chip_key}
+        )
+
+    def stamp(self, header, model) -> tuple:
+        """
+        The stamp of the logs snapshot and the count and the newest modified
+        of the cell gap, any change of them makes the memoized data stale.
+        """
+        stamp = (self.snapshot(header, model).stamp(),)
+        if self.cell_gap is not None:
+            gap_model, _ = self.gap_sources[self.cell_gap]
+            stamp += tuple(gap_model.objects.filter(
+                chip__sub__condition__experiment__name=self.experiment_name
+            ).aggregate(count=Count('pk'), modified=Max('modified')).values())
+        return stamp
+
+    def load_with_cell_gap(self, header, model) -> pd.DataFrame:
+        """
+        Load the logs from the snapshot, and join the cell gap of their chip
+        (and point), the logs without cell gap are dropped. Without cell gap
+        assignment, return the logs only.
+
+        The loaded data are memoized in this process, and a shallow copy is
+        returned: adding or replacing columns is fine, but the values are
+        shared, do not write them in place. The columns from the snapshot
+        are read-only.
+        """
+        stamp = self.stamp(header, model)
+        key = (self.experiment_name, self.cell_gap, model.__name__)
+        with self.results_lock:
+            cached = self.results.get(key)
+            if cached is not None and cached[0] == stamp:
+                self.results.move_to_end(key)
+                return cached[1].copy(deep=False)
+
+        logs = self.snapshot(header, model).load(stamp[0])
+        if len(logs) == 0:
+            raise ValueError(
+                f'There is no {model.__name__} data in '
+                f'experiment {self.experiment_name}'
+            )
+        if self.cell_gap is None:
+            df = logs.drop(columns=self.chip_key)
+        else:
+            df = self.join_cell_gap(header, model, logs)
+
+        self.keep(key, stamp, df)
+        return df.copy(deep=False)
+
+    def join_cell_gap(self, header, model, logs: pd.DataFrame) -> pd.DataFrame:
+        """
+        Join the cell gap table of the experiment to the logs by the chip,
+        and the point if the cell gap is measured by point.
+        """
+        gap_model, by_point = self.gap_sources[self.cell_gap]
+        fields = [self.chip_key] + (['measure_point'] if by_point else [])
+        on = [self.chip_key] + ([header['measure_point']] if by_point else [])
+        gaps = pd.DataFrame.from_records(
+            gap_model.objects.filter(
+                chip__sub__condition__experiment__name=self.experiment_name
+            ).values_list(*fields, 'cell_gap'),
+            columns=on + ['Cell Gap'],
+        )
+        if len(gaps) == 0:
+            raise ValueError(
+                f'There is no {gap_model.__name__} data in '
+                f'experiment {self.experiment_name}'
+            )
+        df = logs.merge(gaps, on=on, how='inner').drop(columns=self.chip_key)
+        if len(df) == 0:
+            log_name = 'OPT' if model is OpticalLog else 'RT'
+            raise ValueError(
+                f'There are no suitable cell gap in {log_name} log, '
+                'check the gap data again'
+            )
+        return df
+
+    @classmethod
+    def keep(cls, key: tuple, stamp: tuple, df: pd.DataFrame):
+        """
+        Memoize the data, the least recently used ones are dropped to keep
+        the bytes within settings.OPT_LOADER_CACHE_BYTES.
+        """
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        with cls.results_lock:
+            if key in cls.results:
+                cls.results_bytes -= cls.results.pop(key)[2]
+            if size > settings.OPT_LOADER_CACHE_BYTES:
+                return
+            cls.results[key] = (stamp, df, size)
+            cls.results_bytes += size
+            while cls.results_bytes > settings.OPT_LOADER_CACHE_BYTES:
+                cls.results_bytes -= cls.results.popitem(last=False)[1][2]
+
     @property
     def axo(self):
         header = {
@@ -123,45 +278,15 @@ class OptLoader():
                 f'The {self.cell_gap} method is not implement now.'
             )
 
-        # Setting the needed data, and the proper columns name for later use.
-        header = {
-            "chip__name": "ID",
-            "chip__lc__name": "LC",
-            "chip__pi__name": "PI",
-            "chip__seal__name": "Seal",
-            "measure_point": "Point",
-            "voltage": "Vop",
-            "lc_percent": "LC%",
-            "w_x": "Wx",
-            "w_y": "Wy",
-            "w_capital_y": "WY",
-        }
-        # Query from database, and transform to pd.dataframe
-        df = self.load_by_experiment(header, OpticalLog)
-        
+        # Query the logs with cell gap, and transform to pd.dataframe
+        df = self.load_with_cell_gap(self.opt_header, OpticalLog)
+
         # no cell gap assignment, return raw directly
         if self.cell_gap is None:
             return df
 
-        if self.cell_gap == 'axo':
-            axo_df = self.axo
-            df = pd.merge(df, axo_df, on=['ID', 'Point'], how='inner')
-        elif self.cell_gap == 'rdl':
-            rdl_df = self.rdl
-            df = pd.merge(df, rdl_df, on='ID', how='inner')
-        elif self.cell_gap == 'rdl_alter':
-            rdl_alter_df = self.rdl_alter
-            df = pd.merge(df, rdl_alter_df, on=['ID', 'Point'], how='inner')
-
-        if len(df) == 0:
-            raise ValueError(
-                'There are no suitable cell gap in OPT log, check the gap data again'
-            )
-
         # calculate T% by LC%
-        def max_percent(arr):
-            return 100 * arr / max(arr)
-        df['T%'] = df.groupby(by=['ID', 'Point'])['LC%'].apply(max_percent)
+        df['T%'] = group_max_normalize(df, 'LC%')
         return df
 
     @property
@@ -174,36 +299,13 @@ class OptLoader():
         if self.cell_gap not in ['axo', 'rdl', 'rdl_alter', None]:
             raise ValueError(f'The {self.cell_gap} method is not implemented now.')
 
-        # Setting the needed data, and the proper columns name for later use.
-        header = {
-            "chip__name": "ID",
-            "chip__lc__name": "LC",
-            "chip__pi__name": "PI",
-            "chip__seal__name": "Seal",
-            "measure_point": "Point",
-            "voltage": "Vop",
-            "time_rise": "Tr",
-            "time_fall": "Tf",
-        }
-        # Query from database, and transform to pd.dataframe
-        df = self.load_by_experiment(header, ResponseTimeLog)
+        # Query the logs with cell gap, and transform to pd.dataframe
+        df = self.load_with_cell_gap(self.rt_header, ResponseTimeLog)
 
         # no cell gap assignment, return raw directly
         if self.cell_gap is None:
             return df
 
-        if self.cell_gap == 'axo':
-            axo_df = self.axo
-            df = pd.merge(df, axo_df, on=['ID', 'Point'], how='inner')
-        elif self.cell_gap == 'rdl':
-            rdl_df = self.rdl
-            df = pd.merge(df, rdl_df, on='ID', how='inner')
-        elif self.cell_gap == 'rdl_alter':
-            rdl_alter_df = self.rdl_alter
-            df = pd.merge(df, rdl_alter_df, on=['ID', 'Point'], how='inner')
-
-        if len(df) == 0:
-            raise ValueError('There are no suitable cell gap in RT log, check the gap data again')
         df['RT'] = df['Tr'] + df['Tf']
         return df
     
@@ -283,6 +385,10 @@ class OPTFitting():
         
         self.opt_df = opt_df[opt_df['Vop'] > opt_cutoff]
         self.preprocess()
+        self.voltage_range = VoltageRange(
+            self.opt_df['Vop'].min(),
+            self.opt_df['Vop'].max(),
+        )
         
         self.opt_sets = {}
         self.opt_sets['train'], self.opt_sets['test'] = train_test_split(
@@ -311,6 +417,19 @@ class OPTFitting():
         
         self.opt_df = self.opt_df[~self.opt_df['ID'].isin(brokens)]
 
+    def model_names(self) -> list[str]:
+        # get all models, the naming rule is ^([a-z]+_)+model$
+        return [s for s in self.__dir__() 
+            if re.search('^([a-z]+_)+model$', s)]
+
+    def set_fitted(self, model_name: str, model, r2: dict):
+        """
+        Set the model fitted elsewhere, like on the process pool,
+        see `FittingExecutor`.
+        """
+        setattr(self, '_OPTFitting__' + model_name, model)
+        self.r2.update(r2)
+
     def calc(self, models=None):
         """
         Calculate all model at once.
@@ -320,9 +439,7 @@ class OPTFitting():
         models: list[str]
             The list of the models' name
         """
-        # get all models, the naming rule is ^([a-z]+_)+model$
-        to_be_cal = [s for s in self.__dir__() 
-            if re.search('^([a-z]+_)+model$', s)]
+        to_be_cal = self.model_names()
         if models is not None:
             to_be_cal = models
         
@@ -352,7 +469,7 @@ class OPTFitting():
             lc = LiquidCrystal.objects.get(name=self.name.lc)
             pi = Polyimide.objects.get(name=self.name.pi)
             seal = Seal.objects.get(name=self.name.seal)
-            obj = OptFittingModel.objects.create(
+            obj = OptFittingModel(
                 experiment=experiment,
                 lc=lc,
                 pi=pi,
@@ -367,6 +484,8 @@ class OPTFitting():
                 v_percent=self.v_percent_model,
                 r2=self.r2,
             )
+            obj.grid = fitting_grid(obj, self.voltage_range)
+            obj.save()
             return obj
    
     @staticmethod
@@ -498,17 +617,7 @@ class OPTFitting():
             return self.__v_percent_model
 
         # 1. should cut of T% after 100, make f(T%) is a funciton
-        opt_df = self.opt_df.copy()
-        opt_cut_off_list: list[pd.DataFrame] = []
-        for id in opt_df['ID'].unique():
-            id = cast(str, id)
-            tmp_df_1 = opt_df[opt_df['ID']==id]
-            for point in tmp_df_1['Point'].unique():
-                point = cast(int, point)
-                tmp_df_2 = tmp_df_1[tmp_df_1['Point']==point]
-                tmp_df_2 = tmp_df_2.iloc[:tmp_df_2['T%'].argmax(),:]
-                opt_cut_off_list.append(tmp_df_2)
-        opt_cut_off_df = pd.concat(opt_cut_off_list)
+        opt_cut_off_df = truncate_at_argmax(self.opt_df, 'T%')
         # 2. And we usually inteterstin in the higer T% region
         #    Select 85% for now.
         opt_cut_off_df = opt_cut_off_df[opt_cut_off_df['T%']>85]
@@ -557,6 +666,10 @@ class RTFitting():
             rt_df['Cell Gap'].min(), 
             rt_df['Cell Gap'].max(),
         )
+        self.voltage_range = VoltageRange(
+            self.rt_df['Vop'].min(),
+            self.rt_df['Vop'].max(),
+        )
         
         self.rt_sets = {}
         self.rt_sets['train'], self.rt_sets['test'] = train_test_split(
@@ -584,6 +697,19 @@ class RTFitting():
         
         self.rt_df = self.rt_df[~self.rt_df['ID'].isin(brokens)]
 
+    def model_names(self) -> list[str]:
+        # get all models, the naming rule is ^([a-z]+_)+model$
+        return [s for s in self.__dir__() 
+            if re.search('^([a-z]+_)+model$', s)]
+
+    def set_fitted(self, model_name: str, model, r2: dict):
+        """
+        Set the model fitted elsewhere, like on the process pool,
+        see `FittingExecutor`.
+        """
+        setattr(self, '_RTFitting__' + model_name, model)
+        self.r2.update(r2)
+
     def calc(self, models=None):
         """
         Calculate all model at once.
@@ -593,9 +719,7 @@ class RTFitting():
         models: list[str]
             The list of the models' name
         """
-        # get all models, the naming rule is ^([a-z]+_)+model$
-        to_be_cal = [s for s in self.__dir__() 
-            if re.search('^([a-z]+_)+model$', s)]
+        to_be_cal = self.model_names()
         if models is not None:
             to_be_cal = models
         
@@ -623,7 +747,7 @@ class RTFitting():
             lc = LiquidCrystal.objects.get(name=self.name.lc)
             pi = Polyimide.objects.get(name=self.name.pi)
             seal = Seal.objects.get(name=self.name.seal)
-            obj = RTFittingModel.objects.create(
+            obj = RTFittingModel(
                 experiment=experiment,
                 lc=lc,
                 pi=pi,
@@ -636,6 +760,8 @@ class RTFitting():
                 time_fall=self.time_fall_model,
                 r2=self.r2,
             )
+            obj.grid = fitting_grid(obj, self.voltage_range)
+            obj.save()
             return obj
     @property
     def voltage_model(self):
@@ -1127,9 +1253,9 @@ class OptResultGenerator():
         """
         self.lc = LiquidCrystal.objects.get(name=lc)
         # TODO: Need re-consider what's the better way to construct result
-        self.models = OpticalsFittingModel.objects.filter(
-            lc__name=lc
-        ).latest('created')
+        self.models = model_registry.latest(
+            OpticalsFittingModel.objects.filter(lc__name=lc), 'created'
+        )
         self.range = (
             self.models.cell_gap_lower, self.models.cell_gap_upper
         )
@@ -1156,9 +1282,12 @@ class OptResultGenerator():
             # add origin data to ref
             self.__ref = self.ref_data
             # get some fitting property of ref
-            ref_models = OpticalsFittingModel.objects.filter(
-                lc__name=self.ref_data['LC']
-            ).latest('created')
+            ref_models = model_registry.latest(
+                OpticalsFittingModel.objects.filter(
+                    lc__name=self.ref_data['LC']
+                ),
+                'created',
+            )
             x = [[self.__ref['Tr'], self.__ref['Cell Gap']]]
             # calculate ref vop by the voltage model
             self.__ref['Vop'] = ref_models.voltage.predict(x)[0]
@@ -1215,34 +1344,19 @@ class OptResultGenerator():
         table['Wy'] = self.models.w_y.predict(predict_region)
         table['ΔWy'] = table['Wy'] - self.ref['Wy']
         table['WY'] = self.models.w_capital_y.predict(predict_region)
-        table['WX'] = table['Wx'] * table['WY'] / table['Wy']
-        table['WZ'] = (1-table['Wx']-table['Wy']) * table['WY'] / table['Wy']
+        color = color_columns(table['Wx'], table['Wy'], table['WY'])
+        table['WX'] = color['WX']
+        table['WZ'] = color['WZ']
         table['T%'] = self.models.transmittance.predict(predict_region)
         table['LC%'] = self.models.lc_percent.predict(predict_region)
 
         # Eab part
-        f_x = self.f(table['WX'], 'Xn')
-        f_y = self.f(table['WY'], 'Yn')
-        f_z = self.f(table['WZ'], 'Zn')
-        table['a*'] = 500 * (f_x-f_y) # type: ignore
-        table['b*'] = 200 * (f_y-f_z) # type: ignore
-        table['L*'] = 116 * f_y - 16
-        table["u'"] = 4 * table['Wx'] / (-2*table['Wx'] + 12*table['Wy'] + 3)
-        table["v'"] = 9 * table['Wy'] / (-2*table['Wx'] + 12*table['Wy'] + 3)
-        # prepend 0 to keep the length the same, eleminate after tablize
-        table['Δa*'] = np.diff(table['a*'], prepend=0)
-        table['Δb*'] = np.diff(table['b*'], prepend=0)
-        table['ΔL*'] = np.diff(table['L*'], prepend=0)
-        # Euclidean distance is the same with L2 norm
-        # so numpy.linalg.norm() can get the distance between columns
-        # see https://numpy.org/doc/stable/reference/generated/numpy.linalg.norm.html
-        table['ΔEab*'] = np.linalg.norm(
-            [table['Δa*'], table['Δb*'], table['ΔL*']], 
-            axis=0,
-        )
-        table["Δu'"] = np.diff(table["u'"], prepend=0)
-        table["Δv'"] = np.diff(table["v'"], prepend=0)
-        table["Δu'v'"] = np.linalg.norm([table["Δu'"], table["Δv'"]], axis=0)
+        # the differences of the 0-th row are eleminated after tablize
+        for column in [
+            'a*', 'b*', 'L*', "u'", "v'",
+            'Δa*', 'Δb*', 'ΔL*', 'ΔEab*', "Δu'", "Δv'", "Δu'v'",
+        ]:
+            table[column] = color[column]
 
         # CR part
         table['D'] = self.lc.scatter_index * table['Cell Gap']
@@ -1276,23 +1390,6 @@ class OptResultGenerator():
         })
         return df
 
-    @staticmethod
-    def f(x: NDArray[np.float64], opt: str):
-        """
-        Aux fuction for calculating Eab
-        """
-        blu = {
-            'Xn': 95.04,
-            'Yn': 100.,
-            'Zn': 108.86
-        }
-        x_over_blu = x/blu[opt]
-        return np.where(
-            x_over_blu < 0.008856,
-            7.787 * x/blu[opt] + 16/116,
-            (x/blu[opt]) ** (1/3)
-        )
-
 def tr2_score(
     column: NDArray[np.float64],
     method='mean', 
@@ -1513,6 +1610,24 @@ class OptTableGenerator():
             
         self.voltage = voltage
             
+    @staticmethod
+    def color(
+        wx: NDArray[np.float64],
+        wy: NDArray[np.float64],
+        w_capital_y: NDArray[np.float64],
+        groups: NDArray | None = None,
+    ) -> dict[str, NDArray[np.float64]]:
+        """
+        The colorimetry columns, see `colorimetry.color_columns`.
+        The tables take L*a*b* of (Wx, Wy, WZ).
+        """
+        return color_columns(
+            wx, wy, w_capital_y, groups,
+            lab_input=np.column_stack([
+                wx, wy, tristimulus(wx, wy, w_capital_y)[:, 2],
+            ]),
+        )
+
     def opt_generator(
         self,
         model: OptFittingModel,
@@ -1541,49 +1656,17 @@ class OptTableGenerator():
         record['Wx'] = model.w_x.predict(predict_region)
         record['Wy'] = model.w_y.predict(predict_region)
         record['WY'] = model.w_capital_y.predict(predict_region)
-        record['WX'] = record['Wx'] * record['WY'] / record['Wy']
-        record['WZ'] = (1-record['Wx']-record['Wy']) * record['WY'] / record['Wy']
-        record['T%'] = model.transmittance.predict(predict_region)
-        record['LC%'] = model.lc_percent.predict(predict_region)
-        
-        def f(x, opt):
-            """
-            Aux fuction for calculating Eab
-            """
-            blu = {
-                'Xn': 95.04,
-                'Yn': 100.,
-                'Zn': 108.86
-            }
-            x_over_blu = x/blu[opt]
-            return np.where(
-                x_over_blu < 0.008856,
-                7.787 * x/blu[opt] + 16/116,
-                np.abs(x/blu[opt]) ** (1/3)
-            )
-        f_x = f(record['Wx'], 'Xn')
-        f_y = f(record['Wy'], 'Yn')
-        f_z = f(record['WZ'], 'Zn')
-        
-        record['a*'] = 500 * (f_x - f_y) # type: ignore
-        record['b*'] = 200 * (f_y - f_z) # type: ignore
-        record['L*'] = 116 * f_y - 16
-        record["u'"] = 4 * record['Wx'] / (-2*record['Wx'] + 12*record['Wy'] + 3)
-        record["v'"] = 9 * record['Wy'] / (-2*record['Wx'] + 12*record['Wy'] + 3)
-        # prepend 0 to keep the length the same, eleminate after tablize
-        record['Δa*'] = np.diff(record['a*'], prepend=0)
-        record['Δb*'] = np.diff(record['b*'], prepend=0)
-        record['ΔL*'] = np.diff(record['L*'], prepend=0)
-        # Euclidean distance is the same with L2 norm
-        # so numpy.linalg.norm() can get the distance between columns
-        # see https://numpy.org/doc/stable/reference/generated/numpy.linalg.norm.html
-        record['ΔEab*'] = np.linalg.norm(
-            [record['Δa*'], record['Δb*'], record['ΔL*']], 
-            axis=0,
-        )
-        record["Δu'"] = np.diff(record["u'"], prepend=0)
-        record["Δv'"] = np.diff(record["v'"], prepend=0)
-        record["Δu'v'"] = np.linalg.norm([record["Δu'"], record["Δv'"]], axis=0)
+        color = self.color(record['Wx'], record['Wy'], record['WY'])
+        record['WX'] = color['WX']
+        record['WZ'] = color['WZ']
+        record['T%'] = grid_predict(model, 'transmittance', predict_region)
+        record['LC%'] = grid_predict(model, 'lc_percent', predict_region)
+        # the differences of the 0-th row are eleminated after tablize
+        for column in [
+            'a*', 'b*', 'L*', "u'", "v'",
+            'Δa*', 'Δb*', 'ΔL*', 'ΔEab*', "Δu'", "Δv'", "Δu'v'",
+        ]:
+            record[column] = color[column]
 
         # CR part
         record['D'] = model.lc.scatter_index * record['Cell Gap']
@@ -1613,13 +1696,81 @@ class OptTableGenerator():
         record['Voltage'] = voltages
         record['Cell Gap'] = cell_gaps
         
-        record['RT'] = model.response_time.predict(predict_region)
-        record['Tr'] = model.time_rise.predict(predict_region)
+        record['RT'] = grid_predict(model, 'response_time', predict_region)
+        record['Tr'] = grid_predict(model, 'time_rise', predict_region)
         record['Tf'] = model.time_fall.predict(cell_gaps.reshape(-1, 1))
         
         return pd.DataFrame(record)
         
             
+    def latest_models(self) -> list[tuple]:
+        """
+        The newest OPT model of each (LC, PI) and its RT models, resolved
+        by one query of each fitting model and matched in memory.
+
+        Returns
+        -------
+        list of (opt_model, rt_model, ref_rt_model)
+            rt_model is the RT model at the V estimate: the only one of the
+            same LC and PI, or the newest one of the same LC if there is no
+            same PI. ref_rt_model is the RT model at the Vref: the newest one
+            of the same LC and PI, or else of the same LC. They are None if
+            not matched.
+        """
+        opt_models = list(model_registry.deferred(
+            self.opt_models.select_related('lc', 'pi', 'seal')
+        ).order_by('-modified'))
+        latest: dict[tuple, OptFittingModel] = {}
+        for model in opt_models:
+            latest.setdefault((model.lc_id, model.pi_id), model)
+        configs = [latest[key] for key in sorted(latest)]
+
+        rt_models: list[RTFittingModel] = []
+        if self.rt_models is not None:
+            rt_models = list(model_registry.deferred(
+                self.rt_models.select_related('lc', 'pi', 'seal')
+            ).order_by('-modified'))
+        same_lc_pi = defaultdict(list)
+        same_lc = defaultdict(list)
+        for model in rt_models:
+            same_lc_pi[(model.lc.name, model.pi.name)].append(model)
+            same_lc[model.lc.name].append(model)
+
+        matches = []
+        for opt_model in configs:
+            lc_pi = same_lc_pi.get((opt_model.lc.name, opt_model.pi.name), [])
+            lc = same_lc.get(opt_model.lc.name, [])
+            if len(lc_pi) == 1:
+                rt_model = lc_pi[0]
+            elif len(lc_pi) == 0 and len(lc) > 0:
+                rt_model = lc[0]
+            else:
+                rt_model = None
+            ref_rt_model = (lc_pi or lc or [None])[0]
+            matches.append((opt_model, rt_model, ref_rt_model))
+
+        model_registry.attach(configs)
+        model_registry.attach(list({
+            model.pk: model
+            for _, rt_model, ref_rt_model in matches
+            for model in (rt_model, ref_rt_model) if model is not None
+        }.values()))
+        return matches
+
+    def config_cell_gaps(self, opt_model: OptFittingModel) -> NDArray[np.float64]:
+        if self.target_cell_gap is None:
+            cell_gap: float = opt_model.lc.designed_cell_gap
+            cell_gap_range = CellGapRange(
+                cell_gap - 0.6,
+                cell_gap + 0.5,
+            )
+            return np.linspace(
+                cell_gap_range.min,
+                cell_gap_range.max,
+                12,
+            )
+        return cast(NDArray[np.float64], self.cell_gaps)
+
     def calc(self):
         
         # Calculate the optical(VT) part
@@ -1627,59 +1778,20 @@ class OptTableGenerator():
         # calculate the Vref from RT part
         self.tables = {}        
         v_estimate = self.voltage
+        matches = self.latest_models()
         
         opt_table_list: list[pd.DataFrame] = []
-        for cfg in self.opt_models.values_list(
-            'lc', 'pi', named=True,
-        ).distinct():
-            opt_model = self.opt_models.filter(
-                lc=cfg.lc, pi=cfg.pi
-            ).order_by('-modified')[0]
-            if self.target_cell_gap is None:
-                cell_gap = opt_model.lc.designed_cell_gap
-                cell_gap_range = CellGapRange(
-                    cell_gap - 0.6,
-                    cell_gap + 0.5,
-                )
-                cell_gaps: NDArray[np.float64] = np.linspace(
-                    cell_gap_range.min,
-                    cell_gap_range.max,
-                    12,
-                )
-                
-            else:
-                cell_gaps = cast(NDArray[np.float64], self.cell_gaps)
+        for opt_model, rt_model, _ in matches:
+            cell_gaps = self.config_cell_gaps(opt_model)
             voltages = np.array([v_estimate]*len(
                 cell_gaps
             ))
             opt_table_list.append(self.opt_generator(
                 opt_model, voltages, cell_gaps
             ))
-            if self.rt_models is not None:
-                # Fisrt check if the LC and PI are the same
-                # and unique
-                if self.rt_models.filter(
-                    lc__name=opt_model.lc.name,
-                    pi__name=opt_model.pi.name,
-                ).count() == 1:
-                    rt_model = self.rt_models.get(
-                        lc__name=opt_model.lc.name,
-                        pi__name=opt_model.pi.name,
-                    )
-                # If not, check if the LC is the same
-                elif (self.rt_models.filter(
-                    lc__name=opt_model.lc.name,
-                    pi__name=opt_model.pi.name,
-                ).count() == 0) & (self.rt_models.filter(
-                    lc__name=opt_model.lc.name,
-                ).count() > 0):
-                    rt_model = self.rt_models.filter(
-                        lc__name=opt_model.lc.name,
-                    )[0]
-                # If not, skip this LC
-                else:
-                    continue
-                
+            # the only RT model of the same LC and PI, or the newest one
+            # of the same LC, else skip this LC
+            if rt_model is not None:
                 rt_table = self.rt_generator(
                     rt_model, voltages, cell_gaps
                 )
@@ -1697,12 +1809,12 @@ class OptTableGenerator():
                 LC = 1
                 LCPI = 2
             
-            for model in self.rt_models.filter(
+            for model in model_registry.all(self.rt_models.filter(
                 lc=self.reference.lc,
                 pi=self.reference.pi,
                 cell_gap_lower__lte=self.reference.cell_gap,
                 cell_gap_upper__gte=self.reference.cell_gap,
-            ):
+            )):
                 # print(model.r2['f(Tr, Cell Gap) |-> Vop'])
                 # print(model.pi)
                 if model.r2['f(Tr, Cell Gap) |-> Vop'] > 0.8:
@@ -1710,11 +1822,11 @@ class OptTableGenerator():
                     ref_match = Match.LCPI
                     break
             else:
-                for model in RTFittingModel.objects.filter(
+                for model in model_registry.all(RTFittingModel.objects.filter(
                     lc=self.reference.lc,
                     cell_gap_lower__lte=self.reference.cell_gap,
                     cell_gap_upper__gte=self.reference.cell_gap,
-                ).order_by('-modified'):
+                ).order_by('-modified')):
                     if model.r2['f(Vop, Cell Gap) |-> Tr'] > 0.8:
                         rt_model = model
                         ref_match = Match.LC
@@ -1729,52 +1841,19 @@ class OptTableGenerator():
                     [[self.reference.time_rise, self.reference.cell_gap]]
                 )[0]
                 opt_table_list: list[pd.DataFrame] = []
-                for cfg in self.opt_models.values_list(
-                    'lc', 'pi', named=True,
-                ).distinct():
-                    opt_model = self.opt_models.filter(
-                        lc=cfg.lc, pi=cfg.pi
-                    ).order_by('-modified')[0]
-                    if self.target_cell_gap is None:
-                        cell_gap: float = opt_model.lc.designed_cell_gap
-                        cell_gap_range = CellGapRange(
-                            cell_gap - 0.6,
-                            cell_gap + 0.5,
-                        )
-                        cell_gaps = np.linspace(
-                            cell_gap_range.min,
-                            cell_gap_range.max,
-                            12,
-                        )
-                        
-                    else:
-                        cell_gaps = cast(NDArray[np.float64], self.cell_gaps)
-                        
+                for opt_model, _, ref_rt_model in matches:
+                    cell_gaps = self.config_cell_gaps(opt_model)
                     voltages = np.array([ref_voltage]*len(cell_gaps))
                     opt_table_list.append(self.opt_generator(
                         opt_model, voltages, cell_gaps
                     ))
-                    if self.rt_models.filter(
-                        lc__name=opt_model.lc.name,
-                        pi__name=opt_model.pi.name,
-                    ).count() > 0:
-                        rt_model = self.rt_models.filter(
-                            lc__name=opt_model.lc.name,
-                            pi__name=opt_model.pi.name,
-                        ).order_by('-modified')[0]
-                    # If not, check if the LC is the same
-                    elif self.rt_models.filter(
-                        lc__name=opt_model.lc.name,
-                    ).count() > 0:
-                        rt_model = self.rt_models.filter(
-                            lc__name=opt_model.lc.name,
-                        ).order_by('-modified')[0]
-                    # If not, skip this LC
-                    else:
+                    # the newest RT model of the same LC and PI, or else
+                    # of the same LC, if not, skip this LC
+                    if ref_rt_model is None:
                         print(f'skip LC: {opt_model.lc.name}')
                         continue
                     rt_table = self.rt_generator(
-                        rt_model, voltages, cell_gaps
+                        ref_rt_model, voltages, cell_gaps
                     )
                     opt_table_list[-1] = pd.merge(
                         opt_table_list[-1], rt_table,
@@ -1806,3 +1885,136 @@ class OptTableGenerator():
                         self.reference.contrast_ratio / ref_cr_index
                     )
 
+    # the targets of the sweep, (target, model field, inputs)
+    # the inputs are 'region' for (Voltage, Cell Gap),
+    # a percent for (V%, Cell Gap) and 'cell_gap' for (Cell Gap)
+    opt_sweep_targets = [
+        ('Wx', 'w_x', 'region'),
+        ('Wy', 'w_y', 'region'),
+        ('WY', 'w_capital_y', 'region'),
+        ('T%', 'transmittance', 'region'),
+        ('LC%', 'lc_percent', 'region'),
+        ('V90', 'v_percent', 90),
+        ('V95', 'v_percent', 95),
+        ('V99', 'v_percent', 99),
+    ]
+    rt_sweep_targets = [
+        ('RT', 'response_time', 'region'),
+        ('Tr', 'time_rise', 'region'),
+        ('Tf', 'time_fall', 'cell_gap'),
+    ]
+
+    def sweep(
+        self,
+        voltages: ArrayLike,
+        cell_gaps: ArrayLike,
+    ) -> pd.DataFrame:
+        """
+        Evaluate all the targets of all the configurations on the grid of
+        the voltages and cell gaps.
+
+        Each target is predicted for every configuration in one batched
+        pass, see `compact.predict_stacked`, and the colorimetry of all of
+        them is computed at once, the differences (Δ) are from the previous
+        cell gap at the same voltage, so the first cell gap has none. The RT
+        targets are from the RT model at the V estimate of `latest_models`,
+        the configurations without it have no RT rows.
+
+        Parameters
+        ----------
+        voltages: array like
+        cell_gaps: array like
+
+        Returns
+        -------
+        pandas.DataFrame
+            The long format with columns
+            LC, PI, Seal, Voltage, Cell Gap, Target, Value.
+        """
+        voltages = np.asarray(voltages, dtype=float).ravel()
+        cell_gaps = np.asarray(cell_gaps, dtype=float).ravel()
+        grid_voltage, grid_cell_gap = (
+            grid.ravel() for grid in np.meshgrid(
+                voltages, cell_gaps, indexing='ij',
+            )
+        )
+        inputs = {
+            'region': np.column_stack([grid_voltage, grid_cell_gap]),
+            'cell_gap': grid_cell_gap[:, np.newaxis],
+        }
+
+        def predict(models: list, field: str, input) -> NDArray:
+            x = inputs[input] if isinstance(input, str) else np.column_stack(
+                [np.full(len(grid_cell_gap), input), grid_cell_gap]
+            )
+            return predict_stacked(
+                [getattr(model, field) for model in models], x
+            )
+
+        matches = self.latest_models()
+        opt_models = [opt_model for opt_model, _, _ in matches]
+        rt_index = [
+            i for i, (_, rt_model, _) in enumerate(matches)
+            if rt_model is not None
+        ]
+        rt_models = [matches[i][1] for i in rt_index]
+
+        targets = [target for target, _, _ in self.opt_sweep_targets]
+        # (target, configuration, grid point)
+        values = [
+            predict(opt_models, field, input)
+            for _, field, input in self.opt_sweep_targets
+        ]
+        # the colorimetry of all the configurations at once, the differences
+        # are between the neighbouring cell gaps at the same voltage
+        groups = np.arange(len(opt_models) * len(grid_cell_gap)) // max(
+            len(cell_gaps), 1
+        )
+        color = self.color(
+            *(values[targets.index(target)].ravel()
+              for target in ['Wx', 'Wy', 'WY']),
+            groups,
+        )
+        first = group_starts(groups, len(groups))
+        for column in COLOR_COLUMNS:
+            value = color[column]
+            if column.startswith('Δ'):
+                value = np.where(first, np.nan, value)
+            targets.append(column)
+            values.append(value.reshape(len(opt_models), len(grid_cell_gap)))
+        if rt_models:
+            targets += [target for target, _, _ in self.rt_sweep_targets]
+            for _, field, input in self.rt_sweep_targets:
+                value = np.full((len(opt_models), len(grid_cell_gap)), np.nan)
+                value[rt_index] = predict(rt_models, field, input)
+                values.append(value)
+        values = np.stack(values)
+
+        n_targets, n_configs, n_points = values.shape
+        target_codes = np.repeat(np.arange(n_targets), n_configs * n_points)
+        config_codes = np.tile(
+            np.repeat(np.arange(n_configs), n_points), n_targets
+        )
+        point_codes = np.tile(np.arange(n_points), n_targets * n_configs)
+        keep = ~np.isnan(values.ravel())
+
+        def categorical(names: list, codes: NDArray) -> pd.Categorical:
+            name_codes, categories = pd.factorize(np.array(names, dtype=object))
+            return pd.Categorical.from_codes(
+                name_codes[codes[keep]],
+                categories=categories,
+            )
+
+        return pd.DataFrame({
+            'LC': categorical(
+                [model.lc.name for model in opt_models], config_codes),
+            'PI': categorical(
+                [model.pi.name for model in opt_models], config_codes),
+            'Seal': categorical(
+                [model.seal.name for model in opt_models], config_codes),
+            'Voltage': grid_voltage[point_codes[keep]],
+            'Cell Gap': grid_cell_gap[point_codes[keep]],
+            'Target': categorical(targets, target_codes),
+            'Value': values.ravel()[keep],
+        })
+
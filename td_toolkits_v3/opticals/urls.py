@@ -148,6 +148,11 @@ urlpatterns = [
         views.OpticalDataDumpView.as_view(),
         name='data_dump'
     ),
+    path(
+        'data/dump/bulk/',
+        views.OpticalBulkDumpView.as_view(),
+        name='bulk_dump'
+    ),
     path(
         'tr2/',
         views.OpticalPhaseTwoView.as_view(),
@@ -1,13 +1,16 @@
-from io import BytesIO
+from datetime import datetime, time
 from typing import List, Dict, Tuple, Union, Optional, Any
 
 import pandas as pd
 import plotly.express as px
 from plotly.offline import plot
 
-from django.http import HttpResponse
+from django.core.exceptions import BadRequest
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.utils.http import urlencode
 from django.views.generic import (
     TemplateView,
@@ -19,8 +22,12 @@ from django.views.generic.edit import FormView, CreateView, UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.cache import cache
 
+from td_toolkits_v3.jobs.models import Job
+from td_toolkits_v3.jobs.views import JobFormMixin, JobResultMixin
 from td_toolkits_v3.materials.models import LiquidCrystal
 from td_toolkits_v3.products.models import Experiment
+from td_toolkits_v3.utils.downloads import download_response, files_response
+from td_toolkits_v3.utils.results import ResultStore
 
 from td_toolkits_v3.opticals.tools.utils import (
     # OptResultGenerator, 
@@ -28,6 +35,8 @@ from td_toolkits_v3.opticals.tools.utils import (
     OptictalsScore,
     OptLoader,
 )
+from td_toolkits_v3.opticals.tools.export import OpticalExport
+from td_toolkits_v3.opticals.tools.search_cache import OpticalSearchCache
 
 from . import forms
 
@@ -97,7 +106,7 @@ class RDLCellGapUploadView(LoginRequiredMixin, FormView):
     success_url = reverse_lazy('opticals:rdl_cell_gap_upload_success')
 
     def form_valid(self, form):
-        form.save()
+        form.save(self.request)
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
@@ -137,7 +146,7 @@ class AlternativeCellGapUploadView(LoginRequiredMixin, FormView):
     success_url = reverse_lazy('opticals:rdl_cell_gap_upload_success')
     
     def form_valid(self, form):
-        form.save()
+        form.save(self.request)
         return super().form_valid(form)
     
     def get_context_data(self, **kwargs):
@@ -147,13 +156,13 @@ class AlternativeCellGapUploadView(LoginRequiredMixin, FormView):
                              + '?download=optical_alter_rdl_cellgap_upload_template'
         return context
 
-class OptUploadView(LoginRequiredMixin, FormView):
+class OptUploadView(LoginRequiredMixin, JobFormMixin, FormView):
     template_name = 'form_generic.html'
     form_class = OptUploadForm
     success_url = reverse_lazy('opticals:toc_opt_log_upload_success')
 
     def form_valid(self, form):
-        form.save(self.request)
+        self.job = form.save(self.request)
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
@@ -161,26 +170,26 @@ class OptUploadView(LoginRequiredMixin, FormView):
         context['title'] = "TOC VT Upload"
         return context
 
-class OptUploadSuccessView(TemplateView):
+class OptUploadSuccessView(JobResultMixin, TemplateView):
     template_name: str = 'success_generic.html'
     
     def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
         context = super().get_context_data(**kwargs)
         context['title'] = 'TOC OPT Upload Success'
-        context['log'] = cache.get('save_log')
+        context['log'] = self.get_job_result('save_log')
         context['nexts'] = {
             "RT Upload": reverse_lazy('opticals:toc_rt_log_upload'),
             "OPT Fitting": reverse_lazy('opticals:opt_fitting'),
         }
         return context
                 
-class ResponseTimeUploadView(LoginRequiredMixin, FormView):
+class ResponseTimeUploadView(LoginRequiredMixin, JobFormMixin, FormView):
     template_name = 'form_generic.html'
     form_class = ResponseTimeUploadForm
     success_url = reverse_lazy('opticals:toc_rt_log_upload_success')
 
     def form_valid(self, form):
-        form.save(self.request)
+        self.job = form.save(self.request)
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
@@ -188,13 +197,13 @@ class ResponseTimeUploadView(LoginRequiredMixin, FormView):
         context['title'] = 'TOC Response Time Upload'
         return context
 
-class ResponseTimeUploadSuccessView(TemplateView):
+class ResponseTimeUploadSuccessView(JobResultMixin, TemplateView):
     template_name = 'success_generic.html'
     
     def get_context_data(self, **kwargs: Any) -> Dict[str, Any]:
         context = super().get_context_data(**kwargs)
         context['title'] = 'TOC Response Time Upload Success'
-        context['log'] = cache.get('save_log')
+        context['log'] = self.get_job_result('save_log')
         context['nexts'] = {
             "OPT Upload": reverse_lazy('opticals:toc_opt_log_upload'),
             "RT Fitting": reverse_lazy('opticals:rt_fitting'),
@@ -247,25 +256,25 @@ class OpticalReferenceListView(ListView):
 class OpticalReferenceDetailView(DetailView):
     model = OpticalReference
 
-class OptFittingView(LoginRequiredMixin, FormView):
+class OptFittingView(LoginRequiredMixin, JobFormMixin, FormView):
     form_class = OptFittingForm
     template_name = 'form_generic.html'
 
     def form_valid(self, form):
-        form.calculate(self.request)
+        self.job = form.calculate(self.request)
         return super().form_valid(form)
     success_url = reverse_lazy('opticals:opt_fitting_check')
 
-class RTFittingView(LoginRequiredMixin, FormView):
+class RTFittingView(LoginRequiredMixin, JobFormMixin, FormView):
     form_class = RTFittingForm
     template_name = 'form_generic.html'
 
     def form_valid(self, form):
-        form.calculate(self.request)
+        self.job = form.calculate(self.request)
         return super().form_valid(form)
     success_url = reverse_lazy('opticals:rt_fitting_check')
     
-class FittingCheckBaseView(TemplateView):
+class FittingCheckBaseView(JobResultMixin, TemplateView):
     template_name = 'opticals/calculate_check.html'
     
     def get(self, request, *args, **kwargs):
@@ -276,7 +285,13 @@ class FittingCheckBaseView(TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['message'] = self.request.session.get('message')
+        context['message'] = self.get_job_result(
+            'message', self.request.session.get('message')
+        )
+        context['id'] = self.request.session['exp_id']
+        if context['job'] is not None and not context['job'].done:
+            # wait for fitting
+            return context
         # render r2 score table
         all_r2 = []
         models = kwargs['model'].objects.filter(
@@ -305,7 +320,6 @@ class FittingCheckBaseView(TemplateView):
             index=False,
             escape=False,
         )
-        context['id'] = self.request.session['exp_id']
         return context
 
 class OptFittingCheckView(FittingCheckBaseView):
@@ -316,16 +330,16 @@ class RTFittingCheckView(FittingCheckBaseView):
     def get_context_data(self, **kwargs):
         return super().get_context_data(model=RTFittingModel,**kwargs)
 
-class CalculateOpticalView(LoginRequiredMixin, FormView):
+class CalculateOpticalView(LoginRequiredMixin, JobFormMixin, FormView):
     form_class = CalculateOpticalForm
     template_name = 'form_generic.html'
 
     def form_valid(self, form):
-        form.calculate(self.request)
+        self.job = form.calculate(self.request)
         return super().form_valid(form)
     success_url = reverse_lazy('opticals:calculate_check')
 
-class CalculateCheckView(TemplateView):
+class CalculateCheckView(JobResultMixin, TemplateView):
     # Todo: check and update to data base
     # form_class = None
     template_name = 'opticals/calculate_check.html'
@@ -338,7 +352,13 @@ class CalculateCheckView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['message'] = self.request.session.get('message')
+        context['message'] = self.get_job_result(
+            'message', self.request.session.get('message')
+        )
+        context['id'] = self.request.session['exp_id']
+        if context['job'] is not None and not context['job'].done:
+            # wait for fitting
+            return context
         # render r2 score table
         all_r2 = []
         models = OpticalsFittingModel.objects.filter(
@@ -364,7 +384,6 @@ class CalculateCheckView(TemplateView):
             index=False,
             escape=False,
         )
-        context['id'] = self.request.session['exp_id']
         return context
 
 class OpticalSearchProfileListView(ListView):
@@ -504,38 +523,48 @@ class OpticalSearchView(TemplateView):
                 product_model_type__name=profile_df['Product'][0],
                 product_model_type__factory__name=profile_df['Factory'][0],
             )
-            # concat all results into one table
-            opt_result_generator = OptTableGenerator(
-                lc_list=lc_list,
-                pi_list=pi_list,
-                reference=ref, 
-                mode='search',
-            )
-            opt_result_generator.calc()
-            results = opt_result_generator.tables
-            result = results['Vref'].dropna()
-            self.request.session['result'] = {
-                k: v.to_json() for
-                k, v in results.items()
-            }
-            opt_score = OptictalsScore(result, profile_df)
-            self.request.session['opt_result'] = result.to_json()
-            self.request.session['opt_plot'] = opt_score.plot
-            self.request.session['opt_score_raw'] = opt_score.data.to_json()
-            self.request.session['opt_score'] = opt_score.score.to_json()
+            search_cache = OpticalSearchCache(
+                lc_list, pi_list, context['profile'], ref)
+            cached = search_cache.get()
+            if cached is None:
+                # concat all results into one table
+                opt_result_generator = OptTableGenerator(
+                    lc_list=lc_list,
+                    pi_list=pi_list,
+                    reference=ref, 
+                    mode='search',
+                )
+                opt_result_generator.calc()
+                results = opt_result_generator.tables
+                result = results['Vref'].dropna()
+                opt_score = OptictalsScore(result, profile_df)
+                cached = {
+                    'result': results,
+                    'opt_result': result,
+                    'opt_plot': opt_score.plot,
+                    'opt_score_raw': opt_score.data,
+                    'opt_score': opt_score.score,
+                }
+                search_cache.set(cached)
+            store = ResultStore(self.request.session)
+            store['result'] = cached['result']
+            store['opt_result'] = cached['opt_result']
+            store['opt_plot'] = cached['opt_plot']
+            store['opt_score_raw'] = cached['opt_score_raw']
+            store['opt_score'] = cached['opt_score']
             # Only transfer success result to next level
             self.request.session['opt_lc_list'] = list(
-                opt_score.score['LC'].unique())
+                cached['opt_score']['LC'].unique())
 
-            context['opt_plot'] = opt_score.plot
-            context['opt_score'] = opt_score.score.to_html(
+            context['opt_plot'] = cached['opt_plot']
+            context['opt_score'] = cached['opt_score'].to_html(
                 float_format=lambda x: f'{x:.2f}',
                 classes=['table', 'table-hover', 'text-center', 'table-striped'],
                 justify='center',
                 index=False,
                 escape=False,
             )
-            context['opt_score_raw'] = opt_score.data.to_html(
+            context['opt_score_raw'] = cached['opt_score_raw'].to_html(
                 float_format=lambda x: f'{x:.2f}',
                 classes=['table', 'table-hover', 'text-center', 'table-striped'],
                 justify='center',
@@ -546,27 +575,20 @@ class OpticalSearchView(TemplateView):
 
 class OpticalSearchResultDownload(View):
     def get(self, request, *args, **kwargs):
-        if 'opt_result' in request.session:
-            opt_result = pd.read_json(request.session['opt_result'])
-            opt_score_raw = pd.read_json(request.session['opt_score_raw'])
-            opt_score = pd.read_json(request.session['opt_score'])
-            # print(request.session['opt_result'])
-            with BytesIO() as b:
-                writer = pd.ExcelWriter(b, engine='openpyxl')
-                opt_result.to_excel(
-                    writer, sheet_name='OPT Result', index=False)
-                opt_score_raw.to_excel(
-                    writer, sheet_name='OPT Score Raw', index=False)
-                opt_score.to_excel(
-                    writer, sheet_name='OPT Score', index=False)
-                writer.close()
-                file_name = 'OPT Result.xlsx'
-                response = HttpResponse(
-                    b.getvalue(),
-                    content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                )
-                response['Content-Disposition'] = f'attachment; filename={file_name}'
-                return response
+        store = ResultStore(request.session)
+        if 'opt_result' in store:
+            opt_result = store['opt_result']
+            opt_score_raw = store['opt_score_raw']
+            opt_score = store['opt_score']
+            return download_response(
+                {
+                    'OPT Result': opt_result,
+                    'OPT Score Raw': opt_score_raw,
+                    'OPT Score': opt_score,
+                },
+                'OPT Result',
+                request.GET.get('format', 'xlsx'),
+            )
         return redirect(reverse_lazy('opticals:search'))
 
 class ProductModelTypeCreateView(CreateView):
@@ -626,23 +648,11 @@ class OpticalDataDumpView(TemplateView):
             except:
                 rt_df = None
 
-            file_name = exp_name + '.xlsx'
-
-            buffer = BytesIO()
-            with pd.ExcelWriter(buffer) as writter:
-                opt_df.to_excel(writter,sheet_name='OPT', index=False)
-                if rt_df is not None:
-                    rt_df.to_excel(writter,sheet_name='RT', index=False)
-            
-            response = HttpResponse(
-                buffer.getvalue(),
-                content_type=(
-                    'application/'
-                    'vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                )
-            )
-            response['Content-Disposition'] = f'attachment; filename={file_name}'
-            return response
+            sheets = {'OPT': opt_df}
+            if rt_df is not None:
+                sheets['RT'] = rt_df
+            return download_response(
+                sheets, exp_name, request.GET.get('format', 'xlsx'))
 
         return super().get(request, *args, **kwargs)
 
@@ -651,6 +661,47 @@ class OpticalDataDumpView(TemplateView):
         context['exps'] = Experiment.objects.all()
         return context
     
+class OpticalBulkDumpView(LoginRequiredMixin, JobResultMixin, View):
+    """
+    The partitioned parquet dataset of many experiments, the experiments
+    are given by `?exp=` and the ones changed since `?since=<date>`.
+    The changed partitions are exported again by a job, and the exported
+    partitions are downloaded by `?job=<pk>` of the job.
+    """
+    def get(self, request, *args, **kwargs):
+        if request.GET.get('job'):
+            job = self.get_job()
+            if job is None or job.task != 'td_toolkits_v3.opticals.tasks.opt_export':
+                raise Http404('There is no such export.')
+            export = OpticalExport(job.kwargs['cell_gap'])
+            return files_response(
+                export.files(job.kwargs['names']), 'opticals_dataset')
+
+        cell_gap = request.GET.get('cell_gap', 'axo')
+        if cell_gap == 'None':
+            cell_gap = None
+        try:
+            export = OpticalExport(cell_gap)
+        except ValueError as e:
+            raise BadRequest(e)
+
+        names = request.GET.getlist('exp')
+        if since := request.GET.get('since'):
+            if (since := parse_date(since)) is None:
+                raise BadRequest('The since should be a date.')
+            names += export.changed_since(timezone.make_aware(
+                datetime.combine(since, time.min)
+            ))
+        if not names:
+            return redirect(reverse_lazy('opticals:data_dump'))
+        job = Job.enqueue(
+            'td_toolkits_v3.opticals.tasks.opt_export',
+            user=request.user,
+            cell_gap=cell_gap,
+            names=list(dict.fromkeys(names)),
+        )
+        return redirect(reverse_lazy('jobs:detail', kwargs={'pk': job.pk}))
+
 class OpticalPhaseTwoView(LoginRequiredMixin, FormView):
     template_name: str = 'form_generic.html'
     form_class = OpticalPhaseTwoForm
@@ -662,22 +713,13 @@ class OpticalPhaseTwoView(LoginRequiredMixin, FormView):
     
 class OpticalPhaseTwoSuccessView(View):
     def get(self, request, *args, **kwargs):
-        if 'result' in  request.session:            
-            with BytesIO() as b:
-                writer = pd.ExcelWriter(b, engine='openpyxl')
-                for k, v in request.session['result'].items():
-                    pd.read_json(v).to_excel(writer, sheet_name=k, index=False)
-                writer.close()
-                file_name = 'OPT Result.xlsx'
-                response = HttpResponse(
-                    b.getvalue(),
-                    content_type=(
-                        'application/'
-                        'vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                    )
-                )
-                response['Content-Disposition'] = f'attachment; filename={file_name}'
-                return response
+        store = ResultStore(request.session)
+        if 'result' in store:
+            return download_response(
+                store['result'],
+                'OPT Result',
+                request.GET.get('format', 'xlsx'),
+            )
             
 class AdvancedContrastRatioIndexView(TemplateView):
     template_name = 'opticals/advanced_contrast_index.html'
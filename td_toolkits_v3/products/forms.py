@@ -9,6 +9,7 @@ from td_toolkits_v3.materials.models import(
     Seal
 )
 from td_toolkits_v3.products.models import Factory
+from td_toolkits_v3.utils.lookups import Lookups
 
 from .models import (
     Project,
@@ -30,9 +31,17 @@ class ChipsUploadForm(forms.Form):
         initial='rdl'
     )
     
-    def save(self):
+    def save(self, request=None):
         print(self.cleaned_data['chips'])
         chip_df = pd.read_excel(self.cleaned_data['chips'], sheet_name='upload')
+        # the master data of all the rows at once, the materials should exist
+        lookups = Lookups.for_request(request)
+        projects = lookups.resolve(Project, chip_df['project'])
+        product_types = lookups.resolve(ProductModelType, chip_df['platform'])
+        for model, column in [
+            (LiquidCrystal, 'LC'), (Polyimide, 'PI'), (Seal, 'Seal'),
+        ]:
+            lookups.resolve(model, chip_df[column], create=False)
         save_log = {
             'file_name': [self.cleaned_data['chips'].name],
             'warning': [],
@@ -44,11 +53,8 @@ class ChipsUploadForm(forms.Form):
                 sub__condition__experiment__name=str(row['exp id']),
                 name=str(row['id'])
             ).exists():
-                project = Project.objects.get_or_create(
-                    name=str(row['project']))[0]
-                product_type = ProductModelType.objects.get_or_create(
-                    name=str(row['platform'])
-                )[0]
+                project = projects[str(row['project'])]
+                product_type = product_types[str(row['platform'])]
                 experiment = Experiment.objects.get_or_create(
                     name=str(row['exp id']),
                     project=project,
@@ -67,9 +73,9 @@ class ChipsUploadForm(forms.Form):
                     condition=condition
                 )[0]
                 # TODO: error handling
-                lc = LiquidCrystal.objects.get(name=row['LC'])
-                pi = Polyimide.objects.get(name=row['PI'])
-                seal = Seal.objects.get(name=row['Seal'])
+                lc = lookups.get(LiquidCrystal, row['LC'], create=False)
+                pi = lookups.get(Polyimide, row['PI'], create=False)
+                seal = lookups.get(Seal, row['Seal'], create=False)
                 Chip.objects.create(
                     name=str(row['id']),
                     short_name=str(row['short id']),
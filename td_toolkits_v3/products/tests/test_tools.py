@@ -0,0 +1,41 @@
+import pytest
+
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from ..tools.utils import ChipResolver
+from .factories import (
+    ChipFactory,
+    SubFactory,
+    sub,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+def test_chip_resolver(sub):
+    chip_1 = ChipFactory(sub=sub, short_name='1-1')
+    chip_2 = ChipFactory(sub=sub, short_name='1-2')
+    ChipFactory(sub=sub, short_name='1-3')
+    ChipFactory(sub=sub, short_name='1-3')
+    # chip in other experiment should not be found
+    ChipFactory(sub=SubFactory(), short_name='1-4')
+
+    resolver = ChipResolver(sub.condition.experiment)
+    with CaptureQueriesContext(connection) as queries:
+        chips = resolver.resolve(['1-1', '1-2', '1-3', '1-4'])
+        assert resolver.get(chip_1.name, 'panel_id') == chip_1
+    assert len(queries) == 1
+    assert chips == {'1-1': chip_1, '1-2': chip_2}
+    assert list(resolver.unknown) == ['1-4']
+    assert list(resolver.ambiguous) == ['1-3']
+    assert len(resolver.warnings) == 2
+
+
+def test_chip_resolver_for_request(sub):
+    request = RequestFactory().get('/')
+    experiment = sub.condition.experiment
+    resolver = ChipResolver.for_request(request, experiment)
+    assert ChipResolver.for_request(request, experiment) is resolver
+    assert ChipResolver.for_request(None, experiment) is not resolver
@@ -0,0 +1,112 @@
+from __future__ import annotations
+from typing import Iterable, Optional
+
+from django.http import HttpRequest
+
+from td_toolkits_v3.products.models import Chip, Experiment
+
+
+class ChipResolver():
+    """
+    Resolve the chip IDs in uploaded logs to the chips of an experiment.
+
+    All chips of the experiment are loaded once and indexed by both panel
+    ID (name) and short ID (short_name). The IDs could not be found, or
+    mapped to several chips, are collected and reported in bulk.
+    """
+    id_fields = {
+        'panel_id': 'name',
+        'short_id': 'short_name',
+    }
+
+    def __init__(self, experiment: Experiment):
+        self.experiment = experiment
+        self.__chips: Optional[list[Chip]] = None
+        self.__index: dict[str, dict[str, list[Chip]]] = {}
+        # use dict as an ordered set
+        self.unknown: dict[str, None] = {}
+        self.ambiguous: dict[str, None] = {}
+
+    @classmethod
+    def for_request(
+        cls,
+        request: Optional[HttpRequest],
+        experiment: Experiment,
+    ) -> ChipResolver:
+        """
+        Get the resolver of the experiment, shared in the whole request.
+        """
+        if request is None:
+            return cls(experiment)
+        if not hasattr(request, '_chip_resolvers'):
+            request._chip_resolvers = {}
+        if experiment.pk not in request._chip_resolvers:
+            request._chip_resolvers[experiment.pk] = cls(experiment)
+        return request._chip_resolvers[experiment.pk]
+
+    @property
+    def chips(self) -> list[Chip]:
+        if self.__chips is None:
+            self.__chips = list(
+                Chip.objects.filter(
+                    sub__condition__experiment=self.experiment
+                ).distinct()
+            )
+        return self.__chips
+
+    def index(self, log_id: str = 'short_id') -> dict[str, list[Chip]]:
+        """
+        Parameters
+        ----------
+        log_id: str, 'panel_id' or 'short_id'
+
+        Returns
+        -------
+        dict map from the ID to the chips
+        """
+        if log_id not in self.id_fields:
+            raise ValueError("Wrong log id")
+        if log_id not in self.__index:
+            index: dict[str, list[Chip]] = {}
+            for chip in self.chips:
+                key = str(getattr(chip, self.id_fields[log_id]))
+                index.setdefault(key, []).append(chip)
+            self.__index[log_id] = index
+        return self.__index[log_id]
+
+    def resolve(
+        self,
+        ids: Iterable,
+        log_id: str = 'short_id',
+    ) -> dict[str, Chip]:
+        """
+        Resolve the IDs, the unknown and ambiguous ones are recorded
+        and left out.
+
+        Returns
+        -------
+        dict map from the ID to the chip
+        """
+        index = self.index(log_id)
+        result = {}
+        for id in map(str, ids):
+            chips = index.get(id, [])
+            if len(chips) == 1:
+                result[id] = chips[0]
+            elif len(chips) == 0:
+                self.unknown[id] = None
+            else:
+                self.ambiguous[id] = None
+        return result
+
+    def get(self, id, log_id: str = 'short_id') -> Optional[Chip]:
+        return self.resolve([id], log_id).get(str(id))
+
+    @property
+    def warnings(self) -> list[str]:
+        return [
+            f"Chip: {id} is not in the database." for id in self.unknown
+        ] + [
+            f"Chip: {id} is ambiguous in experiment {self.experiment}, skip it."
+            for id in self.ambiguous
+        ]
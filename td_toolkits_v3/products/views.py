@@ -24,7 +24,7 @@ class ChipsBatchCreateView(LoginRequiredMixin, FormView):
     success_url = reverse_lazy('products:chip_upload_success')
 
     def form_valid(self, form):
-        form.save()
+        form.save(self.request)
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
@@ -1,25 +1,21 @@
+from typing import Optional
+
 from django import forms
 from django.http import HttpRequest
 from django.core.cache import cache
 
-import numpy as np
 import pandas as pd
 from openpyxl import load_workbook, Workbook
 from datetime import datetime
 
-from td_toolkits_v3.materials.models import (
-    LiquidCrystal,
-    Polyimide,
-    Seal,
-    Vender,
-)
+from td_toolkits_v3.jobs.models import Job
+from td_toolkits_v3.utils.lookups import Lookups
+from td_toolkits_v3.utils.results import ResultStore
 
 from .models import (
     Batch,
     Adhesion,
     DeltaAngle,
-    File,
-    LowTemperatureOperation,
     LowTemperatureStorage,
     PressureCookingTest,
     SealWVTR,
@@ -28,6 +24,7 @@ from .models import (
 )
 
 from .tools import utils
+from .tools.ingest import ReliabilityIngest
 from .tools import image_sticking
 
 class ReliabilitiesUploadForm(forms.Form):
@@ -36,242 +33,27 @@ class ReliabilitiesUploadForm(forms.Form):
         widget=forms.FileInput(attrs={'accept': '.xlsx'})
     )
 
-    @staticmethod
-    def get_configureation(row):
-        """
-        Simplify the way to get the whole configuration.
-        Including deal with create and None value
-        
-        Parameters
-        ----------
-        row: list-like array
-            The structure should ('', lc, pi, seal, ...)
-        """
-        if row[1] == 'N.A.':
-            lc = None
-        else:
-            lc, _ = LiquidCrystal.objects.get_or_create(name=row[1])
-        if row[2] == 'N.A.':
-            pi = None
-        else:
-            pi, _ = Polyimide.objects.get_or_create(name=row[2])
-        if row[3] == 'N.A.':
-            seal = None
-        else:
-            seal, _ = Seal.objects.get_or_create(name=row[3])
-        return lc, pi, seal
-
-    def save(self):
-        # TODO: This should also have a more elegant way to implment it.
-        adhesion_df = pd.read_excel(
-            self.cleaned_data['reliabilites'], sheet_name='Adhesion'
-        )
-        lto_df = pd.read_excel(
-            self.cleaned_data['reliabilites'], sheet_name='LTO'
-        )
-        lts_df = pd.read_excel(
-            self.cleaned_data['reliabilites'], sheet_name='LTS'
-        )
-        pct_df = pd.read_excel(
-            self.cleaned_data['reliabilites'], sheet_name='PCT'
-        )
-        seal_wvtr_df = pd.read_excel(
-            self.cleaned_data['reliabilites'], sheet_name='Seal WVTR'
-        )
-        delta_angle_df = pd.read_excel(
-            self.cleaned_data['reliabilites'], sheet_name='Δangle'
+    def save(self, request) -> Job:
+        return Job.enqueue(
+            'td_toolkits_v3.reliabilities.tasks.reliabilities_upload',
+            files=[self.cleaned_data['reliabilites']],
+            user=request.user,
         )
-        u_shape_ac_df = pd.read_excel(
-            self.cleaned_data['reliabilites'], sheet_name='U-Shape AC'
-        )
-        vhr_df = pd.read_excel(
-            self.cleaned_data['reliabilites'], sheet_name='VHR'
-        )
-        # Store each table
-        if len(adhesion_df):
-            # TODO: The field would change later
-            for _, row in adhesion_df.iterrows():
-                lc, pi, seal = self.get_configureation(row)
-                vender, _ = Vender.objects.get_or_create(name=row[9])
-                file, _ = File.objects.get_or_create(name=row[10])
-                print(row[11])
-                if (type(row[11]) is not str) and np.isnan(row[11]):
-                    batch = None
-                else:
-                    batch, _ = Batch.objects.get_or_create(name=row[11])
-                if not Adhesion.objects.filter(
-                    lc=lc, pi=pi, seal=seal, vender=vender, file_source=file,
-                    adhesion_interface=row[6], method=row[7], batch=batch).exists():
-                    Adhesion.objects.create(
-                        lc=lc, pi=pi, seal=seal, vender=vender, 
-                        file_source=file,
-                        unit=row[5],
-                        adhesion_interface=row[6], 
-                        method=row[7], 
-                        value=row[4], 
-                        peeling=str(row[8]),
-                        batch=batch
-                    )
-
-        if len(lto_df):
-            for _, row in lto_df.iterrows():
-                lc, pi, seal = self.get_configureation(row)
-                vender, _ = Vender.objects.get_or_create(name=row[9])
-                file, _ = File.objects.get_or_create(name=row[10])
-                jar_test_seal, _ = Seal.objects.get_or_create(name=row[7])
-                if (type(row[11]) is not str) and np.isnan(row[11]):
-                    batch = None
-                else:
-                    batch, _ = Batch.objects.get_or_create(name=row[11])
-                
-                if not LowTemperatureOperation.objects.filter(
-                    lc=lc, pi=pi, seal=seal, vender=vender, file_source=file,
-                    storage_condition=row[5], slv_condition=row[6],
-                    jar_test_seal=jar_test_seal,
-                    measure_temperature=row[8], batch=batch).exists():
-
-                    LowTemperatureOperation.objects.create(
-                        lc=lc, pi=pi, seal=seal, vender=vender, file_source=file,
-                        storage_condition=row[5], slv_condition=row[6],
-                        jar_test_seal=jar_test_seal, measure_temperature=row[8],
-                        value=LowTemperatureOperation.value_mapping[row[4]],
-                        batch=batch
-                    )
-
-        if len(lts_df):
-            for _, row in lts_df.iterrows():
-                lc, pi, seal = self.get_configureation(row)
-                vender, _ = Vender.objects.get_or_create(name=row[9])
-                file, _ = File.objects.get_or_create(name=row[10])
-                if (type(row[11]) is not str) and np.isnan(row[11]):
-                    batch = None
-                else:
-                    batch, _ = Batch.objects.get_or_create(name=row[11])
-                if (row[7] != 'N.A.'):
-                    jar_test_seal, _ = Seal.objects.get_or_create(name=row[7])
-                else:
-                    jar_test_seal = None
-                
-                if not LowTemperatureStorage.objects.filter(
-                    lc=lc, pi=pi, seal=seal, vender=vender, file_source=file,
-                    storage_condition=row[5], slv_condition=row[6],
-                    jar_test_seal=jar_test_seal,
-                    measure_temperature=row[8], batch=batch).exists():
-                    LowTemperatureStorage.objects.create(
-                        lc=lc, pi=pi, seal=seal, vender=vender, 
-                        file_source=file,
-                        storage_condition=row[5], slv_condition=row[6],
-                        jar_test_seal=jar_test_seal, measure_temperature=row[8],
-                        value=row[4], batch=batch)
 
-        if len(pct_df):
-            for _, row in pct_df.iterrows():
-                lc, pi, seal = self.get_configureation(row)
-                vender, _ = Vender.objects.get_or_create(name=row[7])
-                file, _ = File.objects.get_or_create(name=row[8])
-                if (type(row[9]) is not str) and np.isnan(row[9]):
-                    batch = None
-                else:
-                    batch, _ = Batch.objects.get_or_create(name=row[9])
-                if not PressureCookingTest.objects.filter(
-                    lc=lc, pi=pi, seal=seal, vender=vender, file_source=file,
-                    measure_condition=row[5], test_vehical=row[6],
-                    batch=batch,
-                    ).exists():
-                    PressureCookingTest.objects.create(
-                        value=row[4], lc=lc, pi=pi, seal=seal, vender=vender, 
-                        file_source=file,
-                        measure_condition=row[5], test_vehical=row[6],
-                        batch=batch,
-                    )
-
-        if len(seal_wvtr_df):
-            # TODO: The field would change
-            for _, row in seal_wvtr_df.iterrows():
-                lc, pi, seal = self.get_configureation(row)
-                vender, _ = Vender.objects.get_or_create(name=row[10])
-                file, _ = File.objects.get_or_create(name=row[11])
-                if (type(row[12]) is not str) and np.isnan(row[12]):
-                    batch = None
-                else:
-                    batch, _ = Batch.objects.get_or_create(name=row[12])
-                if not SealWVTR.objects.filter(
-                    lc=lc, pi=pi, seal=seal, vender=vender, file_source=file,
-                    temperature=row[7], humidity=row[8], thickness=row[9],
-                    batch=batch
-                ).exists():
-                    SealWVTR.objects.create(
-                        value=row[4], lc=lc, pi=pi, seal=seal, vender=vender, 
-                        file_source=file,
-                        unit=row[5], time=row[6],
-                        temperature=row[7], humidity=row[8], thickness=row[9],
-                        batch=batch
-                    )
-
-        if len(delta_angle_df):
-            for _, row in delta_angle_df.iterrows():
-                lc, pi, seal = self.get_configureation(row)
-                vender, _ = Vender.objects.get_or_create(name=row[9])
-                file, _ = File.objects.get_or_create(name=row[10])
-                if (type(row[11]) is not str) and np.isnan(row[11]):
-                    batch = None
-                else:
-                    batch, _ = Batch.objects.get_or_create(name=row[11])
-                if not DeltaAngle.objects.filter(
-                    lc=lc, pi=pi, seal=seal, vender=vender, file_source=file,
-                    measure_voltage=row[5], measure_freq=row[6], 
-                    measure_time=row[7],
-                    measure_temperature=row[8],
-                    batch=batch
-                ).exists():
-                    DeltaAngle.objects.create(
-                        value=row[4], lc=lc, pi=pi, seal=seal, vender=vender, 
-                        file_source=file,
-                        measure_voltage=row[5], 
-                        measure_freq=row[6], 
-                        measure_time=row[7],
-                        measure_temperature=row[8],
-                        batch=batch
-                    )
-
-        if len(u_shape_ac_df):
-            for _, row in u_shape_ac_df.iterrows():
-                lc, pi, seal = self.get_configureation(row)
-                vender, _ = Vender.objects.get_or_create(name=row[7])
-                file, _ = File.objects.get_or_create(name=row[8])
-                if (type(row[9]) is not str) and np.isnan(row[9]):
-                    batch = None
-                else:
-                    batch, _ = Batch.objects.get_or_create(name=row[9])
-                if not UShapeAC.objects.filter(
-                    lc=lc, pi=pi, seal=seal, vender=vender, file_source=file,
-                    time=row[5], temperature=row[6],batch=batch).exists():
-                    UShapeAC.objects.create(
-                        value=row[4], lc=lc, pi=pi, seal=seal, vender=vender, 
-                        file_source=file,
-                        time=row[5], temperature=row[6],batch=batch)
+    @classmethod
+    def load(
+        cls,
+        file,
+        lookups: Optional[Lookups] = None,
+    ) -> ReliabilityIngest:
+        """
+        Read all the sheets of the workbook and create the new records.
+        """
+        ingest = ReliabilityIngest(lookups=lookups)
+        ingest.read(file)
+        ingest.save()
+        return ingest
 
-        if len(vhr_df):
-            for _, row in vhr_df.iterrows():
-                lc, pi, seal = self.get_configureation(row)
-                vender, _ = Vender.objects.get_or_create(name=row[9])
-                file, _ = File.objects.get_or_create(name=row[10])
-                if (type(row[11]) is not str) and np.isnan(row[11]):
-                    batch = None
-                else:
-                    batch, _ = Batch.objects.get_or_create(name=row[11])
-                if not VoltageHoldingRatio.objects.filter(
-                    lc=lc, pi=pi, seal=seal, vender=vender, file_source=file,
-                    measure_voltage=row[5], measure_freq=row[6], 
-                    measure_temperature=row[7],
-                    uv_aging=row[8], batch=batch).exists():
-                    VoltageHoldingRatio.objects.create(
-                        value=row[4], lc=lc, pi=pi, seal=seal, vender=vender, 
-                        file_source=file,
-                        measure_voltage=row[5], measure_freq=row[6], 
-                        measure_temperature=row[7],
-                        uv_aging=row[8], batch=batch
-                    )
 
 class ReliabilityPhaseTwoForm(forms.Form):
     batch = forms.ModelChoiceField(queryset=Batch.objects.all())
@@ -306,9 +88,10 @@ class ReliabilityPhaseTwoForm(forms.Form):
         result.search(SealWVTR)
         result.search(UShapeAC)
         
-        request.session['summary'] = result.summary.to_json()
-        request.session['score'] = result.score.to_json()
-        request.session['plot'] = result.plot
+        store = ResultStore(request.session)
+        store['summary'] = result.summary
+        store['score'] = result.score
+        store['plot'] = result.plot
     
 class ImageStickingUploadForm(forms.Form):
     file = forms.FileField(
@@ -0,0 +1,16 @@
+"""
+The long work of reliabilities, run as jobs by the local worker.
+"""
+from django.db import transaction
+
+from td_toolkits_v3.jobs.models import Job
+from td_toolkits_v3.utils.lookups import Lookups
+
+from .forms import ReliabilitiesUploadForm
+
+
+def reliabilities_upload(job: Job) -> dict:
+    file = job.open_files()[0]
+    with transaction.atomic():
+        ingest = ReliabilitiesUploadForm.load(file, Lookups())
+    return {'save_log': ingest.save_log}
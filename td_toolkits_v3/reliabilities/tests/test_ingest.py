@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pytest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = pytest.mark.django_db
+
+from td_toolkits_v3.materials.models import Seal
+
+from ..models import (
+    Adhesion,
+    LowTemperatureOperation,
+    LowTemperatureStorage,
+    VoltageHoldingRatio,
+)
+from ..tools.ingest import ReliabilityIngest
+
+RA_TEST_FILE = Path(__file__).parent / 'test_files/TR2_RA.xlsx'
+
+
+def test_reliability_ingest():
+    ingest = ReliabilityIngest()
+    ingest.read(RA_TEST_FILE)
+    created = ingest.save()
+    assert created == {
+        'Adhesion': 37,
+        'LTO': 33,
+        'LTS': 42,
+        'PCT': 7,
+        'Seal WVTR': 17,
+        'Δangle': 4,
+        'U-Shape AC': 4,
+        'VHR': 35,
+    }
+    assert Adhesion.objects.count() == 37
+    assert VoltageHoldingRatio.objects.filter(batch__name='Test').count() == 35
+    # the 'N.A.' configuration is None
+    assert Adhesion.objects.filter(lc__isnull=True).exists()
+    # the jar test seal of LTS could be None, but not of LTO
+    assert LowTemperatureStorage.objects.filter(
+        jar_test_seal__isnull=True).exists()
+    assert not LowTemperatureOperation.objects.filter(
+        jar_test_seal__isnull=True).exists()
+    assert Seal.objects.filter(name='723K1M').count() == 1
+
+    # the records exist, read the lookups and the keys of each model only
+    ingest = ReliabilityIngest()
+    ingest.read(RA_TEST_FILE)
+    with CaptureQueriesContext(connection) as queries:
+        created = ingest.save()
+    assert set(created.values()) == {0}
+    lookup_models = set(ingest.lookup_fields.values())
+    assert len(queries) <= len(lookup_models) + len(ingest.sheets)
+    assert len(ingest.save_log['warning']) == len(ingest.sheets)
@@ -0,0 +1,168 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from td_toolkits_v3.materials.models import (
+    LiquidCrystal,
+    Polyimide,
+    Seal,
+    Vender,
+)
+
+from ..models import ReliabilitySearchProfile, VoltageHoldingRatio
+from ..tools.ingest import ReliabilityIngest
+from ..tools.shrink import dense_exact, dense_greedy
+from ..tools.tables import ReliabilityTables, configuration_table
+from ..tools.utils import ReliabilityScore, table_shrink
+
+RA_TEST_FILE = Path(__file__).parent / 'test_files/TR2_RA.xlsx'
+
+
+@pytest.fixture
+def profile():
+    caches[settings.RA_SEARCH_CACHE].clear()
+    ingest = ReliabilityIngest()
+    ingest.read(RA_TEST_FILE)
+    ingest.save()
+    profile = ReliabilitySearchProfile.objects.create(name='Default')
+    for table in ReliabilityTables.tables:
+        getattr(profile, f'{table.name}_venders').set(Vender.objects.all())
+    return profile
+
+
+def all_materials():
+    return (
+        LiquidCrystal.objects.all(),
+        Polyimide.objects.all(),
+        Seal.objects.all(),
+    )
+
+
+@pytest.mark.django_db
+def test_reliability_tables(profile):
+    # the venders out of the profile are filtered
+    profile.voltage_holding_ratio_venders.set(
+        Vender.objects.filter(name='Merck'))
+    tables = ReliabilityTables(all_materials(), profile).search()
+    vhr = tables['voltage_holding_ratio']['raw']
+    assert set(vhr['Vender']) == {'Merck'}
+    assert len(vhr) == VoltageHoldingRatio.objects.filter(
+        vender__name='Merck', measure_voltage=1., measure_freq=0.6).count()
+    assert tables['adhesion']['mean'].columns.tolist() == ['PI', 'Seal', 'Value']
+
+    # the cached tables, only the materials, venders and stamps are read
+    with CaptureQueriesContext(connection) as queries:
+        cached = ReliabilityTables(all_materials(), profile).search()
+    assert len(queries) == 3 + 1 + 1 + len(ReliabilityTables.tables)
+    pd.testing.assert_frame_equal(cached['voltage_holding_ratio']['raw'], vhr)
+
+    # renaming a vender or a material of the tables gives the new names
+    merck = Vender.objects.get(name='Merck')
+    merck.name = 'Merck KGaA'
+    merck.save()
+    renamed = ReliabilityTables(all_materials(), profile).search()
+    assert set(renamed['voltage_holding_ratio']['raw']['Vender']) == {
+        'Merck KGaA'}
+    lc = LiquidCrystal.objects.get(name=vhr['LC'].iloc[0])
+    lc.name = f'{lc.name} renamed'
+    lc.save()
+    renamed = ReliabilityTables(all_materials(), profile).search()
+    assert lc.name in set(renamed['voltage_holding_ratio']['raw']['LC'])
+    merck.name = 'Merck'
+    merck.save()
+
+    # the changed table is queried again
+    VoltageHoldingRatio.objects.filter(vender__name='Merck').first().delete()
+    tables = ReliabilityTables(all_materials(), profile).search()
+    assert len(tables['voltage_holding_ratio']['raw']) == len(vhr) - 1
+
+    score = ReliabilityScore(all_materials(), profile)
+    assert score.result['normalized']['Sum'].is_monotonic_decreasing
+    assert score.result['raw'].notna().all(None)
+
+
+# the threads read the committed data only
+@pytest.mark.django_db(transaction=True)
+def test_reliability_tables_threads(profile):
+    serial = ReliabilityTables(all_materials(), profile, workers=1).search()
+    caches[settings.RA_SEARCH_CACHE].clear()
+    threads = ReliabilityTables(all_materials(), profile, workers=4).search()
+    for name, table in serial.items():
+        for part in ['raw', 'mean']:
+            pd.testing.assert_frame_equal(threads[name][part], table[part])
+
+
+def test_configuration_table():
+    rng = np.random.default_rng(0)
+    names = {
+        'LC': [f'LC{i}' for i in range(7)],
+        'PI': [f'PI{i}' for i in range(5)],
+        'Seal': [f'Seal{i}' for i in range(4)],
+    }
+
+    def mean(*axes, size=6):
+        df = pd.DataFrame({
+            axis: rng.choice(names[axis] + ['other'], size) for axis in axes
+        }).drop_duplicates()
+        return df.assign(Value=rng.random(len(df)))
+
+    means = {
+        'vhr': mean('LC', 'PI', 'Seal'),
+        'adhesion': mean('PI', 'Seal'),
+        'lts': mean('LC', size=2),
+        'wvtr': mean('Seal', size=1),
+    }
+    # the cross join and left joins, without the rows of no data
+    expected = pd.DataFrame({'LC': names['LC']}).merge(
+        pd.DataFrame({'PI': names['PI']}), how='cross'
+    ).merge(pd.DataFrame({'Seal': names['Seal']}), how='cross')
+    for column, df in means.items():
+        expected = expected.merge(
+            df.rename(columns={'Value': column}),
+            on=[axis for axis in ['LC', 'PI', 'Seal'] if axis in df],
+            how='left',
+        )
+    expected = expected[expected.iloc[:, 3:].notna().any(axis=1)]
+    expected.index = expected.index.astype('int64')
+
+    pd.testing.assert_frame_equal(configuration_table(names, means), expected)
+    assert len(configuration_table(names, {})) == 0
+
+
+def test_table_shrink():
+    df = pd.DataFrame({
+        'LC': ['A', 'B', 'C'],
+        'x': [1, 3, np.nan],
+        'y': [-1, 2, 2],
+        'z': [np.nan, np.nan, np.nan],
+    })
+    for exact in [True, False]:
+        pd.testing.assert_frame_equal(
+            table_shrink(df, exact=exact), df.loc[[0, 1], ['LC', 'x', 'y']])
+
+
+def test_dense_submatrix():
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        mask = rng.random(tuple(rng.integers(1, 12, 2))) < 0.7
+        for ratio in [1, 1.5, 3]:
+            rows, cols = dense_exact(mask, ratio)
+            assert mask[np.ix_(rows, cols)].all()
+            # no larger part of a single row or column
+            assert rows.sum() * cols.sum() ** ratio >= max(
+                mask.sum(axis=1).max() ** ratio, mask.sum(axis=0).max())
+
+            greedy = dense_greedy(mask, ratio)
+            assert mask[np.ix_(*greedy)].all()
+            assert rows.sum() * cols.sum() ** ratio >= (
+                greedy[0].sum() * greedy[1].sum() ** ratio)
+            # the same result again
+            for again, kept in zip(dense_greedy(mask, ratio), greedy):
+                np.testing.assert_array_equal(again, kept)
@@ -0,0 +1,40 @@
+from pathlib import Path
+
+import pytest
+
+from django.urls import reverse
+
+pytestmark = pytest.mark.django_db
+
+from td_toolkits_v3.jobs.models import Job
+
+from ..models import Adhesion, VoltageHoldingRatio
+
+RA_TEST_FILE = Path(__file__).parent / 'test_files/TR2_RA.xlsx'
+
+
+def upload(client) -> Job:
+    with open(RA_TEST_FILE, 'rb') as fp:
+        response = client.post(
+            reverse('reliabilities:upload'), {'reliabilites': fp})
+    job = Job.objects.latest('pk')
+    assert response.url == reverse('jobs:detail', kwargs={'pk': job.pk})
+    return job
+
+
+def test_reliabilities_upload_view(client, user):
+    client.force_login(user)
+    job = upload(client)
+    assert job.status == Job.Status.SUCCESS
+    assert job.result['save_log'] == {
+        'file_name': ['TR2_RA.xlsx'],
+        'warning': [],
+    }
+    assert Adhesion.objects.count() == 37
+    assert VoltageHoldingRatio.objects.count() == 35
+
+    # the same file again, the old logs are kept
+    job = upload(client)
+    assert job.status == Job.Status.SUCCESS
+    assert 'Adhesion' in job.result['save_log']['warning'][0]
+    assert Adhesion.objects.count() == 37
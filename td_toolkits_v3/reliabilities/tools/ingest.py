@@ -0,0 +1,279 @@
+"""
+Bulk ingest of the reliability workbook.
+
+All the sheets are read in one pass of the workbook. The names of the
+materials, venders, files and batches of all the sheets are resolved
+together by the `Lookups`, one query of each lookup model, and the
+missing ones are created in bulk. The records already in the database are found by one
+query of the keys of each model, and the new ones are created by
+`bulk_create` of each sheet.
+"""
+from __future__ import annotations
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+from django.conf import settings
+
+from td_toolkits_v3.materials.models import (
+    LiquidCrystal,
+    Polyimide,
+    Seal,
+    Vender,
+)
+from td_toolkits_v3.reliabilities.models import (
+    Adhesion,
+    Batch,
+    DeltaAngle,
+    File,
+    LowTemperatureOperation,
+    LowTemperatureStorage,
+    PressureCookingTest,
+    SealWVTR,
+    UShapeAC,
+    VoltageHoldingRatio,
+)
+from td_toolkits_v3.utils.lookups import Lookups
+
+NA = 'N.A.'
+
+
+def is_blank(value) -> bool:
+    return value is None or (not isinstance(value, str) and pd.isna(value))
+
+
+class SheetSpec(NamedTuple):
+    model: type
+    # {column position: field name}, the lc, pi and seal are the 1st to 3rd
+    columns: dict[int, str]
+    # the fields identify a record, the same one would not be created again
+    key: list[str]
+    # the lookup fields which 'N.A.' is None
+    na_fields: tuple = ('lc', 'pi', 'seal')
+    # {field: the function of the cell value}
+    converters: dict = {}
+
+
+class ReliabilityIngest():
+    """
+    Ingest pipeline of the reliability workbook.
+
+    Parameters
+    ----------
+    batch_size: int, optional
+        The rows insert to database each time,
+        default is settings.INGEST_BATCH_SIZE
+    lookups: Lookups, optional
+        The lookups of the master data, could be shared in request.
+    """
+    # the lookup fields and their models
+    lookup_fields = {
+        'lc': LiquidCrystal,
+        'pi': Polyimide,
+        'seal': Seal,
+        'jar_test_seal': Seal,
+        'vender': Vender,
+        'file_source': File,
+        'batch': Batch,
+    }
+    configuration = {1: 'lc', 2: 'pi', 3: 'seal'}
+    sheets = {
+        'Adhesion': SheetSpec(
+            Adhesion,
+            {4: 'value', 5: 'unit', 6: 'adhesion_interface', 7: 'method',
+             8: 'peeling', 9: 'vender', 10: 'file_source', 11: 'batch'},
+            ['adhesion_interface', 'method'],
+            converters={'peeling': str},
+        ),
+        'LTO': SheetSpec(
+            LowTemperatureOperation,
+            {4: 'value', 5: 'storage_condition', 6: 'slv_condition',
+             7: 'jar_test_seal', 8: 'measure_temperature', 9: 'vender',
+             10: 'file_source', 11: 'batch'},
+            ['storage_condition', 'slv_condition', 'jar_test_seal',
+             'measure_temperature'],
+            converters={
+                'value': LowTemperatureOperation.value_mapping.__getitem__,
+            },
+        ),
+        'LTS': SheetSpec(
+            LowTemperatureStorage,
+            {4: 'value', 5: 'storage_condition', 6: 'slv_condition',
+             7: 'jar_test_seal', 8: 'measure_temperature', 9: 'vender',
+             10: 'file_source', 11: 'batch'},
+            ['storage_condition', 'slv_condition', 'jar_test_seal',
+             'measure_temperature'],
+            na_fields=('lc', 'pi', 'seal', 'jar_test_seal'),
+        ),
+        'PCT': SheetSpec(
+            PressureCookingTest,
+            {4: 'value', 5: 'measure_condition', 6: 'test_vehical',
+             7: 'vender', 8: 'file_source', 9: 'batch'},
+            ['measure_condition', 'test_vehical'],
+        ),
+        'Seal WVTR': SheetSpec(
+            SealWVTR,
+            {4: 'value', 5: 'unit', 6: 'time', 7: 'temperature',
+             8: 'humidity', 9: 'thickness', 10: 'vender',
+             11: 'file_source', 12: 'batch'},
+            ['temperature', 'humidity', 'thickness'],
+        ),
+        'Δangle': SheetSpec(
+            DeltaAngle,
+            {4: 'value', 5: 'measure_voltage', 6: 'measure_freq',
+             7: 'measure_time', 8: 'measure_temperature', 9: 'vender',
+             10: 'file_source', 11: 'batch'},
+            ['measure_voltage', 'measure_freq', 'measure_time',
+             'measure_temperature'],
+        ),
+        'U-Shape AC': SheetSpec(
+            UShapeAC,
+            {4: 'value', 5: 'time', 6: 'temperature', 7: 'vender',
+             8: 'file_source', 9: 'batch'},
+            ['time', 'temperature'],
+        ),
+        'VHR': SheetSpec(
+            VoltageHoldingRatio,
+            {4: 'value', 5: 'measure_voltage', 6: 'measure_freq',
+             7: 'measure_temperature', 8: 'uv_aging', 9: 'vender',
+             10: 'file_source', 11: 'batch'},
+            ['measure_voltage', 'measure_freq', 'measure_temperature',
+             'uv_aging'],
+        ),
+    }
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        lookups: Optional[Lookups] = None,
+    ):
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.lookups = lookups or Lookups()
+        self.save_log: dict[str, list] = {
+            'file_name': [],
+            'warning': [],
+        }
+        self.frames: dict[str, pd.DataFrame] = {}
+
+    def read(self, file):
+        """
+        Read all the sheets of the workbook at once.
+        """
+        self.frames = pd.read_excel(file, sheet_name=list(self.sheets))
+        self.save_log['file_name'].append(getattr(file, 'name', str(file)))
+
+    @classmethod
+    def records(cls, spec: SheetSpec, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        The fields of the rows, the lookup fields are their names.
+        """
+        columns = {**cls.configuration, **spec.columns}
+        records = pd.DataFrame({
+            field: df.iloc[:, position].to_numpy(dtype=object)
+            for position, field in columns.items()
+        })
+        for field in records.columns:
+            if field in cls.lookup_fields:
+                records[field] = [
+                    cls.lookup_name(field, value, spec)
+                    for value in records[field]
+                ]
+            elif field in spec.converters:
+                records[field] = records[field].map(spec.converters[field])
+        return records
+
+    @staticmethod
+    def lookup_name(field: str, value, spec: SheetSpec) -> Optional[str]:
+        if field == 'batch' and is_blank(value):
+            return None
+        if field in spec.na_fields and value == NA:
+            return None
+        return str(value)
+
+    def resolve(self, records: dict[str, pd.DataFrame]):
+        """
+        Resolve the names of all the sheets, one lookup model at once.
+        """
+        names: dict[type, set] = {
+            model: set() for model in self.lookup_fields.values()}
+        for df in records.values():
+            for field, model in self.lookup_fields.items():
+                if field in df.columns:
+                    names[model].update(df[field].dropna())
+        for model, model_names in names.items():
+            self.lookups.resolve(model, model_names)
+
+    def key_fields(self, spec: SheetSpec) -> list:
+        return [
+            spec.model._meta.get_field(field) for field in [
+                'lc', 'pi', 'seal', 'vender', 'file_source', *spec.key,
+                'batch',
+            ]
+        ]
+
+    def build(self, spec: SheetSpec, df: pd.DataFrame) -> list:
+        """
+        The new instances of a sheet, the records in the database and the
+        repeated rows are skipped.
+        """
+        model = spec.model
+        fields = {field: model._meta.get_field(field) for field in df.columns}
+        instances = []
+        for row in df.to_dict('records'):
+            values = {}
+            for field, value in row.items():
+                if field in self.lookup_fields:
+                    lookup = self.lookups.map(self.lookup_fields[field])
+                    value = None if value is None else lookup[value]
+                elif is_blank(value) and fields[field].null:
+                    value = None
+                values[field] = value
+            instances.append(model(**values))
+
+        key_fields = self.key_fields(spec)
+
+        def key(instance) -> tuple:
+            return tuple(
+                getattr(instance, field.attname) if field.is_relation
+                else field.to_python(getattr(instance, field.attname))
+                for field in key_fields
+            )
+
+        # the keys of the records of the files in one query
+        logged = set(model.objects.filter(
+            file_source__in={instance.file_source for instance in instances}
+        ).values_list(*[field.attname for field in key_fields]))
+        new = []
+        for instance in instances:
+            instance_key = key(instance)
+            if instance_key not in logged:
+                logged.add(instance_key)
+                new.append(instance)
+        return new
+
+    def save(self) -> dict[str, int]:
+        """
+        Create the new records of all the sheets.
+
+        Returns
+        -------
+        dict
+            {sheet name: the count of the created records}
+        """
+        records = {
+            name: self.records(self.sheets[name], df)
+            for name, df in self.frames.items() if len(df)
+        }
+        self.resolve(records)
+        created = {}
+        for name, df in records.items():
+            spec = self.sheets[name]
+            instances = self.build(spec, df)
+            spec.model.objects.bulk_create(
+                instances, batch_size=self.batch_size)
+            created[name] = len(instances)
+            if skipped := len(df) - len(instances):
+                self.save_log['warning'].append(
+                    f'{skipped} rows of {name} exist, keep the old ones'
+                )
+        return created
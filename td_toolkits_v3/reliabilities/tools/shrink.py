@@ -0,0 +1,181 @@
+"""
+The dense part of a sparse table.
+
+The RA score needs a table without missing values, so the configurations
+(rows) and the items (columns) with missing values are trimmed. The table
+is read as a boolean matrix, True for the present values, and the kept part
+is a biclique of the present values: every kept row has every kept column.
+
+The size of a kept part is `rows * columns ** ratio`, the ratio > 1 keeps
+more columns (the items) than rows (the configurations).
+
+- `dense_greedy` drops the row or the column with the most missing ratio
+  one by one, the missing counts are updated by the dropped line only.
+- `dense_exact` enumerates the subsets of the shorter axis by bitsets, it
+  finds the largest part, for the tables with a few columns or rows.
+
+Both are deterministic, the ties are broken by the order of the rows and
+the columns.
+"""
+from __future__ import annotations
+from typing import Optional
+
+import numpy as np
+
+# the max length of the shorter axis to enumerate, 2 ** 16 subsets
+EXACT_LIMIT = 16
+
+
+def dense_greedy(
+    mask: np.ndarray,
+    ratio: float = 1.5,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Drop the row or the column with the most missing ratio until no value
+    is missing, and add back the dropped ones without missing values.
+
+    The missing ratio of a column is divided by the ratio. When a row and
+    a column are tied, the row is dropped; the first one of the tied rows
+    or columns is dropped.
+
+    Parameters
+    ----------
+    mask: np.ndarray
+        The 2d boolean matrix, True for the present values.
+    ratio: float, default is 1.5
+        The weight to keep the columns than the rows.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        The boolean masks of the kept rows and columns.
+    """
+    missing = ~np.asarray(mask, dtype=bool)
+    n_rows, n_cols = missing.shape
+    rows = np.ones(n_rows, dtype=bool)
+    cols = np.ones(n_cols, dtype=bool)
+    # the missing counts in the kept part
+    row_missing = missing.sum(axis=1)
+    col_missing = missing.sum(axis=0)
+    total = int(row_missing.sum())
+
+    while total > 0:
+        row_score = np.where(rows, row_missing / n_cols, -1.)
+        col_score = np.where(cols, col_missing / n_rows / ratio, -1.)
+        i, j = int(np.argmax(row_score)), int(np.argmax(col_score))
+        if row_score[i] >= col_score[j]:
+            rows[i] = False
+            n_rows -= 1
+            total -= int(row_missing[i])
+            col_missing -= missing[i]
+        else:
+            cols[j] = False
+            n_cols -= 1
+            total -= int(col_missing[j])
+            row_missing -= missing[:, j]
+
+    # the dropped lines may be full in the kept part, keep it maximal
+    rows |= ~missing[:, cols].any(axis=1)
+    cols |= ~missing[rows].any(axis=0)
+    return rows, cols
+
+
+def bitsets(mask: np.ndarray) -> list[int]:
+    """
+    The columns of the boolean matrix as the int bitsets of its rows.
+    """
+    packed = np.packbits(mask, axis=0, bitorder='little')
+    return [
+        int.from_bytes(packed[:, j].tobytes(), 'little')
+        for j in range(mask.shape[1])
+    ]
+
+
+def popcount(bits: int) -> int:
+    return bin(bits).count('1')
+
+
+def dense_exact(
+    mask: np.ndarray,
+    ratio: float = 1.5,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The largest biclique of the present values by `rows * columns ** ratio`.
+
+    Every subset of the shorter axis is enumerated with the bitset of the
+    lines full in it, so it is for the tables with a few columns or rows
+    only. Of the tied ones, the one with more columns and then the first
+    subset is kept.
+
+    Parameters
+    ----------
+    mask: np.ndarray
+        The 2d boolean matrix, True for the present values.
+    ratio: float, default is 1.5
+        The weight to keep the columns than the rows.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        The boolean masks of the kept rows and columns.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    # enumerate the subsets of the columns, or of the rows when shorter
+    by_rows = mask.shape[0] < mask.shape[1]
+    lines = mask.T if by_rows else mask
+    n_full, n_subset = lines.shape
+    bits = bitsets(lines)
+
+    full = [(1 << n_full) - 1] + [0] * ((1 << n_subset) - 1)
+    best, best_key = 0, None
+    for subset in range(1, 1 << n_subset):
+        low = subset & -subset
+        full[subset] = full[subset ^ low] & bits[low.bit_length() - 1]
+        rows, cols = popcount(full[subset]), popcount(subset)
+        if by_rows:
+            rows, cols = cols, rows
+        key = (rows * cols ** ratio, cols)
+        if cols and rows and (best_key is None or key > best_key):
+            best, best_key = subset, key
+
+    if best_key is None:
+        # no value is present, keep the rows and the vacuous full columns
+        return np.ones(mask.shape[0], dtype=bool), mask.all(axis=0)
+    kept_full = np.array(
+        [full[best] >> k & 1 for k in range(n_full)], dtype=bool)
+    kept_subset = np.array(
+        [best >> k & 1 for k in range(n_subset)], dtype=bool)
+    if by_rows:
+        return kept_subset, kept_full
+    return kept_full, kept_subset
+
+
+def dense_submatrix(
+    mask: np.ndarray,
+    ratio: float = 1.5,
+    exact: Optional[bool] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The rows and the columns of the dense part.
+
+    Parameters
+    ----------
+    mask: np.ndarray
+        The 2d boolean matrix, True for the present values.
+    ratio: float, default is 1.5
+        The weight to keep the columns than the rows.
+    exact: bool, optional
+        Use `dense_exact` or `dense_greedy`, default is exact when the
+        shorter axis is not longer than EXACT_LIMIT.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        The boolean masks of the kept rows and columns.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if exact is None:
+        exact = min(mask.shape) <= EXACT_LIMIT
+    if exact:
+        return dense_exact(mask, ratio)
+    return dense_greedy(mask, ratio)
@@ -0,0 +1,387 @@
+"""
+The reliability tables of the RA search.
+
+Each table of the score is one query of the reliability model, filtered by
+the searched materials, the venders and the limit of the profile. The
+vender sets of all the tables are read by one query, and the tables are
+queried concurrently.
+
+The tables are cached by the fingerprint of their query: the materials,
+the venders, the limit, the count and newest `modified` of the model, and
+the newest `modified` of the models of the names in the table (materials,
+venders and files). Any change of them gives a new key, so the repeated
+searches only read the stamps of the models, and the stale tables expire
+by the timeout. The settings without the cache alias use the default
+cache.
+"""
+from __future__ import annotations
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import CharField, Count, Max, Subquery, Value
+
+from td_toolkits_v3.reliabilities.models import (
+    Adhesion,
+    DeltaAngle,
+    LowTemperatureStorage,
+    PressureCookingTest,
+    ReliabilitySearchProfile,
+    SealWVTR,
+    UShapeAC,
+    VoltageHoldingRatio,
+)
+from td_toolkits_v3.opticals.tools.search_cache import search_backend
+
+HEADER = {
+    'lc__name': 'LC',
+    'pi__name': 'PI',
+    'seal__name': 'Seal',
+    'value': 'Value',
+    'vender__name': 'Vender',
+    'file_source__name': 'file source'
+}
+
+
+class RATable(NamedTuple):
+    model: type
+    # the attribute name of ReliabilitySearchProfile
+    name: str
+    # using binary to represent query lc, pi, seal,
+    # eg. need all, (lc, pi, seal) = 111 = 7
+    opt: int = 7
+    # transfer the value x to f(x) if needed
+    f: Optional[Callable] = None
+    add_q: dict = {}
+    add_header: dict = {}
+
+    @property
+    def groupby(self) -> list[str]:
+        return [
+            column
+            for column, bit in zip(['LC', 'PI', 'Seal'], f'{self.opt:03b}')
+            if bit == '1'
+        ]
+
+    @property
+    def header(self) -> dict:
+        return {**HEADER, **self.add_header}
+
+
+class ReliabilityTables():
+    """
+    The reliability tables of the searched materials.
+
+    Parameters
+    ----------
+    query: tuple of QuerySet
+        The searched (LC, PI, Seal).
+    profile: ReliabilitySearchProfile
+    workers: int, optional
+        The threads to query the tables, default is
+        settings.RA_SEARCH_WORKERS. In a transaction, the tables are queried
+        in turn, the other connections do not see its data.
+    """
+    tables = [
+        RATable(Adhesion, 'adhesion', opt=3),
+        RATable(DeltaAngle, 'delta_angle', opt=6),
+        RATable(
+            UShapeAC, 'u_shape_ac', opt=6, f=np.abs,
+            add_q={'time': 1, 'temperature': 25},
+            add_header={'time': 'Time', 'temperature': 'Temperature'},
+        ),
+        RATable(
+            VoltageHoldingRatio, 'voltage_holding_ratio',
+            add_q={'measure_voltage': 1., 'measure_freq': 0.6},
+            add_header={
+                'measure_voltage': 'Measure Voltage',
+                'measure_freq': 'Measure Frequency',
+            },
+        ),
+        RATable(
+            LowTemperatureStorage, 'low_temperature_storage', opt=4,
+            add_q={'storage_condition': 'Bulk', 'measure_temperature': -30},
+            add_header={
+                'storage_condition': 'Storage Cond.',
+                'measure_temperature': 'Measure Temp.(°C)',
+            },
+        ),
+        RATable(PressureCookingTest, 'pressure_cooking_test'),
+        RATable(SealWVTR, 'seal_wvtr', opt=1),
+    ]
+
+    def __init__(
+        self,
+        query,
+        profile: ReliabilitySearchProfile,
+        workers: Optional[int] = None,
+    ):
+        self.query = dict(zip(['lc', 'pi', 'seal'], query))
+        self.profile = profile
+        self.workers = workers or settings.RA_SEARCH_WORKERS
+        self.__materials = None
+        self.__venders = None
+        self.__lookup_stamp = None
+
+    @property
+    def materials(self) -> dict[str, list[int]]:
+        """
+        The pks of the searched materials of the profile's material type.
+        """
+        if self.__materials is None:
+            self.__materials = {
+                field: sorted(queryset.filter(
+                    material_type=self.profile.material_type
+                ).values_list('pk', flat=True))
+                for field, queryset in self.query.items()
+            }
+        return self.__materials
+
+    @property
+    def venders(self) -> dict[str, list[int]]:
+        """
+        The vender pks of every table in the profile, by one query.
+        """
+        if self.__venders is None:
+            querysets = [
+                getattr(ReliabilitySearchProfile, f'{table.name}_venders')
+                .through.objects.filter(reliabilitysearchprofile=self.profile)
+                .annotate(table=Value(table.name, output_field=CharField()))
+                .values_list('table', 'vender_id')
+                for table in self.tables
+            ]
+            self.__venders = {table.name: [] for table in self.tables}
+            for name, vender in querysets[0].union(*querysets[1:], all=True):
+                self.__venders[name].append(vender)
+            for venders in self.__venders.values():
+                venders.sort()
+        return self.__venders
+
+    def filters(self, table: RATable) -> dict:
+        cmp = getattr(self.profile, f'{table.name}_cmp')
+        if cmp not in ['gt', 'lt']:
+            raise ValueError(
+                f'Check the profile {table.name}_cmp, something wrong.')
+        q = {
+            'vender__in': self.venders[table.name],
+            f'value__{cmp}': getattr(self.profile, table.name),
+            **table.add_q,
+        }
+        for field, bit in zip(self.materials, f'{table.opt:03b}'):
+            if bit == '1':
+                q[f'{field}__in'] = self.materials[field]
+        return q
+
+    @staticmethod
+    def stamp(model) -> list:
+        return [
+            str(value) for value in model.objects.aggregate(
+                count=Count('pk'), modified=Max('modified')
+            ).values()
+        ]
+
+    @staticmethod
+    def lookups(table: RATable) -> list[type]:
+        """
+        The models of the names in the header of the table.
+        """
+        return [
+            table.model._meta.get_field(path.split('__')[0]).related_model
+            for path in table.header if '__' in path
+        ]
+
+    @property
+    def lookup_stamp(self) -> dict[str, str]:
+        """
+        The newest `modified` of the models of the names in the tables,
+        so renaming a material, a vender or a file gives new keys. By one
+        query.
+        """
+        if self.__lookup_stamp is None:
+            models = {
+                model for table in self.tables for model in self.lookups(table)
+            }
+            newest = {
+                model.__name__: Subquery(
+                    model.objects.order_by('-modified').values('modified')[:1]
+                )
+                for model in models
+            }
+            self.__lookup_stamp = {
+                name: str(value) for name, value in
+                ReliabilitySearchProfile.objects.filter(pk=self.profile.pk)
+                .values(**newest).get().items()
+            }
+        return self.__lookup_stamp
+
+    def key(self, table: RATable, q: dict) -> str:
+        fingerprint = {
+            'table': table.name,
+            'q': q,
+            'f': getattr(table.f, '__name__', None),
+            'stamp': self.stamp(table.model),
+            'lookups': [
+                self.lookup_stamp[model.__name__]
+                for model in self.lookups(table)
+            ],
+        }
+        return 'ra-table:' + hashlib.sha256(
+            json.dumps(fingerprint, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    @property
+    def backend(self):
+        return search_backend(settings.RA_SEARCH_CACHE)
+
+    def fetch(self, table: RATable, q: dict) -> Optional[pd.DataFrame]:
+        """
+        The raw table, None if there is no log.
+        """
+        # the empty sets never match
+        if not all(q[field] for field in q if field.endswith('__in')):
+            return None
+        key = self.key(table, q)
+        cached = self.backend.get(key)
+        if cached is not None:
+            return cached['raw']
+        df = pd.DataFrame.from_records(
+            table.model.objects.filter(**q).order_by('pk')
+            .values(*table.header)
+        ).rename(columns=table.header)
+        if len(df) == 0:
+            df = None
+        elif table.f is not None:
+            df['Value'] = table.f(df['Value'])
+        self.backend.set(
+            key, {'raw': df}, timeout=settings.RA_SEARCH_CACHE_TIMEOUT)
+        return df
+
+    def fetch_in_thread(
+        self,
+        table: RATable,
+        q: dict,
+    ) -> Optional[pd.DataFrame]:
+        try:
+            return self.fetch(table, q)
+        finally:
+            # the connections of the thread are not reused
+            connections.close_all()
+
+    def search(self) -> dict[str, dict]:
+        """
+        All the tables.
+
+        Returns
+        -------
+        dict
+            {name: {'raw': DataFrame | None, 'mean': DataFrame | None}},
+            the mean is the mean value of each configuration.
+        """
+        # the materials, venders and lookup stamps are read once before
+        # the threads
+        filters = [self.filters(table) for table in self.tables]
+        self.lookup_stamp
+        if self.workers > 1 and not connection.in_atomic_block:
+            with ThreadPoolExecutor(self.workers) as executor:
+                raws = list(executor.map(
+                    self.fetch_in_thread, self.tables, filters))
+        else:
+            raws = [
+                self.fetch(table, q) for table, q in zip(self.tables, filters)
+            ]
+        return {
+            table.name: {'raw': raw, 'mean': self.mean(table, raw)}
+            for table, raw in zip(self.tables, raws)
+        }
+
+    @staticmethod
+    def mean(table: RATable, df: Optional[pd.DataFrame]) -> Optional[pd.DataFrame]:
+        if df is None:
+            return None
+        return df[table.groupby + ['Value']].groupby(
+            by=table.groupby,
+            as_index=False,
+        ).mean().sort_values(by='Value', ascending=False)
+
+
+AXES = ['LC', 'PI', 'Seal']
+
+
+def configuration_table(
+    names: dict[str, Sequence[str]],
+    means: dict[str, pd.DataFrame],
+) -> pd.DataFrame:
+    """
+    The mean values of the configurations with any data.
+
+    It is the LC × PI × Seal cross join of the names left joined with the
+    means, without the rows of no data, but the cross join is never built.
+    A configuration is coded by its position in the cross join,
+    `(lc * n_pi + pi) * n_seal + seal`, so the configurations of a mean
+    are its coded keys expanded by the axes it does not have, and its
+    values are joined by the sorted keys.
+
+    Parameters
+    ----------
+    names: dict
+        {axis: names}, the axes are 'LC', 'PI' and 'Seal'.
+    means: dict
+        {column: mean table}, the table has some of the axes and 'Value'.
+
+    Returns
+    -------
+    pd.DataFrame
+        The LC, PI, Seal and a column of each mean, indexed by the position
+        in the cross join.
+    """
+    indexes = [pd.Index(names[axis]) for axis in AXES]
+    sizes = np.array([len(index) for index in indexes], dtype=np.int64)
+    strides = np.array([sizes[1] * sizes[2], sizes[2], 1], dtype=np.int64)
+
+    # column -> (the axes, the sorted keys, the values)
+    coded = {}
+    for column, mean in means.items():
+        axes = [i for i, axis in enumerate(AXES) if axis in mean.columns]
+        codes = np.stack([
+            indexes[i].get_indexer(mean[AXES[i]]) for i in axes
+        ], axis=1)
+        # the materials out of the names are not joined
+        found = (codes >= 0).all(axis=1)
+        keys = codes[found] @ strides[axes]
+        order = np.argsort(keys, kind='stable')
+        values = mean['Value'].to_numpy(dtype=float)[found]
+        coded[column] = (axes, keys[order], values[order])
+
+    positions = [np.empty(0, dtype=np.int64)]
+    for axes, keys, _ in coded.values():
+        for i in range(len(AXES)):
+            if i not in axes:
+                keys = (
+                    keys[:, None] + np.arange(sizes[i]) * strides[i]
+                ).ravel()
+        positions.append(keys)
+    position = np.unique(np.concatenate(positions))
+
+    codes = [
+        position // strides[i] % sizes[i] if sizes[i] else position
+        for i in range(len(AXES))
+    ]
+    df = pd.DataFrame({
+        axis: indexes[i].to_numpy(dtype=object)[codes[i]]
+        for i, axis in enumerate(AXES)
+    }, index=position)
+    for column, (axes, keys, values) in coded.items():
+        row_keys = sum(codes[i] * strides[i] for i in axes)
+        column_values = np.full(len(position), np.nan)
+        if len(keys):
+            at = np.minimum(np.searchsorted(keys, row_keys), len(keys) - 1)
+            matched = keys[at] == row_keys
+            column_values[matched] = values[at[matched]]
+        df[column] = column_values
+    return df
@@ -8,27 +8,29 @@ from plotly.offline import plot
 import re
 from scipy.interpolate import interp1d
 
+from td_toolkits_v3.opticals.tools.preprocessing import (
+    group_max_normalize,
+    truncate_at_argmax,
+)
 from td_toolkits_v3.opticals.tools.utils import tr2_score, OptLoader
 from td_toolkits_v3.reliabilities.models import (
     ReliabilityBase,
-    Adhesion,
-    DeltaAngle,
     File,
     LowTemperatureOperation,
-    LowTemperatureStorage,
-    PressureCookingTest,
     ReliabilitySearchProfile,
-    SealWVTR,
-    UShapeAC,
-    VoltageHoldingRatio,
+)
+from td_toolkits_v3.reliabilities.tools.shrink import dense_submatrix
+from td_toolkits_v3.reliabilities.tools.tables import (
+    ReliabilityTables,
+    configuration_table,
 )
 
-def table_shrink(df, step=0.1, ratio=1.5):
+def table_shrink(df, ratio=1.5, exact=None):
     """
-    A greedy method to find the max dense part of the sparse table.
-    Reduce rows and columns with NaN step by step.
+    Find the max dense part of the sparse table, trim the rows and columns
+    with NaN.
 
-    Only consider number fields.
+    Only consider number fields, the other columns are kept.
 
     The effect is like:
     ⎡1  -1  Na⎤    ⎡1  -1⎤ 
@@ -42,199 +44,46 @@ def table_shrink(df, step=0.1, ratio=1.5):
     ----------
     df: pd.DataFrame
         The table to shrink
-    step: float, default is 0.1
-        The na ratio change for each step, smaller the better, but maybe slower
     ratio: float, default is 1.5
-        The shrink speed ratio between row and columns, in mose sceanary,
-        we may want keep more columns(feature) than rows(log)
+        The size of the dense part is rows * columns ** ratio, in mose
+        sceanary, we may want keep more columns(feature) than rows(log)
+    exact: bool, optional
+        Find the exact max dense part or the greedy one, default is exact
+        for the small tables, see `dense_submatrix`.
     """
-    # The column/raw contain na ratio
-    na_ratio = 1
-
-    #  count not number(cnn) columns
-    cnn = (df.dtypes != np.number).sum()
-
-    while df.isna().any(None) and (na_ratio > 0):
-        na_ratio -= step
-        # reduce row by the zero ratio of all columns
-        df = df.loc[df.isna().sum(axis=1) / (len(df.columns)-cnn) < na_ratio]
-        # reduce column by the zero ratio of all rows
-        df = df.loc[:, df.isna().sum(axis=0) / len(df) < (na_ratio*ratio)]
-       
-    return df
+    numbers = df.select_dtypes('number').columns
+    rows, cols = dense_submatrix(df[numbers].notna().to_numpy(), ratio, exact)
+    dropped = set(numbers[~cols])
+    return df.loc[rows, [
+        column for column in df.columns if column not in dropped
+    ]]
 
 class ReliabilityScore():
 
-    def __init__(self, query, profile: ReliabilitySearchProfile) -> None:
+    def __init__(
+        self,
+        query,
+        profile: ReliabilitySearchProfile,
+        workers: int | None = None,
+    ) -> None:
         self.lc, self.pi, self.seal = query
         self.constraint = profile
-        # pattern using for tranform the model name
-        self.pattern = re.compile(r'(?<!^)(?=[A-Z])')
-        # header using for query and modified field name
-        self.header = {
-            'lc__name': 'LC',
-            'pi__name': 'PI',
-            'seal__name': 'Seal',
-            'value': 'Value',
-            'vender__name': 'Vender',
-            'file_source__name': 'file source'
-        }
-        
-        self.__name_map = {}
-        # generate all tables
-        _ = self.__table(Adhesion, opt=3)
-        _ = self.__table(DeltaAngle, opt=6)
-
-        ushape_add = {
-            'add_q': {
-                'time': 1,
-                'temperature': 25
-            },
-            'add_header': {
-                'time': 'Time',
-                'temperature': 'Temperature'
-            }
-        }
-
-        _ = self.__table(UShapeAC, 'u_shape_ac', opt=6, f=np.abs, **ushape_add)
 
-        vhr_add ={
-            'add_q': {
-                'measure_voltage': 1.,
-                'measure_freq': 0.6,
-            },
-            'add_header': {
-                'measure_voltage': 'Measure Voltage',
-                'measure_freq': 'Measure Frequency'
-            }
-        }
-        _ = self.__table(VoltageHoldingRatio, **vhr_add)
-
-        lts_add = {
-            'add_q': {
-                'storage_condition': 'Bulk',
-                'measure_temperature': -30,
-            },
-            'add_header': {
-                'storage_condition': 'Storage Cond.',
-                'measure_temperature': 'Measure Temp.(°C)',
-            }
-        }
-        _ = self.__table(LowTemperatureStorage, opt=4, **lts_add)
-        _ = self.__table(PressureCookingTest)
-        _ = self.__table(SealWVTR, 'seal_wvtr', opt=1)
+        self.__name_map = {}
+        self.__tables = []
+        # generate all tables, one query of each table
+        tables = ReliabilityTables(query, profile, workers)
+        for table, result in zip(tables.tables, tables.search().values()):
+            self.__tables.append(table.name)
+            # Store the human readable name
+            if result['raw'] is not None:
+                self.__name_map[table.name] = table.model.name
+            setattr(self, f'table_{table.name}', result)
 
         self.__result = None
         self.__plot_df = []
         self.__plot = None
 
-    def __table(
-            self, Model=None, name=None, opt=7, f=None, 
-            add_q=None, add_header=None
-        ):
-        """
-        Model: django.db.models.Model
-            The RA log model you need
-        name: str, default is None
-            Alternative name of the model, this name is the attribute
-            name of ReliabilitySearchProfile, default would
-            generate from the Model name (CapCamel to snake_case)
-            eg: MyModel -> my_model
-        opt: int, default is 7(all)
-            Using binary to represent query lc, pi, seal,
-            eg. need all, (lc, pi, seal) = 111 = 7
-        f: funcion, default is None
-            Transfer the value x to f(x) if needed
-        """
-        if (Model is None) and (name is None):
-            return 'You should at least offer one of Model or name'
-
-        if Model is None:
-            return getattr(self, name)
-        
-        if name is None:
-            name = self.pattern.sub('_', Model.__name__).lower()
-
-        if getattr(self, f'table_{name}', None) is None:
-            # option early gardian
-            if (opt > 7) and (opt < 1):
-                return 'no such option, opt need to be 1~7'
-
-            # get the compare condition, should be 'gt' or 'lt'
-            cmp = getattr(self.constraint, f'{name}_cmp')
-            if cmp not in ['gt', 'lt']:
-                return f'Check the profile {name}_cmp, something wrong.'
-            # setting query parameter for the model filter
-            # TODO: add condition filter, I think maybe just using 
-            # dictionary union(`{**a, **b}`) to q.
-            q = {
-                'lc__in': self.lc,
-                'lc__material_type': self.constraint.material_type,
-                'pi__in': self.pi,
-                'pi__material_type': self.constraint.material_type,
-                'seal__in': self.seal,
-                'seal__material_type': self.constraint.material_type,
-                'vender__in': getattr(self.constraint, f'{name}_venders').all(),
-                f'value__{cmp}': getattr(self.constraint, name)
-            }
-            if add_q is not None:
-                q = {**q, **add_q}
-
-            # parse option
-            opt = f'{opt:03b}'
-            groupby = []
-            if opt[0] == '0':
-                del q['lc__in']
-                del q['lc__material_type']
-            else:
-                groupby.append('LC')
-
-            if opt[1] == '0':
-                del q['pi__in']
-                del q['pi__material_type']
-            else:
-                groupby.append('PI')
-            if opt[2] == '0':
-                del q['seal__in']
-                del q['seal__material_type']
-            else:
-                groupby.append('Seal')
-            
-            header = self.header
-            if add_header is not None:
-                header = {**self.header, **add_header}
-
-            df = pd.DataFrame.from_records(
-                Model.objects.filter(**q).values(*header)
-            ).rename(columns=header)
-            # check the query result
-            if len(df) == 0:
-                result = {
-                    'raw': None,
-                    'mean': None,
-                }
-                setattr(self, f'table_{name}', result)
-                return getattr(self, f'table_{name}')
-            if f:
-                df['Value'] = f(df['Value'])
-
-            # Store the human readable name
-            self.__name_map[name] = Model.name
-            # only store configure and value in the mean table
-            columns = [v for _, v in self.header.items()]
-            mean_df = df[columns].groupby(
-                by=groupby, 
-                as_index=False
-            ).mean().sort_values(by='Value', ascending=False)
-            result = {
-                'raw': df,
-                'mean': mean_df
-            }
-
-            setattr(self, f'table_{name}', result)
-
-        return getattr(self, f'table_{name}')    
-
     @staticmethod
     def score_f(x):
         return np.round(9 * x) + 1
@@ -243,33 +92,21 @@ class ReliabilityScore():
     def result(self):
         if self.__result is None:
 
-            # generate all configuration table
-            df_lc = pd.DataFrame.from_records(
-                self.lc.values('name')
-            ).rename(columns={'name': 'LC'})
-            df_pi = pd.DataFrame.from_records(
-                self.pi.values('name')
-            ).rename(columns={'name': 'PI'})
-            df_seal = pd.DataFrame.from_records(
-                self.seal.values('name')
-            ).rename(columns={'name': 'Seal'})
-            tmp_df = df_lc.merge(df_pi, how='cross')
-            raw_df = tmp_df.merge(df_seal, how='cross')
-
-            # 1. construct raw table
-            for table in self.__dir__():
-                # skip not table attribute
-                if not table.startswith('table_'):
-                    continue
+            # 1. construct raw table, only the configurations with data
+            means = {}
+            for name in self.__tables:
                 # skip None table
-                if (mean := getattr(self, table)['mean']) is None:
+                if (mean := getattr(self, f'table_{name}')['mean']) is None:
                     continue
-                
-                item = table[6:]
-                # calculate the score, drop the last column(file source)
-                columns = list(mean.columns[:-1])
-                mean = mean.rename(columns={'Value':item})
-                raw_df = raw_df.merge(mean, on=columns, how='left')
+                means[name] = mean
+            raw_df = configuration_table(
+                {
+                    'LC': list(self.lc.values_list('name', flat=True)),
+                    'PI': list(self.pi.values_list('name', flat=True)),
+                    'Seal': list(self.seal.values_list('name', flat=True)),
+                },
+                means,
+            )
 
             # 2. shrink the raw_df to get a better table to estimate score
             shrink_df = table_shrink(raw_df)
@@ -332,12 +169,10 @@ class UShape:
     @property
     def vt_curve(self):
         if self.__vt_curve is None:
-            df = self.opt_raw.groupby(['ID', 'Point']).apply(
-                lambda group: group.iloc[:group['LC%'].argmax()+1]
+            df = truncate_at_argmax(
+                self.opt_raw, 'LC%', inclusive=True
             ).reset_index(drop=True)
-            df['T%'] = df.groupby(['ID', 'Point'])['LC%'].apply(
-                lambda group: 100 * group / group.max()
-            )
+            df['T%'] = group_max_normalize(df, 'LC%')
             self.__vt_curve = {'data': df}
             fig = px.scatter(
                 self.__vt_curve['data'],
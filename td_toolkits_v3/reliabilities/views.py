@@ -1,11 +1,12 @@
-from io import BytesIO
 import pandas as pd
 
 from django.core.cache import cache
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
 from django.http import HttpResponse, HttpRequest
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.generic import (
     TemplateView,
@@ -25,6 +26,8 @@ from td_toolkits_v3.materials.models import (
     Seal,
 )
 from td_toolkits_v3.products.models import Experiment
+from td_toolkits_v3.utils.downloads import download_response
+from td_toolkits_v3.utils.results import ResultStore
 
 from .forms import (
     ReliabilitiesUploadForm,
@@ -127,12 +130,14 @@ class ReliabilitySearchProfileCopyView(ReliabilitySearchProfileUpdateView):
 class ReliabilitiesUploadView(LoginRequiredMixin, FormView):
     template_name = 'form_generic.html'
     form_class = ReliabilitiesUploadForm
-    success_url = reverse_lazy('reliabilities:index')
 
     def form_valid(self, form):
-        form.save()
+        self.job = form.save(self.request)
         return super().form_valid(form)
 
+    def get_success_url(self):
+        return reverse_lazy('jobs:detail', kwargs={'pk': self.job.pk})
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'RA Upload'
@@ -141,6 +146,8 @@ class ReliabilitiesUploadView(LoginRequiredMixin, FormView):
 
         return context
 
+# read only, so the tables are queried by the threads outside the transaction
+@method_decorator(transaction.non_atomic_requests, name='dispatch')
 class ReliabilitySearchView(TemplateView):
     template_name = 'reliabilities/search.html'
 
@@ -209,39 +216,38 @@ class ReliabilitySearchView(TemplateView):
             context['ra_score_raw'] = ra_score.result['raw'][:10].to_html(
                 **table_style
             )
-            # save data to cookies for downloading later
-            self.request.session['ra_all'] = ra_score.result['all'].to_json()
-            self.request.session['ra_score'] = ra_score.result['normalized'].\
-                to_json()
-            self.request.session['ra_score_raw'] = ra_score.result['raw'].\
-                to_json()
+            # save data to the store for downloading later
+            store = ResultStore(self.request.session)
+            store['ra_all'] = ra_score.result['all']
+            store['ra_score'] = ra_score.result['normalized']
+            store['ra_score_raw'] = ra_score.result['raw']
             # The calculate raws
             for attr in dir(ra_score):
                 if attr.startswith('table'):
                     if (table := getattr(ra_score, attr)['raw']) is None:
                         # TODO: There should be more eligant methods...
                         if attr[6:] == 'u_shape_ac':
-                            self.request.session[attr] = pd.DataFrame({
+                            store[attr] = pd.DataFrame({
                                 'msg': ['no value'],
                                 'Time(h)': [1],
                                 'Temperature(°C)': [25]
-                            }).to_json()
+                            })
                         elif attr[6:] == 'voltage_holding_ratio':
-                            self.request.session[attr] = pd.DataFrame({
+                            store[attr] = pd.DataFrame({
                                 'msg': ['no value'],
                                 'Measure Voltage': [1],
                                 'Measure Frequency': [0.6]
-                            }).to_json()
+                            })
                         elif attr[6:] == 'low_temperature_storage':
-                            self.request.session[attr] = pd.DataFrame({
+                            store[attr] = pd.DataFrame({
                                 'msg': ['no value'],
                                 'Storage Cond.': 'Bulk',
                                 'Measure Temp.(°C)': [-30]
-                            }).to_json()
+                            })
                         else:
-                            self.request.session[attr] = None
+                            store[attr] = None
                     else:
-                        self.request.session[attr] = table.to_json()
+                        store[attr] = table
 
         return context
 
@@ -274,42 +280,25 @@ class ReliabilitySearchView(TemplateView):
 
 class ReliabilitySearchResultDownload(View):
     def get(self, request: HttpRequest, *args, **kwargs):
-        if 'ra_all' in request.session:
-            ra_result = pd.read_json(request.session['ra_all'])
-            ra_score_raw = pd.read_json(request.session['ra_score_raw'])
-            ra_score = pd.read_json(request.session['ra_score'])
-
-            buffer = BytesIO()
-            with pd.ExcelWriter(buffer) as writer:
-                ra_result.to_excel(writer, sheet_name='RA Result', index=False)
-                ra_score_raw.to_excel(
-                    writer, sheet_name='RA Score Raw', index=False)
-                ra_score.to_excel(writer, sheet_name='RA Score', index=False)
-                # raw data
-                for k, v in request.session.items():
-                    if k.startswith('table'):
-                        if v is None:
-                            pd.DataFrame({
-                                'msg': ['no value']
-                            }).to_excel(
-                                writer, 
-                                sheet_name=k[6:].title().replace("_", " ")
-                            )
-                        else:
-                            pd.read_json(v).to_excel(
-                                writer, 
-                                sheet_name=k[6:].title().replace("_", " ")
-                            )
-
-            file_name = 'RA Result.xlsx'
-            response = HttpResponse(
-                buffer.getvalue(),
-                content_type=(
-                    'application/'
-                    'vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            )
-            response['Content-Disposition'] = f'attachment; filename={file_name}'
-            return response
+        store = ResultStore(request.session)
+        if 'ra_all' in store:
+            ra_result = store['ra_all']
+            ra_score_raw = store['ra_score_raw']
+            ra_score = store['ra_score']
+
+            sheets = {
+                'RA Result': ra_result,
+                'RA Score Raw': ra_score_raw,
+                'RA Score': ra_score,
+            }
+            # raw data
+            for k in store.keys():
+                if k.startswith('table'):
+                    if (v := store[k]) is None:
+                        v = pd.DataFrame({'msg': ['no value']})
+                    sheets[k[6:].title().replace("_", " ")] = v
+            return download_response(
+                sheets, 'RA Result', request.GET.get('format', 'xlsx'))
         return redirect(reverse_lazy('reliabilities:search'))
 
 class UShapeView(TemplateView):
@@ -322,36 +311,23 @@ class UShapeView(TemplateView):
             ushape = UShape(experiment_name)
             context['q'] = True
             context['plot'] = ushape.vt_curve['plot']
-            self.request.session['vt_curve'] = ushape.vt_curve['data'].to_json()
-            self.request.session['voltage_setting'] = (
-                ushape.voltage_setting.to_json()
-            )
+            store = ResultStore(self.request.session)
+            store['vt_curve'] = ushape.vt_curve['data']
+            store['voltage_setting'] = ushape.voltage_setting
 
         return context
 
     def get(self, request, *args, **kwargs):
         if request.GET.get('download'):
-            buffer = BytesIO()
-            with pd.ExcelWriter(buffer) as writer:
-                pd.read_json(
-                    request.session['voltage_setting']
-                ).to_excel(writer, sheet_name='Voltage Setting', index=False)
-                pd.read_json(
-                    request.session['vt_curve']
-                ).to_excel(writer, sheet_name='VT curve', index=False)
-
-            response = HttpResponse(
-                    buffer.getvalue(),
-                    content_type=(
-                        'application/'
-                        'vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                    )
-                )
-            filename = 'ushape_volgate_setting.xlsx'
-            response['Content-Disposition'] = (
-                f'attachment; filename={filename}'
+            store = ResultStore(request.session)
+            return download_response(
+                {
+                    'Voltage Setting': store['voltage_setting'],
+                    'VT curve': store['vt_curve'],
+                },
+                'ushape_volgate_setting',
+                request.GET.get('format', 'xlsx'),
             )
-            return response
 
         return super().get(request, *args, **kwargs)
 
@@ -383,13 +359,10 @@ class ReliabilityPhaseTwoSuccessView(TemplateView):
             'escape': False,
         }
         
-        context['summary'] = pd.read_json(
-            self.request.session.get('summary')
-        ).to_html(**table_style)
-        context['score'] = pd.read_json(
-            self.request.session.get('score')
-        ).to_html(**table_style)
-        context['plot'] = self.request.session.get('plot')
+        store = ResultStore(self.request.session)
+        context['summary'] = store['summary'].to_html(**table_style)
+        context['score'] = store['score'].to_html(**table_style)
+        context['plot'] = store.get('plot')
         
         return context
     
@@ -0,0 +1,200 @@
+"""
+Streaming downloads of the result tables.
+
+The tables are written chunk by chunk of `settings.DOWNLOAD_CHUNK_ROWS`
+rows, and the written bytes are sent as soon as they are ready, so the
+memory of a download is bounded by the chunk instead of the whole file.
+
+The formats are
+
+- xlsx: one workbook with a sheet of each table, by the write-only
+  workbook of openpyxl. The zip container of the workbook is finished at
+  the end, so its rows are kept in the temporary files instead of memory
+  and the workbook is sent from its temporary file.
+- csv, parquet: one file, or one zip of a file of each table.
+
+The existing files, like the exported dataset, are zipped as they are.
+"""
+from __future__ import annotations
+import io
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import parquet
+from openpyxl import Workbook
+
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.http import StreamingHttpResponse
+
+CONTENT_TYPES = {
+    'xlsx': (
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    ),
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'zip': 'application/zip',
+}
+FORMATS = ['xlsx', 'csv', 'parquet']
+
+
+class _Pipe(io.RawIOBase):
+    """
+    The write only stream, the written bytes are taken by the response.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def take(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def chunks(df: pd.DataFrame, size: int | None = None) -> Iterator[pd.DataFrame]:
+    size = size or settings.DOWNLOAD_CHUNK_ROWS
+    for start in range(0, len(df), size):
+        yield df.iloc[start:start + size]
+
+
+def iter_xlsx(sheets: dict[str, pd.DataFrame]) -> Iterator[bytes]:
+    workbook = Workbook(write_only=True)
+    for name, df in sheets.items():
+        worksheet = workbook.create_sheet(title=name[:31])
+        worksheet.append([str(column) for column in df.columns])
+        for chunk in chunks(df):
+            # the blank cells for NaN, like `DataFrame.to_excel`
+            chunk = chunk.astype(object).where(chunk.notna(), None)
+            for row in chunk.itertuples(index=False, name=None):
+                worksheet.append(row)
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while data := file.read(1 << 16):
+            yield data
+
+
+def write_csv(df: pd.DataFrame, stream, pipe: _Pipe) -> Iterator[bytes]:
+    # with BOM, so Excel reads the symbols like Δ
+    stream.write(df.iloc[:0].to_csv(index=False).encode('utf-8-sig'))
+    for chunk in chunks(df):
+        stream.write(chunk.to_csv(index=False, header=False).encode('utf-8'))
+        yield pipe.take()
+
+
+def write_parquet(df: pd.DataFrame, stream, pipe: _Pipe) -> Iterator[bytes]:
+    try:
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # the mixed object columns are written as text
+        df = df.astype({
+            column: str for column in df.columns
+            if df[column].dtype == object
+        })
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with parquet.ParquetWriter(stream, schema) as writer:
+        for chunk in chunks(df):
+            # one row group of each chunk
+            writer.write_table(pa.Table.from_pandas(
+                chunk, schema=schema, preserve_index=False))
+            yield pipe.take()
+
+
+WRITERS = {'csv': write_csv, 'parquet': write_parquet}
+
+
+def iter_file(df: pd.DataFrame, file_format: str) -> Iterator[bytes]:
+    pipe = _Pipe()
+    yield from WRITERS[file_format](df, pipe, pipe)
+    yield pipe.take()
+
+
+def iter_zip(sheets: dict[str, pd.DataFrame], file_format: str) -> Iterator[bytes]:
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, df in sheets.items():
+            file_name = name.replace('/', '_').replace('\\', '_')
+            with archive.open(f'{file_name}.{file_format}', 'w') as stream:
+                yield from WRITERS[file_format](df, stream, pipe)
+            yield pipe.take()
+    yield pipe.take()
+
+
+def download_response(
+    sheets: dict[str, pd.DataFrame],
+    file_name: str,
+    file_format: str = 'xlsx',
+) -> StreamingHttpResponse:
+    """
+    The streaming response of the tables.
+
+    Parameters
+    ----------
+    sheets: dict
+        {sheet name: DataFrame}
+    file_name: str
+        The file name without the extension.
+    file_format: str
+        'xlsx', 'csv' or 'parquet', like the `format` of the query string.
+        The csv and parquet of many tables are zipped.
+    """
+    if file_format not in FORMATS:
+        raise BadRequest(
+            f'The format should be one of {FORMATS}, not {file_format}')
+    if file_format == 'xlsx':
+        content, extension = iter_xlsx(sheets), 'xlsx'
+    elif len(sheets) == 1:
+        content = iter_file(next(iter(sheets.values())), file_format)
+        extension = file_format
+    else:
+        content, extension = iter_zip(sheets, file_format), 'zip'
+    response = StreamingHttpResponse(
+        content, content_type=CONTENT_TYPES[extension])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{file_name}.{extension}"'
+    )
+    return response
+
+
+def iter_zip_files(files: dict[str, Path]) -> Iterator[bytes]:
+    pipe = _Pipe()
+    # the files like parquet are compressed already
+    with zipfile.ZipFile(pipe, 'w', zipfile.ZIP_STORED) as archive:
+        for name, path in files.items():
+            with archive.open(name, 'w') as stream, open(path, 'rb') as file:
+                while data := file.read(1 << 16):
+                    stream.write(data)
+                    yield pipe.take()
+    yield pipe.take()
+
+
+def files_response(
+    files: dict[str, Path],
+    file_name: str,
+) -> StreamingHttpResponse:
+    """
+    The streaming response of the zip of the files.
+
+    Parameters
+    ----------
+    files: dict
+        {the name in the zip: path}
+    file_name: str
+        The file name without the extension.
+    """
+    response = StreamingHttpResponse(
+        iter_zip_files(files), content_type=CONTENT_TYPES['zip'])
+    response['Content-Disposition'] = f'attachment; filename="{file_name}.zip"'
+    return response
@@ -0,0 +1,248 @@
+"""
+Lookups of the master data by their names.
+
+The uploads refer to the venders, files, batches, factories, instruments
+and materials by their names. The names of an upload are resolved at once,
+the known ones by one query and the new ones by one `bulk_create`, so the
+queries of the master data do not grow with the rows.
+
+The lookups are shared in a request (`Lookups.for_request`) or a job. With
+`settings.LOOKUP_CACHE_SHARED`, the resolved objects are also kept in the
+process for the next lookups, and the ones of a model are dropped when any
+of them is saved or deleted in this process. The other processes do not
+tell, so share them only when the master data are changed by the uploads.
+"""
+from __future__ import annotations
+import threading
+from functools import partial
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpRequest
+
+from td_toolkits_v3.materials.models import (
+    DEFAULT_VENDER,
+    Vender,
+    get_default_vender,
+)
+
+
+class NameMap():
+    """
+    The objects of a lookup model by their names, the unknown names are
+    loaded by one query and the new ones are created in bulk.
+
+    Parameters
+    ----------
+    model: django.db.models.Model
+        The model with `name` field.
+    scope: dict, optional
+        The other fields of the objects, like the factory of the instruments.
+    defaults: callable, optional
+        The function returns the other fields of the new objects, called
+        once for each creation.
+    """
+
+    def __init__(
+        self,
+        model,
+        scope: Optional[dict] = None,
+        defaults: Optional[Callable[[], dict]] = None,
+    ):
+        self.model = model
+        self.scope = scope or {}
+        self.defaults = defaults
+        self.objects: dict[str, Model] = {}
+
+    def __getitem__(self, name: str) -> Model:
+        return self.objects[name]
+
+    def load(self, names: set[str]):
+        # the oldest one of the same names, the name may be not unique
+        for obj in self.model.objects.filter(
+            name__in=names, **self.scope
+        ).order_by('pk'):
+            self.objects.setdefault(obj.name, obj)
+
+    def resolve(
+        self,
+        names: Iterable,
+        create: bool = True,
+    ) -> dict[str, Model]:
+        missing = {str(name) for name in names} - self.objects.keys()
+        if missing:
+            self.load(missing)
+            missing -= self.objects.keys()
+        if missing and create:
+            self.create(sorted(missing))
+            self.load(missing)
+        return self.objects
+
+    def create(self, names: list[str]):
+        fields = {
+            **self.scope,
+            **(self.defaults() if self.defaults is not None else {}),
+        }
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create([
+                    self.model(name=name, **fields) for name in names
+                ])
+        except IntegrityError:
+            # the slugs of the new names collide with each other, the slug
+            # field makes them unique when created one by one
+            for name in names:
+                self.model.objects.create(name=name, **fields)
+
+
+class Lookups():
+    """
+    The name maps of the master data, shared in a request or a job.
+
+    Parameters
+    ----------
+    shared: bool, optional
+        Keep the resolved objects in the process for the next lookups,
+        default is settings.LOOKUP_CACHE_SHARED.
+    """
+    # (model, scope) -> {name: object}, the objects of the committed lookups
+    shared: dict[tuple, dict[str, Model]] = {}
+    # model -> the times its objects are dropped, the objects looked up
+    # before the last drop are not kept
+    generations: dict[type, int] = {}
+    lock = threading.Lock()
+
+    def __init__(self, shared: Optional[bool] = None):
+        self.use_shared = (
+            settings.LOOKUP_CACHE_SHARED if shared is None else shared
+        )
+        self.maps: dict[tuple, NameMap] = {}
+        self.started: dict[tuple, int] = {}
+
+    @classmethod
+    def for_request(cls, request: Optional[HttpRequest]) -> Lookups:
+        """
+        Get the lookups shared in the whole request.
+        """
+        if request is None:
+            return cls()
+        if not hasattr(request, '_lookups'):
+            request._lookups = cls()
+        return request._lookups
+
+    @staticmethod
+    def key(model, scope: dict) -> tuple:
+        return (model, tuple(sorted(
+            (field, getattr(value, 'pk', value))
+            for field, value in scope.items()
+        )))
+
+    def map(self, model, **scope) -> NameMap:
+        """
+        The name map of the model in the scope, like `factory=factory`.
+        """
+        key = self.key(model, scope)
+        if key not in self.maps:
+            name_map = NameMap(model, scope, partial(self.defaults, model))
+            if self.use_shared:
+                watch(model)
+                with self.lock:
+                    self.started[key] = self.generations.get(model, 0)
+                    name_map.objects.update(self.shared.get(key, {}))
+            self.maps[key] = name_map
+        return self.maps[key]
+
+    def resolve(
+        self,
+        model,
+        names: Iterable,
+        create: bool = True,
+        **scope,
+    ) -> dict[str, Model]:
+        """
+        Resolve the names at once.
+
+        Parameters
+        ----------
+        model: django.db.models.Model
+            The model with `name` field.
+        names: iterable
+            The names, converted to str.
+        create: bool
+            Create the missing ones, or leave them out.
+        scope:
+            The other fields of the objects.
+
+        Returns
+        -------
+        dict
+            {name: object} of all the names resolved in the scope.
+        """
+        name_map = self.map(model, **scope)
+        known = len(name_map.objects)
+        objects = name_map.resolve(names, create)
+        if self.use_shared and len(objects) > known:
+            key = self.key(model, scope)
+            # the objects created in a transaction rolled back are not kept
+            transaction.on_commit(
+                partial(self.keep, key, self.started[key], dict(objects)))
+        return objects
+
+    def get(self, model, name, create: bool = True, **scope) -> Model:
+        """
+        Like `get_or_create(name=name, **scope)`, but looked up once.
+        """
+        objects = self.resolve(model, [name], create, **scope)
+        try:
+            return objects[str(name)]
+        except KeyError:
+            raise model.DoesNotExist(
+                f'{model._meta.verbose_name} {name} does not exist')
+
+    def defaults(self, model) -> dict:
+        # the default vender of the materials is looked up as well
+        for field in model._meta.fields:
+            if field.name == 'vender' and field.default is get_default_vender:
+                return {'vender': self.get(Vender, DEFAULT_VENDER)}
+        return {}
+
+    @classmethod
+    def keep(cls, key: tuple, generation: int, objects: dict[str, Model]):
+        with cls.lock:
+            if cls.generations.get(key[0], 0) == generation:
+                cls.shared.setdefault(key, {}).update(objects)
+
+    @classmethod
+    def invalidate(cls, model):
+        """
+        Drop the shared objects of the model.
+        """
+        with cls.lock:
+            cls.generations[model] = cls.generations.get(model, 0) + 1
+            for key in [key for key in cls.shared if key[0] is model]:
+                del cls.shared[key]
+
+    @classmethod
+    def clear(cls):
+        with cls.lock:
+            for model in {key[0] for key in cls.shared}:
+                cls.generations[model] = cls.generations.get(model, 0) + 1
+            cls.shared.clear()
+
+
+def invalidate_lookups(sender, **kwargs):
+    Lookups.invalidate(sender)
+
+
+def watch(model):
+    # connected to the lookup models only, the receivers of all the models
+    # would stop the fast deletes of the logs
+    for signal in [post_save, post_delete]:
+        signal.connect(
+            invalidate_lookups,
+            sender=model,
+            dispatch_uid=f'lookups.{model._meta.label}',
+        )
@@ -0,0 +1,188 @@
+"""
+Server side store of the results of a session.
+
+The search and phase-two pages keep their result tables for the downloads
+and the next pages. The tables are written on disk as Arrow IPC (Feather)
+files, which keep the dtypes and are much smaller and faster than JSON,
+and the session keeps only an opaque handle of each result.
+
+The results expire after `settings.RESULT_STORE_TIMEOUT` seconds, the
+expired ones are missing and removed from the disk.
+"""
+from __future__ import annotations
+import json
+import pickle
+import secrets
+import shutil
+import time
+from pathlib import Path
+from typing import Union
+
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+from django.conf import settings
+
+SESSION_KEY = 'results'
+
+Result = Union[pd.DataFrame, dict, str, None]
+
+
+class ResultStore():
+    """
+    The results of a session, a mapping of the name to the result.
+
+    A result is a DataFrame, a dict of DataFrames, a str (like the plot), or
+    None.
+
+    Parameters
+    ----------
+    session: django.contrib.sessions.backends.base.SessionBase
+    """
+    # the time of the last purge in this process
+    purged = 0.
+
+    def __init__(self, session):
+        self.session = session
+
+    @staticmethod
+    def root() -> Path:
+        return Path(settings.RESULT_STORE_DIR)
+
+    @property
+    def handles(self) -> dict:
+        return self.session.get(SESSION_KEY, {})
+
+    def path(self, handle: str) -> Path:
+        return self.root() / handle
+
+    def __contains__(self, name: str) -> bool:
+        if name not in self.handles:
+            return False
+        handle = self.handles[name]
+        return handle is None or self.alive(handle)
+
+    def keys(self) -> list[str]:
+        return [name for name in self.handles if name in self]
+
+    def alive(self, handle: str) -> bool:
+        manifest = self.path(handle) / 'manifest.json'
+        try:
+            age = time.time() - manifest.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        return age < settings.RESULT_STORE_TIMEOUT
+
+    def __getitem__(self, name: str) -> Result:
+        if name not in self:
+            raise KeyError(name)
+        handle = self.handles[name]
+        if handle is None:
+            return None
+        path = self.path(handle)
+        manifest = json.loads((path / 'manifest.json').read_text())
+        if manifest['type'] == 'text':
+            return (path / '0.txt').read_text(encoding='utf-8')
+        frames = {
+            key: self.read_frame(path / file)
+            for key, file in zip(manifest['keys'], manifest['files'])
+        }
+        if manifest['type'] == 'frame':
+            return frames[None]
+        return frames
+
+    def get(self, name: str, default: Result = None) -> Result:
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __setitem__(self, name: str, value: Result):
+        handles = dict(self.handles)
+        if handles.get(name) is not None:
+            shutil.rmtree(self.path(handles[name]), ignore_errors=True)
+        handles[name] = None if value is None else self.write(value)
+        # assign again, so the session is saved
+        self.session[SESSION_KEY] = handles
+        self.purge(throttle=True)
+
+    def write(self, value: Result) -> str:
+        handle = secrets.token_hex(16)
+        path = self.path(handle)
+        path.mkdir(parents=True)
+        if isinstance(value, str):
+            (path / '0.txt').write_text(value, encoding='utf-8')
+            manifest = {'type': 'text'}
+        else:
+            frames = value if isinstance(value, dict) else {None: value}
+            manifest = {
+                'type': 'frames' if isinstance(value, dict) else 'frame',
+                'keys': list(frames),
+                'files': [
+                    self.write_frame(path, str(i), frame)
+                    for i, frame in enumerate(frames.values())
+                ],
+            }
+        # the manifest is the last, a result without it is never read
+        (path / 'manifest.json').write_text(json.dumps(manifest))
+        return handle
+
+    @staticmethod
+    def write_frame(path: Path, name: str, df: pd.DataFrame) -> str:
+        try:
+            table = pa.Table.from_pandas(df)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            # the mixed object columns could not be columnar
+            with open(path / f'{name}.pkl', 'wb') as file:
+                pickle.dump(df, file, protocol=pickle.HIGHEST_PROTOCOL)
+            return f'{name}.pkl'
+        feather.write_feather(table, str(path / f'{name}.arrow'))
+        return f'{name}.arrow'
+
+    @staticmethod
+    def read_frame(path: Path) -> pd.DataFrame:
+        if path.suffix == '.pkl':
+            with open(path, 'rb') as file:
+                return pickle.load(file)
+        return feather.read_table(str(path)).to_pandas()
+
+    @classmethod
+    def purge(cls, throttle: bool = False) -> int:
+        """
+        Remove the expired results of all the sessions.
+
+        Parameters
+        ----------
+        throttle: bool
+            Skip it if this process purged within the last hour.
+
+        Returns
+        -------
+        int
+            The number of the removed results.
+        """
+        now = time.time()
+        if throttle and now - cls.purged < min(
+            3600, settings.RESULT_STORE_TIMEOUT
+        ):
+            return 0
+        cls.purged = now
+        root = cls.root()
+        if not root.exists():
+            return 0
+        removed = 0
+        for path in root.iterdir():
+            manifest = path / 'manifest.json'
+            try:
+                # the results being written have no manifest yet
+                modified = (
+                    manifest.stat().st_mtime if manifest.exists()
+                    else path.stat().st_mtime
+                )
+            except FileNotFoundError:
+                continue
+            if now - modified >= settings.RESULT_STORE_TIMEOUT:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
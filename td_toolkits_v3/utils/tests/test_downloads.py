@@ -0,0 +1,53 @@
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from django.core.exceptions import BadRequest
+
+from ..downloads import download_response
+
+
+def content(response) -> bytes:
+    return b''.join(response.streaming_content)
+
+
+def test_download_response(settings):
+    settings.DOWNLOAD_CHUNK_ROWS = 7
+    df = pd.DataFrame({
+        'LC': [f'LC {i}' for i in range(30)],
+        'ΔEab*': np.linspace(0, 1, 30),
+    })
+    df.loc[3, 'ΔEab*'] = np.nan
+    sheets = {'OPT': df, 'RT': df.iloc[:5]}
+
+    response = download_response(sheets, 'OPT Result')
+    assert response['Content-Disposition'] == (
+        'attachment; filename="OPT Result.xlsx"')
+    workbook = load_workbook(io.BytesIO(content(response)))
+    assert workbook.sheetnames == ['OPT', 'RT']
+    rows = list(workbook['OPT'].values)
+    assert rows[0] == ('LC', 'ΔEab*')
+    assert len(rows) == 31
+    assert rows[4] == ('LC 3', None)
+
+    response = download_response({'OPT': df}, 'OPT Result', 'csv')
+    assert response['Content-Disposition'].endswith('OPT Result.csv"')
+    pd.testing.assert_frame_equal(
+        pd.read_csv(io.BytesIO(content(response)), encoding='utf-8-sig'), df)
+
+    # the chunks are written as the response is read
+    response = download_response(sheets, 'OPT Result', 'parquet')
+    assert response['Content-Disposition'].endswith('OPT Result.zip"')
+    parts = list(response.streaming_content)
+    assert len(parts) > 5
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(parts)))
+    assert archive.namelist() == ['OPT.parquet', 'RT.parquet']
+    pd.testing.assert_frame_equal(
+        pd.read_parquet(io.BytesIO(archive.read('RT.parquet'))), df.iloc[:5])
+
+    with pytest.raises(BadRequest):
+        download_response(sheets, 'OPT Result', 'json')
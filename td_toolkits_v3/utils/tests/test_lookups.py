@@ -0,0 +1,61 @@
+import pytest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = pytest.mark.django_db
+
+from td_toolkits_v3.materials.models import DEFAULT_VENDER, Seal, Vender
+from td_toolkits_v3.opticals.models import Instrument
+from td_toolkits_v3.products.models import Factory
+
+from ..lookups import Lookups
+
+
+def test_lookups():
+    lookups = Lookups(shared=False)
+    Seal.objects.create(name='723K1M', vender=Vender.objects.create(name='A'))
+    names = ['723K1M', '7142T', 'S-NP07', '7142T']
+    with CaptureQueriesContext(connection) as queries:
+        seals = lookups.resolve(Seal, names)
+    assert set(seals) == {'723K1M', '7142T', 'S-NP07'}
+    # the new ones belong to the default vender
+    assert seals['7142T'].vender.name == DEFAULT_VENDER
+    assert seals['723K1M'].vender.name == 'A'
+    # the inserts in one statement
+    inserts = [q for q in queries if q['sql'].startswith('INSERT')]
+    assert len(inserts) == 2  # the default vender and the seals
+
+    # the resolved names are not queried again
+    with CaptureQueriesContext(connection) as queries:
+        assert lookups.get(Seal, '7142T') == seals['7142T']
+    assert len(queries) == 0
+
+    with pytest.raises(Seal.DoesNotExist):
+        lookups.get(Seal, 'unknown', create=False)
+    assert not Seal.objects.filter(name='unknown').exists()
+
+    # the objects in scope
+    t2, toc = Factory.objects.create(name='T2'), Factory.objects.create(name='TOC')
+    assert lookups.get(Instrument, 'AXO', factory=t2).factory == t2
+    assert lookups.get(Instrument, 'AXO', factory=toc).factory == toc
+    assert Instrument.objects.filter(name='AXO').count() == 2
+
+
+# kept when committed
+@pytest.mark.django_db(transaction=True)
+def test_shared_lookups():
+    Lookups.clear()
+    vender = Lookups(shared=True).get(Vender, 'Merck')
+    with CaptureQueriesContext(connection) as queries:
+        assert Lookups(shared=True).get(Vender, 'Merck') == vender
+    assert len(queries) == 0
+    # not shared to the private lookups
+    with CaptureQueriesContext(connection) as queries:
+        Lookups(shared=False).get(Vender, 'Merck')
+    assert len(queries) == 1
+
+    # dropped when saved
+    vender.delete()
+    assert Lookups(shared=True).get(Vender, 'Merck').pk != vender.pk
+    Lookups.clear()
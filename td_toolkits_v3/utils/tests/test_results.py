@@ -0,0 +1,53 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from ..results import SESSION_KEY, ResultStore
+
+
+def test_result_store(settings):
+    session = {}
+    store = ResultStore(session)
+    df = pd.DataFrame({
+        'LC': pd.Categorical(['A', 'B']),
+        'Cell Gap': [3., 3.2],
+        'Time': pd.to_datetime(['2022-01-01', '2022-01-02']),
+    })
+    mixed = pd.DataFrame({'msg': ['no value', 1]})
+    store['frame'] = df
+    store['frames'] = {'V=5': df, 'mixed': mixed}
+    store['plot'] = '<div>plot</div>'
+    store['table_empty'] = None
+
+    # only the handles in the session
+    assert all(
+        handle is None or isinstance(handle, str)
+        for handle in session[SESSION_KEY].values()
+    )
+    # the dtypes are kept
+    pd.testing.assert_frame_equal(store['frame'], df)
+    frames = store['frames']
+    assert list(frames) == ['V=5', 'mixed']
+    pd.testing.assert_frame_equal(frames['mixed'], mixed)
+    assert store['plot'] == '<div>plot</div>'
+    assert store['table_empty'] is None
+    assert store.keys() == ['frame', 'frames', 'plot', 'table_empty']
+
+    # replacing removes the old file
+    old = store.path(session[SESSION_KEY]['frame'])
+    store['frame'] = df.iloc[:1]
+    assert not old.exists()
+    assert len(store['frame']) == 1
+
+    # expired
+    handle = session[SESSION_KEY]['plot']
+    expired = time.time() - settings.RESULT_STORE_TIMEOUT - 1
+    for path in [store.path(handle), store.path(handle) / 'manifest.json']:
+        os.utime(path, (expired, expired))
+    assert 'plot' not in store
+    assert store.get('plot') is None
+    assert ResultStore.purge() == 1
+    assert not store.path(handle).exists()
+    assert np.array_equal(store['frame']['Cell Gap'], [3.])